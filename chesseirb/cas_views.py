@@ -2,15 +2,18 @@ import logging
 from typing import Any, Dict
 from urllib.parse import urlencode
 import base64
+import time
 
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model, login
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils.http import url_has_allowed_host_and_scheme
-from django.views.decorators.csrf import csrf_exempt
+
+from tournaments.metrics import CAS_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -59,11 +62,13 @@ def cas_login(request):
     return redirect(cas_login_url)
 
 
-@csrf_exempt  # CAS performs a GET with external origin; no CSRF token available.
-def cas_callback(request):
+async def cas_callback(request):
     """
     Receives the CAS ticket, validates it against /serviceValidate, logs the user
     in (creating the account if needed), then redirects to the requested page.
+
+    Async so that waiting on the CAS server does not hold a worker: the
+    validation request runs in its own thread, off the event loop.
     """
     ticket = request.GET.get("ticket")
     next_url = _get_next_url(request)
@@ -73,17 +78,20 @@ def cas_callback(request):
         messages.error(request, "Ticket CAS manquant.")
         return redirect("login")
 
+    start = time.perf_counter()
     try:
-        resp = requests.get(
+        resp = await sync_to_async(requests.get, thread_sensitive=False)(
             settings.CAS_VALIDATE_ENDPOINT,
             params={"service": service_url, "ticket": ticket, "format": "json"},
             timeout=5,
         )
     except requests.RequestException as exc:
+        CAS_SECONDS.observe(time.perf_counter() - start, outcome="error")
         logger.exception("CAS validation request failed")
         messages.error(request, f"Erreur de connexion au CAS: {exc}")
         return redirect("login")
 
+    CAS_SECONDS.observe(time.perf_counter() - start, outcome=str(resp.status_code))
     if resp.status_code != 200:
         messages.error(request, f"Validation CAS échouée (HTTP {resp.status_code}).")
         return redirect("login")
@@ -108,15 +116,20 @@ def cas_callback(request):
     last_name = first_value("nom", "")
 
     User = get_user_model()
-    user, created = User.objects.get_or_create(username=username, defaults={"email": email})
+    user, created = await User.objects.aget_or_create(username=username, defaults={"email": email})
     # Refresh attributes on every login to stay in sync with CAS directory.
     user.email = email or user.email
     user.first_name = first_name or user.first_name
     user.last_name = last_name or user.last_name
     if created:
         user.set_unusable_password()
-    user.save()
+    await user.asave()
 
-    login(request, user, backend="django.contrib.auth.backends.ModelBackend")
+    await sync_to_async(login)(request, user, backend="tournaments.user_cache.CachedModelBackend")
     messages.success(request, "Authentifié via CAS Bordeaux INP.")
     return redirect(next_url)
+
+
+# CAS performs a GET with external origin; no CSRF token available. Set by
+# hand: the Django 4.2 csrf_exempt decorator wraps views in a sync function.
+cas_callback.csrf_exempt = True
@@ -42,11 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tournaments.middleware.StaticAssetMiddleware',
+    'tournaments.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tournaments.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -120,12 +123,27 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# Filled by collectstatic: hashed names, optimized images, .gz/.br variants.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'tournaments.static_storage.CompressedManifestStaticFilesStorage'},
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Sessions and users are read from the cache, written through to the database.
+# With several worker processes, CACHES should point at a shared backend
+# (Memcached, Redis): the default local-memory cache is per process, and a
+# logout would only be seen by the process that handled it. On that default,
+# the user backend re-reads the password, is_active, is_staff and ban flags
+# on every request, so a ban or a demotion applies in every process at once.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['tournaments.user_cache.CachedModelBackend']
+
 LOGIN_REDIRECT_URL = 'tournament_list_open'
 LOGOUT_REDIRECT_URL = 'tournament_list_open'
 LOGIN_URL = 'cas_login'
@@ -139,3 +157,39 @@ CAS_PROXY_TOKEN_PARAM = 'token'
 # Si vous avez un domaine HTTPS public autorisé directement par CAS, définissez-le.
 # Sinon laissez None et utilisez le proxy ci-dessus.
 CAS_SERVICE_BASE = None
+
+# Jeton du scraper Prometheus pour lire /metrics sans être staff
+# (`authorization: {credentials: ...}` côté Prometheus). None : staff seulement.
+METRICS_TOKEN = None
+
+# Profilage des requêtes : une fraction tirée au hasard (0 = désactivé), plus
+# celles qu'un membre du staff demande avec l'en-tête PROFILER_HEADER.
+PROFILER_SAMPLE_RATE = 0.0
+PROFILER_HEADER = 'X-Profile'
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_MAX_FILES = 200
+
+# Les tournois terminés depuis plus longtemps sont archivés par
+# `python manage.py archive_tournaments`.
+ARCHIVE_AFTER_MONTHS = 12
+
+# Synchronisation des Elo chess.com (`python manage.py sync_chesscom_ratings`).
+# L'API publique tolère les requêtes en série ; au-delà de quelques requêtes
+# simultanées elle répond 429.
+CHESSCOM_API_BASE = 'https://api.chess.com/pub'
+CHESSCOM_RATING = 'chess_rapid'
+CHESSCOM_CONCURRENCY = 4
+CHESSCOM_USER_AGENT = 'Chesseirb rating sync'
+
+# Notifications d'appariement, envoyées par `python manage.py send_notifications`
+# (en continu avec --loop). En production, configurer le backend SMTP :
+# EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST...
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Chesseirb <noreply@localhost>'
+# Adresse publique du site, pour les liens des e-mails.
+SITE_URL = 'http://127.0.0.1:8000'
+NOTIFICATION_BATCH_SIZE = 100
+
+# API JSON des arbitres : une réponse est rejouée telle quelle quand un appareil
+# renvoie la même clé Idempotency-Key pendant ce délai (en heures).
+IDEMPOTENCY_KEY_HOURS = 24
@@ -1,12 +1,24 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Match, PlayerProfile, Round, Tournament, TournamentRegistration
+from .models import (
+    ApiToken,
+    Game,
+    Match,
+    PairingNotification,
+    PlayerProfile,
+    ResultEvent,
+    Round,
+    SeasonStanding,
+    Tournament,
+    TournamentRegistration,
+)
 
 
 @admin.register(Tournament)
 class TournamentAdmin(admin.ModelAdmin):
     list_display = ("name", "status", "mode", "start_datetime", "rounds_planned", "current_round")
-    list_filter = ("status", "mode")
+    list_filter = ("status", "mode", ("archived_at", admin.EmptyFieldListFilter))
     search_fields = ("name",)
 
 
@@ -26,7 +38,75 @@ class MatchAdmin(admin.ModelAdmin):
     list_display = ("round", "white_player", "black_player", "result", "updated_at")
     list_filter = ("result",)
 
+    # Results go through services.apply_results, which appends them to the
+    # result log: an edit here would leave the derived tables behind.
+    def get_readonly_fields(self, request, obj=None):
+        fields = ["result", "submitted_by"]
+        if obj is not None and obj.result != Match.RESULT_PENDING:
+            fields += ["white_player", "black_player"]
+        return fields
+
 
 @admin.register(PlayerProfile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ("user", "chesscom_elo")
+    list_display = ("user", "chesscom_elo", "notify_pairings")
+
+
+@admin.register(Game)
+class GameAdmin(admin.ModelAdmin):
+    list_display = ("match", "ply_count", "uploaded_by", "updated_at")
+    exclude = ("moves",)
+
+
+@admin.register(SeasonStanding)
+class SeasonStandingAdmin(admin.ModelAdmin):
+    list_display = ("season", "user", "points", "tournaments", "podiums", "games")
+    list_filter = ("season",)
+
+
+@admin.register(ResultEvent)
+class ResultEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "tournament", "white_player", "black_player", "previous_result", "result", "created_at")
+    list_filter = ("result",)
+
+    # The log is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PairingNotification)
+class PairingNotificationAdmin(admin.ModelAdmin):
+    list_display = ("user", "round", "channel", "status", "attempts", "sent_at")
+    list_filter = ("status", "channel")
+    readonly_fields = ("round", "match", "user", "channel", "attempts", "error", "sent_at")
+    actions = ["requeue"]
+
+    @admin.action(description="Renvoyer les notifications sélectionnées")
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status=PairingNotification.STATUS_PENDING).update(
+            status=PairingNotification.STATUS_PENDING, attempts=0, error=""
+        )
+        self.message_user(request, f"{count} notification(s) remise(s) en file.")
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "created_at", "last_used_at", "revoked_at")
+    list_filter = (("revoked_at", admin.EmptyFieldListFilter),)
+    readonly_fields = ("user", "created_at", "last_used_at")
+    actions = ["revoke"]
+
+    # Tokens are created by `manage.py create_api_token`, which shows the secret.
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Révoquer les jetons sélectionnés")
+    def revoke(self, request, queryset):
+        count = queryset.filter(revoked_at__isnull=True).update(revoked_at=timezone.now())
+        self.message_user(request, f"{count} jeton(s) révoqué(s).")
@@ -0,0 +1,121 @@
+import hashlib
+import secrets
+from datetime import timedelta
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import ApiToken, IdempotencyKey
+
+# last_used_at is written at most this often per token.
+LAST_USED_RESOLUTION = timedelta(minutes=1)
+MAX_KEY_LENGTH = 100
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def hash_token(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def create_token(user, name: str) -> Tuple[ApiToken, str]:
+    """A new token for ``user``'s device ``name``, and its secret (not stored)."""
+    raw = secrets.token_urlsafe(32)
+    return ApiToken.objects.create(user=user, name=name, key_hash=hash_token(raw)), raw
+
+
+def authenticate_token(authorization: str) -> Optional[ApiToken]:
+    """The live token of an ``Authorization: Bearer <token>`` header, if any."""
+    scheme, _, raw = authorization.partition(" ")
+    if scheme.lower() not in ("bearer", "token") or not raw.strip():
+        return None
+    token = (
+        ApiToken.objects.select_related("user")
+        .filter(key_hash=hash_token(raw.strip()), revoked_at__isnull=True, user__is_active=True)
+        .first()
+    )
+    if token is None:
+        return None
+    now = timezone.now()
+    if token.last_used_at is None or now - token.last_used_at > LAST_USED_RESOLUTION:
+        ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+        token.last_used_at = now
+    return token
+
+
+def api_error(message: str, status: int) -> JsonResponse:
+    return JsonResponse({"errors": [message]}, status=status)
+
+
+def token_required(view_func):
+    """Authenticate with a device token instead of the session; no CSRF check."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = authenticate_token(request.headers.get("Authorization", ""))
+        if token is None:
+            response = api_error("Jeton d'API manquant ou invalide.", 401)
+            response["WWW-Authenticate"] = "Bearer"
+            return response
+        request.user = token.user
+        request.api_token = token
+        return view_func(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+def idempotent(view_func):
+    """
+    Require an ``Idempotency-Key`` header and run the view at most once per
+    key and token: a retry gets the stored response back, with
+    ``Idempotent-Replayed: true``. The key is written in the view's
+    transaction, so a request that failed leaves no key behind, and a
+    concurrent retry waits on the key's unique index until the first one
+    commits. Keys are forgotten after ``IDEMPOTENCY_KEY_HOURS``.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key", "").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return api_error(
+                f"En-tête Idempotency-Key requis ({MAX_KEY_LENGTH} caractères au plus).", 400
+            )
+        digest = hashlib.sha256(
+            f"{request.method} {request.path}\n".encode("utf-8") + request.body
+        ).hexdigest()
+        token = request.api_token
+        with transaction.atomic():
+            cutoff = timezone.now() - timedelta(hours=_setting("IDEMPOTENCY_KEY_HOURS", 24))
+            IdempotencyKey.objects.filter(token=token, created_at__lt=cutoff).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(token=token, key=key, request_hash=digest)
+            except IntegrityError:
+                record = IdempotencyKey.objects.get(token=token, key=key)
+                if record.request_hash != digest:
+                    return api_error("Cette clé a déjà servi pour une autre requête.", 422)
+                response = HttpResponse(
+                    record.response, status=record.status_code, content_type="application/json"
+                )
+                response["Idempotent-Replayed"] = "true"
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code >= 500:
+                # Not an answer worth replaying: let the device try again.
+                transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.response = response.content.decode("utf-8")
+            record.save(update_fields=["status_code", "response"])
+        return response
+
+    return wrapper
@@ -0,0 +1,377 @@
+import base64
+import calendar
+import json
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, QuerySet
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    ArchivedPlayer,
+    Game,
+    Match,
+    PairingNotification,
+    Round,
+    Tournament,
+    TournamentArchive,
+    TournamentRegistration,
+)
+
+User = get_user_model()
+
+# Document layout, one list per row, fields in this order. Players are kept
+# by id: names and ratings are read from the live tables.
+#   registrations: id, user_id, joined_at, is_active
+#   rounds:        id, number, started_at, ended_at
+#   matches:       id, round number, white_id, black_id, result, board,
+#                  submitted_by_id, created_at, updated_at
+#   games:         match_id, headers, moves (base64), ply_count,
+#                  uploaded_by_id, created_at, updated_at
+ARCHIVE_FORMAT = 1
+
+
+class _Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes to the millisecond: keep them whole,
+    # so that a restored tournament is the one that was archived.
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def months_ago(when: datetime, months: int) -> datetime:
+    month = when.month - 1 - months
+    year, month = when.year + month // 12, month % 12 + 1
+    # 31 March minus one month is the last day of February.
+    day = min(when.day, calendar.monthrange(year, month)[1])
+    return when.replace(year=year, month=month, day=day)
+
+
+def archivable(months: Optional[int] = None) -> QuerySet:
+    """Completed tournaments whose last round ended more than ``months`` months ago."""
+    if months is None:
+        months = getattr(settings, "ARCHIVE_AFTER_MONTHS", 12)
+    cutoff = months_ago(timezone.now(), months)
+    return (
+        Tournament.objects.filter(status=Tournament.STATUS_COMPLETED, archived_at__isnull=True)
+        .annotate(finished_at=Coalesce(Max("rounds__ended_at"), "updated_at"))
+        .filter(finished_at__lt=cutoff)
+        .order_by("finished_at")
+    )
+
+
+def load(archive: TournamentArchive) -> Dict:
+    return json.loads(zlib.decompress(bytes(archive.data)))
+
+
+def _snapshot(tournament: Tournament) -> Dict:
+    registrations = TournamentRegistration.objects.filter(tournament=tournament).order_by(
+        "joined_at", "id"
+    )
+    matches = Match.objects.filter(round__tournament=tournament).order_by("round__number", "id")
+    games = Game.objects.filter(match__round__tournament=tournament).order_by("match_id")
+    return {
+        "format": ARCHIVE_FORMAT,
+        "registrations": list(
+            registrations.values_list("id", "user_id", "joined_at", "is_active")
+        ),
+        "rounds": list(
+            Round.objects.filter(tournament=tournament)
+            .order_by("number")
+            .values_list("id", "number", "started_at", "ended_at")
+        ),
+        "matches": list(
+            matches.values_list(
+                "id",
+                "round__number",
+                "white_player_id",
+                "black_player_id",
+                "result",
+                "board",
+                "submitted_by_id",
+                "created_at",
+                "updated_at",
+            )
+        ),
+        "games": [
+            [match_id, headers, base64.b64encode(bytes(moves)).decode("ascii"), *rest]
+            for match_id, headers, moves, *rest in games.values_list(
+                "match_id", "headers", "moves", "ply_count", "uploaded_by_id", "created_at", "updated_at"
+            )
+        ],
+    }
+
+
+@transaction.atomic
+def archive_tournament(tournament: Tournament) -> TournamentArchive:
+    """
+    Move the rows of a completed tournament into its archive. Each player
+    also gets their decided matches in an ``ArchivedPlayer`` row, for the
+    player pages. The live rows are deleted children first with
+    ``QuerySet.delete``, so on-delete rules and signals apply as for any
+    other delete.
+    """
+    status, archived_at = (
+        Tournament.objects.select_for_update().values_list("status", "archived_at").get(pk=tournament.pk)
+    )
+    if status != Tournament.STATUS_COMPLETED or archived_at:
+        raise ValueError("Seuls les tournois terminés et non archivés peuvent être archivés.")
+    data = _snapshot(tournament)
+    encoded = json.dumps(data, cls=_Encoder, separators=(",", ":")).encode("utf-8")
+    archive = TournamentArchive.objects.create(
+        tournament=tournament,
+        participants=sum(1 for row in data["registrations"] if row[3]),
+        rounds_played=sum(1 for row in data["rounds"] if row[3] is not None),
+        data=zlib.compress(encoded, 9),
+    )
+    players: Dict[int, List[list]] = {row[1]: [] for row in data["registrations"]}
+    for m in data["matches"]:
+        for user_id in m[2:4]:
+            if user_id:
+                rows = players.setdefault(user_id, [])
+                if m[4] != Match.RESULT_PENDING:
+                    rows.append(list(m[:6]))
+    ArchivedPlayer.objects.bulk_create(
+        (
+            ArchivedPlayer(archive=archive, user_id=user_id, matches=rows)
+            for user_id, rows in players.items()
+        ),
+        batch_size=500,
+    )
+
+    # Result events keep their players and lose their match (SET_NULL).
+    # Sent or not, pairing e-mails are not worth archiving.
+    PairingNotification.objects.filter(round__tournament=tournament).delete()
+    Game.objects.filter(match__round__tournament=tournament).delete()
+    Match.objects.filter(round__tournament=tournament).delete()
+    Round.objects.filter(tournament=tournament).delete()
+    TournamentRegistration.objects.filter(tournament=tournament).delete()
+
+    tournament.archived_at = timezone.now()
+    tournament.save(update_fields=["archived_at"])
+    return archive
+
+
+@transaction.atomic
+def restore_tournament(tournament: Tournament) -> None:
+    """Put the rows of an archived tournament back in the live tables, with their ids."""
+    archive = TournamentArchive.objects.select_for_update().filter(tournament=tournament).first()
+    if archive is None:
+        raise ValueError("Ce tournoi n'est pas archivé.")
+    data = load(archive)
+    referenced = {row[1] for row in data["registrations"]}
+    referenced.update(user_id for m in data["matches"] for user_id in (m[2], m[3], m[6]))
+    referenced.update(game[4] for game in data["games"])
+    # Accounts deleted since the archival are left out, as their rows would have been.
+    existing = set(User.objects.filter(pk__in=referenced - {None}).values_list("pk", flat=True))
+
+    def user(user_id):
+        return user_id if user_id in existing else None
+
+    # auto_now_add / auto_now fields are stamped by bulk_create: the archived
+    # dates are written back with bulk_update, which leaves them alone.
+    registrations = [
+        TournamentRegistration(
+            id=registration_id, tournament=tournament, user_id=user_id, is_active=is_active
+        )
+        for registration_id, user_id, _, is_active in data["registrations"]
+        if user_id in existing
+    ]
+    TournamentRegistration.objects.bulk_create(registrations)
+    joined = {row[0]: parse_datetime(row[2]) for row in data["registrations"]}
+    for registration in registrations:
+        registration.joined_at = joined[registration.pk]
+    TournamentRegistration.objects.bulk_update(registrations, ["joined_at"], batch_size=500)
+    round_ids = {}
+    rounds = []
+    for round_id, number, started_at, ended_at in data["rounds"]:
+        round_ids[number] = round_id
+        rounds.append(
+            Round(
+                id=round_id,
+                tournament=tournament,
+                number=number,
+                started_at=parse_datetime(started_at),
+                ended_at=parse_datetime(ended_at) if ended_at else None,
+            )
+        )
+    Round.objects.bulk_create(rounds)
+    matches = [
+        Match(
+            id=match_id,
+            round_id=round_ids[number],
+            white_player_id=user(white_id),
+            black_player_id=user(black_id),
+            result=result,
+            board=board,
+            submitted_by_id=user(submitted_by_id),
+        )
+        for match_id, number, white_id, black_id, result, board, submitted_by_id, _, _ in data["matches"]
+    ]
+    Match.objects.bulk_create(matches, batch_size=500)
+    for match, row in zip(matches, data["matches"]):
+        match.created_at, match.updated_at = parse_datetime(row[7]), parse_datetime(row[8])
+    Match.objects.bulk_update(matches, ["created_at", "updated_at"], batch_size=500)
+    games = [
+        Game(
+            match_id=match_id,
+            headers=headers,
+            moves=base64.b64decode(moves),
+            ply_count=ply_count,
+            uploaded_by_id=user(uploaded_by_id),
+        )
+        for match_id, headers, moves, ply_count, uploaded_by_id, _, _ in data["games"]
+    ]
+    Game.objects.bulk_create(games, batch_size=500)
+    games = list(Game.objects.filter(match__round__tournament=tournament).order_by("match_id"))
+    for game, row in zip(games, data["games"]):
+        game.created_at, game.updated_at = parse_datetime(row[5]), parse_datetime(row[6])
+    Game.objects.bulk_update(games, ["created_at", "updated_at"], batch_size=500)
+
+    archive.delete()
+    tournament.archived_at = None
+    tournament.save(update_fields=["archived_at"])
+
+
+# --- Reading ---------------------------------------------------------------
+
+
+def _users(user_ids: Iterable[int]) -> Dict[int, User]:
+    return User.objects.select_related("profile").in_bulk({pk for pk in user_ids if pk})
+
+
+def matrix_rows(tournament: Tournament) -> Tuple[List[tuple], List[tuple]]:
+    """The players and matches rows ``ResultMatrix.build`` reads, from the archive."""
+    data = load(tournament.archive)
+    users = {
+        pk: (username, elo)
+        for pk, username, elo in User.objects.filter(
+            pk__in={row[1] for row in data["registrations"]}
+        ).values_list("pk", "username", "profile__chesscom_elo")
+    }
+    players = [
+        (user_id, *users[user_id], is_active)
+        for _, user_id, _, is_active in data["registrations"]
+        if user_id in users
+    ]
+    matches = [(m[1], m[2], m[3], m[4]) for m in data["matches"]]
+    return players, matches
+
+
+def archived_detail(tournament: Tournament) -> Tuple[List[TournamentRegistration], List[Round]]:
+    """
+    Active registrations and rounds of an archived tournament as unsaved
+    model instances, matches prefetched on their round: the pages render
+    them as they render the live ones.
+    """
+    data = load(tournament.archive)
+    users = _users(
+        [row[1] for row in data["registrations"]]
+        + [user_id for m in data["matches"] for user_id in m[2:4]]
+    )
+    registrations = [
+        TournamentRegistration(
+            tournament=tournament, user=users[user_id], is_active=True, joined_at=parse_datetime(joined_at)
+        )
+        for _, user_id, joined_at, is_active in data["registrations"]
+        if is_active and user_id in users
+    ]
+    boards: Dict[int, List[Match]] = {}
+    for match_id, number, white_id, black_id, result, board, *_ in data["matches"]:
+        match = Match(
+            id=match_id,
+            white_player=users.get(white_id),
+            black_player=users.get(black_id),
+            result=result,
+            board=board,
+        )
+        match.has_game = False
+        boards.setdefault(number, []).append(match)
+    rounds = []
+    for round_id, number, started_at, ended_at in data["rounds"]:
+        rnd = Round(
+            id=round_id,
+            tournament=tournament,
+            number=number,
+            started_at=parse_datetime(started_at),
+            ended_at=parse_datetime(ended_at) if ended_at else None,
+        )
+        matches = Match.objects.none()
+        matches._result_cache = boards.get(number, [])
+        matches._prefetch_done = True
+        rnd._prefetched_objects_cache = {"matches": matches}
+        for match in matches._result_cache:
+            match.round = rnd
+        rounds.append(rnd)
+    return registrations, rounds
+
+
+def archived_matches(user) -> List[Match]:
+    """Decided matches of ``user`` in archived tournaments, ``round.tournament`` set."""
+    rows = [
+        (entry.archive.tournament, m)
+        for entry in ArchivedPlayer.objects.filter(user=user)
+        .select_related("archive__tournament")
+        .defer("archive__data")
+        for m in entry.matches
+    ]
+    users = _users(user_id for _, m in rows for user_id in m[2:4])
+    matches = []
+    for tournament, (match_id, number, white_id, black_id, result, board, *_) in rows:
+        match = Match(
+            id=match_id,
+            round=Round(tournament=tournament, number=number),
+            white_player=users.get(white_id),
+            black_player=users.get(black_id),
+            result=result,
+            board=board,
+        )
+        matches.append(match)
+    return matches
+
+
+def archived_jsonl_records(tournament_id: int) -> Iterable[Dict]:
+    """Registration, round and match records of ``tournaments.exports`` from the archive."""
+    data = load(TournamentArchive.objects.get(pk=tournament_id))
+    names = dict(
+        User.objects.filter(
+            pk__in={row[1] for row in data["registrations"]}
+            | {user_id for m in data["matches"] for user_id in (m[2], m[3], m[6]) if user_id}
+        ).values_list("pk", "username")
+    )
+    for _, user_id, joined_at, is_active in data["registrations"]:
+        if user_id in names:
+            yield {
+                "type": "registration",
+                "tournament": tournament_id,
+                "user": names[user_id],
+                "joined_at": parse_datetime(joined_at),
+                "is_active": is_active,
+            }
+    for _, number, started_at, ended_at in data["rounds"]:
+        yield {
+            "type": "round",
+            "tournament": tournament_id,
+            "number": number,
+            "started_at": parse_datetime(started_at),
+            "ended_at": parse_datetime(ended_at) if ended_at else None,
+        }
+    for _, number, white_id, black_id, result, board, submitted_by_id, *_ in data["matches"]:
+        yield {
+            "type": "match",
+            "tournament": tournament_id,
+            "round": number,
+            "board": board,
+            "white": names.get(white_id),
+            "black": names.get(black_id),
+            "result": result,
+            "submitted_by": names.get(submitted_by_id),
+        }
@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .matrix import bump_state_version
+from .models import Match, Round, Tournament, TournamentRegistration
+from .page_cache import bump_page_versions
+from .tiebreaks import DEFAULT_RATING
+
+# Added to the pairing cost per earlier game between the same two players.
+REMATCH_PENALTY = 4.0
+# Score difference worth the same as 100 rating points of difference.
+SCORE_WEIGHT = 2.0
+
+_WHITE_POINTS = {Match.RESULT_WHITE: 1.0, Match.RESULT_DRAW: 0.5}
+_BLACK_POINTS = {Match.RESULT_BLACK: 1.0, Match.RESULT_DRAW: 0.5}
+
+
+class _Player:
+    __slots__ = ("score", "rating", "whites", "blacks", "last_opponent", "waiting_since")
+
+    def __init__(self, rating: int):
+        self.score = 0.0
+        self.rating = rating
+        self.whites = 0
+        self.blacks = 0
+        self.last_opponent: Optional[int] = None
+        self.waiting_since = 0.0
+
+
+class ArenaQueue:
+    """
+    Matchmaking state of one arena tournament, kept in process memory.
+
+    ``waiting`` buckets the ids of players waiting for a game by score; the
+    per-player records and the ``met`` counter of earlier pairings make the
+    pairing decision a pure in-memory computation. All access goes through
+    ``lock``. The state is rebuilt from the database on first use, so a
+    restarted process picks up where it left off.
+    """
+
+    def __init__(self, tournament_id: int):
+        self.tournament_id = tournament_id
+        self.ends_at = None
+        self.lock = threading.Lock()
+        self.players: Dict[int, _Player] = {}
+        self.waiting: Dict[float, Set[int]] = defaultdict(set)
+        self.met: Dict[Tuple[int, int], int] = defaultdict(int)
+
+    @staticmethod
+    def _pair_key(a: int, b: int) -> Tuple[int, int]:
+        return (a, b) if a < b else (b, a)
+
+    def load(self, tournament: Tournament) -> None:
+        started_at = (
+            Round.objects.filter(tournament=tournament, number=1)
+            .values_list("started_at", flat=True)
+            .first()
+        )
+        self.ends_at = (started_at or timezone.now()) + timedelta(
+            minutes=tournament.duration_minutes
+        )
+        regs = TournamentRegistration.objects.filter(
+            tournament=tournament, is_active=True
+        ).values_list("user_id", "user__profile__chesscom_elo")
+        for user_id, elo in regs:
+            self.players[user_id] = _Player(elo or DEFAULT_RATING)
+        busy = set()
+        matches = (
+            Match.objects.filter(round__tournament=tournament)
+            .order_by("id")
+            .values_list("white_player_id", "black_player_id", "result")
+        )
+        for white_id, black_id, result in matches:
+            if result == Match.RESULT_PENDING:
+                busy.update((white_id, black_id))
+            self._count_game(white_id, black_id, result)
+        for user_id in self.players:
+            if user_id not in busy:
+                self._enqueue(user_id)
+
+    def _count_game(self, white_id, black_id, result) -> None:
+        white, black = self.players.get(white_id), self.players.get(black_id)
+        if white is None or black is None:
+            return
+        white.whites += 1
+        black.blacks += 1
+        white.last_opponent, black.last_opponent = black_id, white_id
+        self.met[self._pair_key(white_id, black_id)] += 1
+        white.score += _WHITE_POINTS.get(result, 0)
+        black.score += _BLACK_POINTS.get(result, 0)
+
+    def _enqueue(self, user_id: int) -> None:
+        player = self.players[user_id]
+        player.waiting_since = time.monotonic()
+        self.waiting[player.score].add(user_id)
+
+    def _dequeue(self, user_id: int) -> None:
+        bucket = self.waiting.get(self.players[user_id].score)
+        if bucket:
+            bucket.discard(user_id)
+            if not bucket:
+                del self.waiting[self.players[user_id].score]
+
+    def _cost(self, a: int, b: int) -> float:
+        pa, pb = self.players[a], self.players[b]
+        cost = SCORE_WEIGHT * abs(pa.score - pb.score) + abs(pa.rating - pb.rating) / 100
+        return cost + REMATCH_PENALTY * self.met.get(self._pair_key(a, b), 0)
+
+    def _best_opponent(self, user_id: int) -> Optional[int]:
+        player = self.players[user_id]
+        alone = len(self.players) <= 2
+        best, best_cost = None, None
+        # Closest score buckets first; a bucket further away than the best cost
+        # found so far cannot hold a cheaper opponent.
+        for score in sorted(self.waiting, key=lambda s: abs(s - player.score)):
+            if best_cost is not None and SCORE_WEIGHT * abs(score - player.score) > best_cost:
+                break
+            for other in self.waiting[score]:
+                if other == user_id or (other == player.last_opponent and not alone):
+                    continue
+                cost = self._cost(user_id, other)
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = other, cost
+        return best
+
+    def _colors(self, a: int, b: int) -> Tuple[int, int]:
+        pa, pb = self.players[a], self.players[b]
+        if pa.whites - pa.blacks > pb.whites - pb.blacks:
+            return b, a
+        if pb.whites - pb.blacks > pa.whites - pa.blacks:
+            return a, b
+        return (a, b) if pa.waiting_since <= pb.waiting_since else (b, a)
+
+    def pair_waiting(self) -> List[Tuple[int, int]]:
+        """
+        Pair waiting players, longest-waiting first; unpaired players keep
+        waiting. Colours and opponents are only counted by ``count_pairings``
+        once the games exist: a pairing may still be refused.
+        """
+        pairings = []
+        queue = sorted(
+            (uid for bucket in self.waiting.values() for uid in bucket),
+            key=lambda uid: self.players[uid].waiting_since,
+        )
+        for user_id in queue:
+            if user_id not in self.waiting.get(self.players[user_id].score, ()):
+                continue
+            opponent = self._best_opponent(user_id)
+            if opponent is None:
+                continue
+            self._dequeue(user_id)
+            self._dequeue(opponent)
+            pairings.append(self._colors(user_id, opponent))
+        return pairings
+
+    def count_pairings(self, pairings: Iterable[Tuple[int, int]]) -> None:
+        for white_id, black_id in pairings:
+            self._count_game(white_id, black_id, Match.RESULT_PENDING)
+
+    def _add_points(self, user_id: int, points: float) -> None:
+        player = self.players.get(user_id)
+        if player is None or not points:
+            return
+        waiting = user_id in self.waiting.get(player.score, ())
+        self._dequeue(user_id)
+        player.score += points
+        if waiting:
+            self.waiting[player.score].add(user_id)
+
+    def record_result(self, white_id: int, black_id: int, result: str, sign: int = 1) -> None:
+        """Add (or with ``sign=-1`` remove) the points of a result."""
+        self._add_points(white_id, sign * _WHITE_POINTS.get(result, 0))
+        self._add_points(black_id, sign * _BLACK_POINTS.get(result, 0))
+
+    def requeue(self, *user_ids: int) -> None:
+        for user_id in user_ids:
+            player = self.players.get(user_id)
+            if player is not None and user_id not in self.waiting.get(player.score, ()):
+                self._enqueue(user_id)
+
+
+_queues: Dict[int, ArenaQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(tournament: Tournament) -> ArenaQueue:
+    with _queues_lock:
+        # Arenas that ended (possibly completed by another process): their
+        # queue is rebuilt from the database if a late result needs it.
+        now = timezone.now()
+        for tournament_id in [k for k, q in _queues.items() if q.ends_at < now and k != tournament.pk]:
+            del _queues[tournament_id]
+        queue = _queues.get(tournament.pk)
+        if queue is None:
+            queue = _queues[tournament.pk] = ArenaQueue(tournament.pk)
+            queue.load(tournament)
+        return queue
+
+
+def drop_queue(tournament: Tournament) -> None:
+    with _queues_lock:
+        _queues.pop(tournament.pk, None)
+
+
+def is_open(tournament: Tournament, queue: ArenaQueue) -> bool:
+    return tournament.is_running and timezone.now() < queue.ends_at
+
+
+@transaction.atomic
+def _create_games(
+    tournament: Tournament, queue: ArenaQueue, pairings: List[Tuple[int, int]]
+) -> List[Match]:
+    if not pairings:
+        return []
+    rnd = tournament.rounds.get(number=1)
+    # The queue is per process: refuse a pairing if another process already
+    # gave one of these players a game, and put the other player back. The
+    # players' registrations stay locked until the games are committed, so
+    # two processes cannot both pass the check for the same player.
+    ids = {uid for pair in pairings for uid in pair}
+    list(
+        TournamentRegistration.objects.select_for_update()
+        .filter(tournament=tournament, user_id__in=ids)
+        .order_by("user_id")
+        .values_list("pk", flat=True)
+    )
+    busy = set()
+    for white_id, black_id in Match.objects.filter(
+        Q(white_player_id__in=ids) | Q(black_player_id__in=ids),
+        round=rnd,
+        result=Match.RESULT_PENDING,
+    ).values_list("white_player_id", "black_player_id"):
+        busy.update((white_id, black_id))
+    games = []
+    for white, black in pairings:
+        if white in busy or black in busy:
+            with queue.lock:
+                queue.requeue(*(uid for uid in (white, black) if uid not in busy))
+            continue
+        games.append(Match(round=rnd, white_player_id=white, black_player_id=black))
+    games = Match.objects.bulk_create(games)
+    with queue.lock:
+        queue.count_pairings((game.white_player_id, game.black_player_id) for game in games)
+    bump_state_version(tournament.pk)
+    bump_page_versions(tournament.pk)
+    return games
+
+
+@transaction.atomic
+def start_arena(tournament: Tournament) -> Round:
+    """Open the single arena round and pair everybody who is registered."""
+    round_obj, _ = Round.objects.get_or_create(tournament=tournament, number=1)
+    tournament.current_round = 1
+    tournament.rounds_planned = 1
+    tournament.save(update_fields=["current_round", "rounds_planned"])
+    drop_queue(tournament)
+    queue = get_queue(tournament)
+    with queue.lock:
+        pairings = queue.pair_waiting()
+    _create_games(tournament, queue, pairings)
+    return round_obj
+
+
+def on_results(tournament: Tournament, finished: Iterable[Tuple[Match, str]]) -> bool:
+    """
+    Feed finished games back into the queue and pair again right away.
+
+    ``finished`` holds each updated match with its result before the update;
+    only games that were pending put their players back in the queue, and
+    only while the arena is open. Returns whether the arena is still open.
+    """
+    queue = get_queue(tournament)
+    with queue.lock:
+        still_open = is_open(tournament, queue)
+        for match, previous in finished:
+            white_id, black_id = match.white_player_id, match.black_player_id
+            queue.record_result(white_id, black_id, previous, sign=-1)
+            queue.record_result(white_id, black_id, match.result)
+            if still_open and previous == Match.RESULT_PENDING:
+                queue.requeue(white_id, black_id)
+        pairings = queue.pair_waiting() if still_open else []
+    _create_games(tournament, queue, pairings)
+    return still_open
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+from typing import Dict, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from .models import Match, Tournament, TournamentRegistration
+from .matrix import bump_state_version
+from .page_cache import bump_page_versions
+from .services import can_submit_result
+
+User = get_user_model()
+
+# Accepted spellings for a result, mapped to Match.RESULT_* codes.
+RESULT_ALIASES = {
+    Match.RESULT_WHITE: Match.RESULT_WHITE,
+    Match.RESULT_BLACK: Match.RESULT_BLACK,
+    Match.RESULT_DRAW: Match.RESULT_DRAW,
+    "1-0": Match.RESULT_WHITE,
+    "0-1": Match.RESULT_BLACK,
+    "1/2-1/2": Match.RESULT_DRAW,
+    "½-½": Match.RESULT_DRAW,
+    "=": Match.RESULT_DRAW,
+    "blancs": Match.RESULT_WHITE,
+    "noirs": Match.RESULT_BLACK,
+    "nulle": Match.RESULT_DRAW,
+}
+
+
+class BulkError(ValueError):
+    """Raised with every problem found in a bulk payload, one message per row."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def parse_rows(text: str) -> List[Dict[str, str]]:
+    """
+    Parse a pasted or uploaded payload into a list of dicts.
+
+    JSON may be a list of objects (or of plain strings, read as usernames) or an
+    object wrapping such a list under ``rows``. Anything else is read as CSV
+    with a header line.
+    """
+    text = text.strip().lstrip("\ufeff")
+    if not text:
+        return []
+    if text[0] in "[{":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise BulkError([f"JSON invalide : {exc}"])
+        if isinstance(data, dict):
+            data = data.get("rows", [])
+        if not isinstance(data, list):
+            raise BulkError(["Le JSON doit être une liste de lignes."])
+        rows = []
+        for item in data:
+            if isinstance(item, str):
+                item = {"username": item}
+            if not isinstance(item, dict):
+                raise BulkError([f"Ligne JSON invalide : {item!r}"])
+            rows.append({str(k).strip().lower(): str(v).strip() for k, v in item.items() if v is not None})
+        return rows
+    reader = csv.DictReader(io.StringIO(text))
+    return [
+        {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        for row in reader
+    ]
+
+
+def validate_results(
+    tournament: Tournament, rows: List[Dict[str, str]], user
+) -> List[Tuple[Match, str]]:
+    """
+    Resolve each row to a match of ``tournament`` and a result code.
+
+    A row names its match either by ``match`` (id) or by ``white`` and ``black``
+    usernames within the current round. Nothing is written: every row is checked
+    and all problems are raised together.
+    """
+    matches = {
+        m.pk: m
+        for m in Match.objects.filter(round__tournament=tournament).select_related(
+            "round", "white_player", "black_player"
+        )
+    }
+    by_pair = {
+        (m.white_player.username.lower(), m.black_player.username.lower()): m
+        for m in matches.values()
+        if m.round.number == tournament.current_round and m.white_player and m.black_player
+    }
+
+    errors: List[str] = []
+    updates: List[Tuple[Match, str]] = []
+    seen = set()
+    for line, row in enumerate(rows, start=1):
+        raw_result = row.get("result", "").lower()
+        result = RESULT_ALIASES.get(raw_result)
+        if result is None:
+            errors.append(f"Ligne {line} : résultat inconnu « {raw_result} ».")
+            continue
+        if result == Match.RESULT_DRAW and tournament.is_knockout:
+            errors.append(f"Ligne {line} : pas de nulle en élimination directe.")
+            continue
+        match = None
+        if row.get("match"):
+            try:
+                match = matches.get(int(row["match"]))
+            except ValueError:
+                pass
+            if match is None:
+                errors.append(f"Ligne {line} : match « {row['match']} » introuvable dans ce tournoi.")
+                continue
+        else:
+            pair = (row.get("white", "").lower(), row.get("black", "").lower())
+            match = by_pair.get(pair)
+            if match is None:
+                errors.append(
+                    f"Ligne {line} : aucun match {pair[0] or '?'} - {pair[1] or '?'} au round {tournament.current_round}."
+                )
+                continue
+        if match.pk in seen:
+            errors.append(f"Ligne {line} : le match {match.pk} apparaît plusieurs fois.")
+            continue
+        if not can_submit_result(tournament, match, user):
+            errors.append(f"Ligne {line} : résultat non modifiable pour le match {match.pk}.")
+            continue
+        seen.add(match.pk)
+        updates.append((match, result))
+
+    if errors:
+        raise BulkError(errors)
+    return updates
+
+
+def validate_registrations(tournament: Tournament, rows: List[Dict[str, str]]) -> List[User]:
+    if not tournament.can_edit_setup():
+        raise BulkError(["Les inscriptions de ce tournoi ne sont plus modifiables."])
+    usernames = [row.get("username", "") for row in rows]
+    users = {
+        u.username.lower(): u
+        for u in User.objects.annotate(username_lower=Lower("username"))
+        .filter(username_lower__in={name.lower() for name in usernames})
+        .select_related("profile")
+    }
+
+    errors: List[str] = []
+    selected: Dict[int, User] = {}
+    for line, username in enumerate(usernames, start=1):
+        user = users.get(username.lower())
+        if not username:
+            errors.append(f"Ligne {line} : pseudo manquant.")
+        elif user is None:
+            errors.append(f"Ligne {line} : compte « {username} » introuvable.")
+        elif user.profile.is_banned:
+            errors.append(f"Ligne {line} : {user.username} est banni des inscriptions.")
+        else:
+            selected[user.pk] = user
+    if errors:
+        raise BulkError(errors)
+    return list(selected.values())
+
+
+@transaction.atomic
+def apply_registrations(tournament: Tournament, users: List[User]) -> int:
+    """
+    Register ``users`` with one UPDATE for returning players and one INSERT
+    for new ones. Returns the number of registrations created or reactivated;
+    players already registered are left alone and not counted.
+    """
+    ids = [u.pk for u in users]
+    existing = set(
+        TournamentRegistration.objects.filter(tournament=tournament, user_id__in=ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    reactivated = TournamentRegistration.objects.filter(
+        tournament=tournament, user_id__in=existing, is_active=False
+    ).update(is_active=True)
+    created = TournamentRegistration.objects.bulk_create(
+        [TournamentRegistration(tournament=tournament, user=u) for u in users if u.pk not in existing]
+    )
+    if reactivated or created:
+        bump_state_version(tournament.pk)
+        bump_page_versions(tournament.pk)
+    return reactivated + len(created)
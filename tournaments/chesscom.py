@@ -0,0 +1,224 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .matrix import bump_player_tournaments
+from .metrics import CHESSCOM_REQUESTS
+from .models import PlayerProfile
+from .page_cache import bump_page_versions
+from .user_cache import forget_user
+
+# A response is kept this long, to be revalidated once its max-age is over.
+RESPONSE_CACHE_TIMEOUT = 7 * 24 * 3600
+# Attempts per player when the API answers 429 or fails to respond.
+MAX_ATTEMPTS = 3
+# Wait when a 429 comes without a usable Retry-After, in seconds.
+DEFAULT_RETRY_AFTER = 5.0
+# Longest Retry-After honoured: beyond it the player is skipped this run.
+MAX_RETRY_AFTER = 120.0
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _cache_key(username: str) -> str:
+    return f"chesscom:stats:{username.lower()}"
+
+
+def _retry_after(value: Optional[str]) -> float:
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+def rating_from_stats(stats: Dict, kind: str) -> Optional[int]:
+    """Current rating of the ``kind`` category (e.g. ``chess_rapid``) in a /stats response."""
+    rating = (stats.get(kind) or {}).get("last", {}).get("rating")
+    return rating if isinstance(rating, int) and rating > 0 else None
+
+
+@dataclass
+class SyncReport:
+    requested: int = 0
+    # Served from the response cache, without a request.
+    cached: int = 0
+    # Revalidated with a conditional request answered 304.
+    not_modified: int = 0
+    fetched: int = 0
+    updated: int = 0
+    unknown: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+
+
+class _Client:
+    """
+    Fetches /player/<username>/stats with at most ``concurrency`` requests
+    in flight. ``requests`` is blocking: each call runs in a worker thread
+    while the event loop schedules them. A 429 pauses every worker for the
+    Retry-After the API asked for, not only the one that received it.
+    """
+
+    def __init__(self, base_url: str, concurrency: int, report: SyncReport):
+        self.base_url = base_url.rstrip("/")
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.report = report
+        self.paused_until = 0.0
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = _setting(
+            "CHESSCOM_USER_AGENT", "Chesseirb rating sync"
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.get = sync_to_async(self.session.get, thread_sensitive=False)
+
+    async def stats(self, username: str) -> Optional[Dict]:
+        """The player's stats, or None when the account does not exist or the API keeps failing."""
+        key = _cache_key(username)
+        entry = await cache.aget(key)
+        if entry and entry["expires"] > time.time():
+            self.report.cached += 1
+            return entry["stats"]
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        for _ in range(MAX_ATTEMPTS):
+            async with self.semaphore:
+                wait = self.paused_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    response = await self.get(
+                        f"{self.base_url}/player/{quote(username.lower(), safe='')}/stats",
+                        headers=headers,
+                        timeout=10,
+                    )
+                except requests.RequestException:
+                    CHESSCOM_REQUESTS.inc(status="error")
+                    continue
+            CHESSCOM_REQUESTS.inc(status=str(response.status_code))
+            if response.status_code == 429:
+                delay = _retry_after(response.headers.get("Retry-After"))
+                if delay > MAX_RETRY_AFTER:
+                    break
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                continue
+            if response.status_code == 304 and entry:
+                self.report.not_modified += 1
+                await self._store(key, entry["stats"], response, entry)
+                return entry["stats"]
+            if response.status_code in (404, 410):
+                self.report.unknown.append(username)
+                return None
+            if response.status_code != 200:
+                continue
+            try:
+                stats = response.json()
+            except ValueError:
+                continue
+            self.report.fetched += 1
+            await self._store(key, stats, response)
+            return stats
+        self.report.failed.append(username)
+        return None
+
+    async def _store(self, key: str, stats: Dict, response, previous: Optional[Dict] = None) -> None:
+        previous = previous or {}
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        await cache.aset(
+            key,
+            {
+                "stats": stats,
+                "etag": response.headers.get("ETag", previous.get("etag")),
+                "last_modified": response.headers.get("Last-Modified", previous.get("last_modified")),
+                "expires": time.time() + (int(match.group(1)) if match else 0),
+            },
+            RESPONSE_CACHE_TIMEOUT,
+        )
+
+
+async def _fetch_all(usernames: List[str], base_url: str, concurrency: int, report: SyncReport):
+    client = _Client(base_url, concurrency, report)
+    try:
+        results = await asyncio.gather(*(client.stats(username) for username in usernames))
+    finally:
+        client.session.close()
+    return dict(zip(usernames, results))
+
+
+def sync_ratings(
+    base_url: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    kind: Optional[str] = None,
+) -> SyncReport:
+    """
+    Refresh ``chesscom_elo`` of every profile with a chess.com username and
+    write the changes in one bulk UPDATE. The bulk update sends no signals:
+    the matrices and pages of the players' tournaments, and the cached
+    users, are invalidated here instead.
+    """
+    base_url = base_url or _setting("CHESSCOM_API_BASE", "https://api.chess.com/pub")
+    concurrency = concurrency or _setting("CHESSCOM_CONCURRENCY", 4)
+    kind = kind or _setting("CHESSCOM_RATING", "chess_rapid")
+    profiles = list(
+        PlayerProfile.objects.exclude(chesscom_username="").only(
+            "user_id", "chesscom_username", "chesscom_elo"
+        )
+    )
+    report = SyncReport(requested=len(profiles))
+    usernames = sorted({p.chesscom_username.strip() for p in profiles})
+    stats = asyncio.run(_fetch_all(usernames, base_url, concurrency, report))
+
+    now = timezone.now()
+    synced, changed = [], []
+    for profile in profiles:
+        player_stats = stats.get(profile.chesscom_username.strip())
+        if player_stats is None:
+            continue
+        rating = rating_from_stats(player_stats, kind)
+        profile.chesscom_synced_at = now
+        synced.append(profile)
+        if rating is not None and rating != profile.chesscom_elo:
+            profile.chesscom_elo = rating
+            changed.append(profile)
+    report.updated = len(changed)
+
+    with transaction.atomic():
+        PlayerProfile.objects.bulk_update(changed, ["chesscom_elo", "chesscom_synced_at"], batch_size=500)
+        changed_ids = {p.pk for p in changed}
+        PlayerProfile.objects.filter(pk__in=[p.pk for p in synced if p.pk not in changed_ids]).update(
+            chesscom_synced_at=now
+        )
+        if changed:
+            user_ids = [p.user_id for p in changed]
+            tournament_ids = bump_player_tournaments(user_ids)
+            bump_page_versions()
+            for tournament_id in tournament_ids:
+                bump_page_versions(tournament_id)
+            for user_id in user_ids:
+                forget_user(user_id)
+    return report
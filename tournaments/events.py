@@ -0,0 +1,112 @@
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.db import transaction
+
+from .head_to_head import apply_result_events, reset_head_to_head
+from .models import ConsumerCursor, Match, ResultEvent
+
+BATCH_SIZE = 2000
+
+
+class Consumer(NamedTuple):
+    """A table derived from the result log: ``apply`` folds in a batch of new events in log order."""
+
+    name: str
+    apply: Callable[[List[ResultEvent]], None]
+    reset: Callable[[], None]
+
+
+CONSUMERS: Tuple[Consumer, ...] = (
+    Consumer("head_to_head", apply_result_events, reset_head_to_head),
+)
+
+
+def _batches(events: Iterable[ResultEvent], size: int) -> Iterator[List[ResultEvent]]:
+    events = iter(events)
+    while batch := list(islice(events, size)):
+        yield batch
+
+
+def _lock_cursors() -> Dict[str, ConsumerCursor]:
+    """
+    Lock every cursor for the rest of the transaction. Writers of the log
+    take these locks before appending, so events are committed in id order
+    and a consumer never moves past an id still to be committed.
+    """
+    cursors = {c.name: c for c in ConsumerCursor.objects.select_for_update()}
+    for consumer in CONSUMERS:
+        if consumer.name not in cursors:
+            cursors[consumer.name], _ = ConsumerCursor.objects.get_or_create(name=consumer.name)
+    return cursors
+
+
+def log_results(tournament_id: int, changes: Iterable[Tuple[Match, str]], catch_up: bool = True) -> int:
+    """
+    Append one event per ``(match, previous_result)`` change, in the caller's
+    transaction, then bring every consumer up to date unless ``catch_up`` is
+    False (bulk writers append first and call ``catch_up_all`` once).
+    Returns the number of events.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("log_results must run in the transaction that writes the results.")
+    _lock_cursors()
+    events = ResultEvent.objects.bulk_create(
+        (
+            ResultEvent(
+                tournament_id=tournament_id,
+                match_id=match.pk,
+                white_player_id=match.white_player_id,
+                black_player_id=match.black_player_id,
+                previous_result=previous,
+                result=match.result,
+                submitted_by_id=match.submitted_by_id,
+                created_at=match.updated_at,
+            )
+            for match, previous in changes
+        ),
+        batch_size=500,
+    )
+    if catch_up:
+        catch_up_all()
+    return len(events)
+
+
+@transaction.atomic
+def catch_up_all() -> int:
+    """Apply to each consumer the events past its cursor. Returns the number of events applied."""
+    cursors = _lock_cursors()
+    applied = 0
+    for consumer in CONSUMERS:
+        cursor = cursors[consumer.name]
+        pending = ResultEvent.objects.filter(pk__gt=cursor.position).order_by("pk")
+        for batch in _batches(pending.iterator(chunk_size=BATCH_SIZE), BATCH_SIZE):
+            consumer.apply(batch)
+            cursor.position = batch[-1].pk
+            applied += len(batch)
+        cursor.save(update_fields=["position", "updated_at"])
+    return applied
+
+
+@transaction.atomic
+def replay(names: Optional[Sequence[str]] = None) -> int:
+    """
+    Rebuild the consumers (all, or those named) from an empty state, reading
+    the log once in id order. Returns the number of events replayed.
+    """
+    consumers = [c for c in CONSUMERS if names is None or c.name in names]
+    cursors = _lock_cursors()
+    for consumer in consumers:
+        consumer.reset()
+    count, position = 0, 0
+    events = ResultEvent.objects.order_by("pk").iterator(chunk_size=BATCH_SIZE)
+    for batch in _batches(events, BATCH_SIZE):
+        for consumer in consumers:
+            consumer.apply(batch)
+        count += len(batch)
+        position = batch[-1].pk
+    for consumer in consumers:
+        cursor = cursors[consumer.name]
+        cursor.position = position
+        cursor.save(update_fields=["position", "updated_at"])
+    return count
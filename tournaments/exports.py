@@ -0,0 +1,313 @@
+import gzip
+import json
+import zlib
+from datetime import datetime
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import archived_jsonl_records
+from .events import catch_up_all, log_results
+from .matrix import BYE, DRAW, LOSS, NOT_PLAYED, PENDING, WHITE, WIN, ResultMatrix
+from .models import Match, Round, Tournament, TournamentRegistration
+from .page_cache import bump_page_versions
+from .tiebreaks import ranking
+
+User = get_user_model()
+
+CHUNK_SIZE = 2000
+TOURNAMENT_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "start_datetime",
+    "rounds_planned",
+    "mode",
+    "format",
+    "duration_minutes",
+    "status",
+    "current_round",
+    "tiebreaks",
+)
+
+
+# --- JSON Lines ------------------------------------------------------------
+#
+# One JSON object per line, tagged by "type". Each tournament line is followed
+# by all of its registrations, rounds and matches, so a reader never needs more
+# than the current tournament in memory. Players are referenced by username.
+
+
+def iter_jsonl_records(tournaments) -> Iterator[Dict]:
+    for t in tournaments.values(*TOURNAMENT_FIELDS, "created_by__username", "archived_at").iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        t["created_by"] = t.pop("created_by__username")
+        archived = t.pop("archived_at")
+        yield {"type": "tournament", **t}
+        if archived:
+            yield from archived_jsonl_records(t["id"])
+            continue
+
+        regs = TournamentRegistration.objects.filter(tournament_id=t["id"]).values_list(
+            "user__username", "joined_at", "is_active"
+        )
+        for username, joined_at, is_active in regs.iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                "type": "registration",
+                "tournament": t["id"],
+                "user": username,
+                "joined_at": joined_at,
+                "is_active": is_active,
+            }
+
+        rounds = Round.objects.filter(tournament_id=t["id"]).values_list(
+            "number", "started_at", "ended_at"
+        )
+        for number, started_at, ended_at in rounds.iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                "type": "round",
+                "tournament": t["id"],
+                "number": number,
+                "started_at": started_at,
+                "ended_at": ended_at,
+            }
+
+        matches = (
+            Match.objects.filter(round__tournament_id=t["id"])
+            .order_by("round__number", "id")
+            .values_list(
+                "round__number",
+                "board",
+                "white_player__username",
+                "black_player__username",
+                "result",
+                "submitted_by__username",
+            )
+        )
+        for number, board, white, black, result, submitted_by in matches.iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                "type": "match",
+                "tournament": t["id"],
+                "round": number,
+                "board": board,
+                "white": white,
+                "black": black,
+                "result": result,
+                "submitted_by": submitted_by,
+            }
+
+
+def iter_jsonl(tournaments) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for record in iter_jsonl_records(tournaments):
+        yield encoder.encode(record) + "\n"
+
+
+def gzip_stream(lines: Iterable[str], flush_every: int = 64 * 1024) -> Iterator[bytes]:
+    """Compress ``lines`` into a gzip member, yielding output roughly every ``flush_every`` input bytes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        pending += len(data)
+        out = compressor.compress(data)
+        if pending >= flush_every:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+# --- TRF (FIDE Tournament Report File, TRF16) ------------------------------
+
+TRF_RESULTS = {WIN: "1", DRAW: "=", LOSS: "0", BYE: "U", PENDING: " "}
+TRF_TYPES = {
+    Tournament.FORMAT_SWISS: "Swiss-System",
+    Tournament.FORMAT_ARENA: "Arena",
+    Tournament.FORMAT_ROUND_ROBIN: "Round-Robin",
+    Tournament.FORMAT_KNOCKOUT: "Knockout",
+}
+
+
+def iter_trf(tournament: Tournament) -> Iterator[str]:
+    """
+    Yield the TRF16 report of one tournament line by line. Starting ranks follow
+    registration order, final ranks the tournament's tiebreak order; arena
+    games are listed in the order each player played them.
+    """
+    matrix = ResultMatrix.cached(tournament)
+    order, scores, _ = ranking(matrix)
+    start_rank = {i: n for n, i in enumerate(sorted(order), start=1)}
+    final_rank = {i: n for n, i in enumerate(order, start=1)}
+    rounds = matrix.rounds
+
+    yield f"012 {tournament.name}\n"
+    yield f"042 {timezone.localtime(tournament.start_datetime):%Y/%m/%d}\n"
+    yield f"062 {len(order)}\n"
+    yield f"092 Individual: {TRF_TYPES[tournament.format]}\n"
+    for i in sorted(order):
+        elo = matrix.ratings[i]
+        line = (
+            f"001 {start_rank[i]:4d}      "
+            f"{matrix.usernames[i][:33]:<33} {f'{elo:4d}' if elo else '':4} {'':3} {'':11} {'':10} "
+            f"{scores[i]:4.1f} {final_rank[i]:4d}"
+        )
+        for cell in range(i * rounds, (i + 1) * rounds):
+            outcome = matrix.outcome[cell]
+            if outcome == NOT_PLAYED:
+                line += " " * 10
+            elif outcome == BYE:
+                line += "  0000 - U"
+            else:
+                color = "w" if matrix.color[cell] == WHITE else "b"
+                opp = start_rank.get(matrix.opponent[cell], 0)
+                line += f"  {opp:4d} {color} {TRF_RESULTS[outcome]}"
+        yield line.rstrip() + "\n"
+
+
+def iter_trf_many(tournaments) -> Iterator[str]:
+    """Concatenate the TRF reports of ``tournaments``, separated by a blank line."""
+    first = True
+    for tournament in tournaments.iterator(chunk_size=CHUNK_SIZE):
+        if not first:
+            yield "\n"
+        first = False
+        yield from iter_trf(tournament)
+
+
+# --- Import ----------------------------------------------------------------
+
+
+class _Importer:
+    """
+    Rebuild tournaments from a JSON Lines stream written by ``iter_jsonl``.
+
+    Rows are buffered and inserted with ``bulk_create`` in batches of
+    ``batch_size``; only the username -> id map and the current tournament's
+    round ids are kept between batches. Unknown usernames get an account with
+    an unusable password.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.users: Dict[str, int] = {}
+        self.tournament: Optional[Tournament] = None
+        self.tournaments: List[int] = []
+        self.round_ids: Dict[int, int] = {}
+        self.registrations: List[TournamentRegistration] = []
+        self.joined_at: List[Optional[datetime]] = []
+        self.rounds: List[Round] = []
+        self.matches: List[Dict] = []
+        self.count = 0
+
+    def user_id(self, username: Optional[str]) -> Optional[int]:
+        if not username:
+            return None
+        if username not in self.users:
+            user = User.objects.filter(username=username).only("pk").first()
+            if user is None:
+                user = User(username=username)
+                user.set_unusable_password()
+                user.save()
+            self.users[username] = user.pk
+        return self.users[username]
+
+    def feed(self, record: Dict) -> None:
+        kind = record.get("type")
+        if kind == "tournament":
+            self.flush()
+            data = {k: record.get(k) for k in TOURNAMENT_FIELDS if k != "id"}
+            data["start_datetime"] = parse_datetime(data["start_datetime"])
+            self.tournament = Tournament.objects.create(
+                created_by_id=self.user_id(record.get("created_by")), **data
+            )
+            self.round_ids = {}
+            self.tournaments.append(self.tournament.pk)
+            self.count += 1
+        elif kind == "registration":
+            self.registrations.append(
+                TournamentRegistration(
+                    tournament=self.tournament,
+                    user_id=self.user_id(record["user"]),
+                    is_active=record.get("is_active", True),
+                )
+            )
+            self.joined_at.append(parse_datetime(record["joined_at"]) if record.get("joined_at") else None)
+        elif kind == "round":
+            self.rounds.append(
+                Round(
+                    tournament=self.tournament,
+                    number=record["number"],
+                    started_at=parse_datetime(record["started_at"]),
+                    ended_at=parse_datetime(record["ended_at"]) if record.get("ended_at") else None,
+                )
+            )
+        elif kind == "match":
+            self.matches.append(record)
+        if len(self.registrations) + len(self.rounds) + len(self.matches) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.registrations:
+            TournamentRegistration.objects.bulk_create(self.registrations)
+            # joined_at is auto_now_add: the exported dates are set afterwards.
+            dated = []
+            for registration, joined_at in zip(self.registrations, self.joined_at):
+                if joined_at:
+                    registration.joined_at = joined_at
+                    dated.append(registration)
+            TournamentRegistration.objects.bulk_update(dated, ["joined_at"])
+            self.registrations, self.joined_at = [], []
+        if self.rounds:
+            Round.objects.bulk_create(self.rounds)
+            self.rounds = []
+            self.round_ids = dict(
+                Round.objects.filter(tournament=self.tournament).values_list("number", "id")
+            )
+        if self.matches:
+            Match.objects.bulk_create(
+                [
+                    Match(
+                        round_id=self.round_ids[m["round"]],
+                        board=m.get("board"),
+                        white_player_id=self.user_id(m.get("white")),
+                        black_player_id=self.user_id(m.get("black")),
+                        result=m["result"],
+                        submitted_by_id=self.user_id(m.get("submitted_by")),
+                    )
+                    for m in self.matches
+                ]
+            )
+            self.matches = []
+
+
+@transaction.atomic
+def import_jsonl(stream: IO[bytes], batch_size: int = CHUNK_SIZE) -> int:
+    """Import a (optionally gzip-compressed) JSON Lines export; return the number of tournaments created."""
+    head = stream.peek(2)[:2] if hasattr(stream, "peek") else b""
+    if head == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream)
+    importer = _Importer(batch_size)
+    for line in stream:
+        line = line.strip()
+        if line:
+            importer.feed(json.loads(line))
+    importer.flush()
+    for tournament_id in importer.tournaments:
+        decided = Match.objects.filter(round__tournament_id=tournament_id).exclude(
+            result=Match.RESULT_PENDING
+        )
+        log_results(
+            tournament_id,
+            ((match, Match.RESULT_PENDING) for match in decided.iterator(chunk_size=CHUNK_SIZE)),
+            catch_up=False,
+        )
+    catch_up_all()
+    bump_page_versions()
+    return importer.count
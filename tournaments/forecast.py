@@ -0,0 +1,238 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .matrix import POINTS, ResultMatrix
+from .metrics import record_cache
+from .models import Match, Tournament
+from .tiebreaks import DEFAULT_RATING
+
+# Fixed, so that every visitor shares one cached forecast per tournament state.
+SIMULATIONS = 2000
+# Share of draws between equally rated players; fewer as the gap grows.
+DRAW_RATE = 0.2
+# Seconds a request may hold the right to compute a tournament's forecast.
+LOCK_TIMEOUT = 30
+
+# A knockout board is (white, black, pending); an unknown player is -1 and
+# is filled in with the simulated winner of the feeding board.
+Board = Tuple[int, int, bool]
+
+
+class ForecastModel:
+    """
+    Input of the simulation: current scores and ratings by player
+    index, the games already scheduled (and the byes of rounds not opened
+    yet) and, for a Swiss, the number of rounds still to pair. Only active
+    players are simulated and ranked.
+    """
+
+    __slots__ = ("scores", "ratings", "players", "fixed", "byes", "extra_rounds", "bracket")
+
+    def __init__(self, scores, ratings, players, fixed, extra_rounds=0, bracket=None, byes=()):
+        self.scores: List[float] = scores
+        self.ratings: List[int] = ratings
+        self.players: List[int] = players
+        self.fixed: List[Tuple[int, int]] = fixed
+        self.byes: List[int] = list(byes)
+        self.extra_rounds: int = extra_rounds
+        self.bracket: Optional[List[List[Board]]] = bracket
+
+    def games_per_run(self) -> int:
+        if self.bracket is not None:
+            return sum(pending for boards in self.bracket for _, _, pending in boards)
+        return len(self.fixed) + self.extra_rounds * (len(self.players) // 2)
+
+
+def _play(rng: np.random.Generator, ratings: np.ndarray, white, black, draws: bool) -> np.ndarray:
+    """White's points in simulated games, elementwise (Elo expectation, no colour advantage)."""
+    expected = 1 / (1 + 10 ** ((ratings[black] - ratings[white]) / 400))
+    u = rng.random(expected.shape)
+    if not draws:
+        return (u < expected).astype(float)
+    half_draw = DRAW_RATE * np.minimum(expected, 1 - expected)
+    return np.where(u < expected - half_draw, 1.0, np.where(u < expected + half_draw, 0.5, 0.0))
+
+
+def _by_score(rng: np.random.Generator, scores: np.ndarray, players: np.ndarray) -> np.ndarray:
+    """``players`` best first in every run, ties on score in random order."""
+    # Scores are multiples of 0.5: noise below that only reorders ties.
+    keys = rng.random((len(scores), len(players))) * 0.25 - scores[:, players]
+    return players[np.argsort(keys, axis=1)]
+
+
+def _run_bracket(rng, model: ForecastModel, ratings: np.ndarray, scores: np.ndarray) -> None:
+    runs = np.arange(len(scores))
+    winners: Dict[int, np.ndarray] = {}
+    missing = np.full(len(scores), -1)
+    for boards in model.bracket:
+        feeding, winners = winners, {}
+        for board, (white, black, pending) in enumerate(boards):
+            if not pending:
+                continue
+            whites = feeding.get(2 * board, missing) if white < 0 else np.full(len(scores), white)
+            blacks = feeding.get(2 * board + 1, missing) if black < 0 else np.full(len(scores), black)
+            played = (whites >= 0) & (blacks >= 0)
+            points = _play(rng, ratings, whites, blacks, draws=False)
+            winner = np.where(points > 0, whites, blacks)
+            scores[runs[played], winner[played]] += 1
+            winners[board] = np.where(played, winner, -1)
+
+
+def simulate(model: ForecastModel, runs: int, seed: Optional[int] = None) -> Tuple[List[int], List[float]]:
+    """
+    Play the rest of the tournament ``runs`` times, all runs at once: each
+    game is one array operation across the runs. Returns how often each
+    player finished at each rank (flat, ``counts[i * len(players) + rank]``)
+    and the sum of their final scores. Ties on score are split at random.
+
+    Remaining Swiss rounds pair players by simulated score, neighbours
+    together, without rematch avoidance: close enough for rank odds.
+    """
+    rng = np.random.default_rng(seed)
+    n, size = len(model.scores), len(model.players)
+    players = np.array(model.players, dtype=np.intp)
+    ratings = np.array(model.ratings, dtype=float)
+    scores = np.tile(np.array(model.scores, dtype=float), (runs, 1))
+    np.add.at(scores, (slice(None), np.array(model.byes, dtype=np.intp)), 1)
+    rows = np.arange(runs)[:, None]
+    if model.bracket is not None:
+        _run_bracket(rng, model, ratings, scores)
+    else:
+        if model.fixed:
+            white, black = (
+                np.broadcast_to(np.array(side, dtype=np.intp), (runs, len(model.fixed)))
+                for side in zip(*model.fixed)
+            )
+            points = _play(rng, ratings, white, black, draws=True)
+            # A player may have several scheduled games: add them one by one.
+            np.add.at(scores, (rows, white), points)
+            np.add.at(scores, (rows, black), 1 - points)
+        for _ in range(model.extra_rounds):
+            order = _by_score(rng, scores, players)
+            if size % 2:
+                scores[rows[:, 0], order[:, -1]] += 1
+                order = order[:, :-1]
+            white, black = order[:, 0::2], order[:, 1::2]
+            points = _play(rng, ratings, white, black, draws=True)
+            scores[rows, white] += points
+            scores[rows, black] += 1 - points
+    counts = np.zeros((n, size), dtype=np.int64)
+    if size:
+        final = _by_score(rng, scores, players)
+        np.add.at(counts, (final, np.broadcast_to(np.arange(size), final.shape)), 1)
+    score_sums = np.zeros(n)
+    score_sums[players] = scores[:, players].sum(axis=0)
+    return counts.ravel().tolist(), score_sums.tolist()
+
+
+def build_model(tournament: Tournament) -> Tuple[ResultMatrix, ForecastModel]:
+    if tournament.is_arena:
+        raise ValueError("Pas de prévision pour une arena : sa durée fixe le nombre de parties.")
+    matrix = ResultMatrix.cached(tournament)
+    rounds = matrix.rounds
+    scores = [
+        sum(POINTS[o] for o in matrix.outcome[i * rounds : (i + 1) * rounds])
+        for i in range(len(matrix))
+    ]
+    ratings = [r or DEFAULT_RATING for r in matrix.ratings]
+    players = [i for i in range(len(matrix)) if matrix.active[i]]
+    active = set(players)
+
+    scheduled = Match.objects.filter(
+        round__tournament=tournament, round__number__gte=max(tournament.current_round, 1)
+    ).order_by("round__number", "board", "id")
+    if tournament.is_knockout:
+        bracket: List[List[Board]] = []
+        current = None
+        for number, white_id, black_id, result in scheduled.values_list(
+            "round__number", "white_player_id", "black_player_id", "result"
+        ):
+            if number != current:
+                bracket.append([])
+                current = number
+            white = matrix.index.get(white_id, -1)
+            black = matrix.index.get(black_id, -1)
+            bracket[-1].append((white, black, result == Match.RESULT_PENDING))
+        return matrix, ForecastModel(scores, ratings, players, [], bracket=bracket)
+
+    fixed, byes = [], []
+    for white_id, black_id in scheduled.filter(result=Match.RESULT_PENDING).values_list(
+        "white_player_id", "black_player_id"
+    ):
+        white, black = matrix.index.get(white_id, -1), matrix.index.get(black_id, -1)
+        if white in active and black_id is None:
+            byes.append(white)
+        elif white in active and black in active:
+            fixed.append((white, black))
+    extra = 0
+    if not tournament.has_fixed_schedule:
+        extra = max(tournament.rounds_planned - tournament.current_round, 0)
+    return matrix, ForecastModel(scores, ratings, players, fixed, extra_rounds=extra, byes=byes)
+
+
+def _cache_key(tournament: Tournament) -> str:
+    # Every result write stamps updated_at, so the key changes with the
+    # first result submitted after the forecast was computed.
+    stamp = Match.objects.filter(round__tournament=tournament).aggregate(
+        last=Max("updated_at"), games=Count("id")
+    )
+    last = stamp["last"].timestamp() if stamp["last"] else 0
+    return f"forecast:{tournament.pk}:{tournament.current_round}:{stamp['games']}:{last}:{SIMULATIONS}"
+
+
+def _latest_key(tournament: Tournament) -> str:
+    return f"forecast:latest:{tournament.pk}"
+
+
+def _compute(tournament: Tournament) -> Dict:
+    runs = SIMULATIONS
+    matrix, model = build_model(tournament)
+    counts, score_sums = simulate(model, runs)
+    size = len(model.players)
+    players = []
+    for i in model.players:
+        ranks = [count / runs for count in counts[i * size : (i + 1) * size]]
+        players.append(
+            {
+                "username": matrix.usernames[i],
+                "score": model.scores[i],
+                "expected_score": round(score_sums[i] / runs, 2),
+                "win_probability": ranks[0] if ranks else 0.0,
+                "rank_probabilities": ranks,
+            }
+        )
+    players.sort(key=lambda row: (-row["expected_score"], row["username"].lower()))
+    return {
+        "simulations": runs,
+        "games_remaining": model.games_per_run(),
+        "players": players,
+    }
+
+
+def forecast(tournament: Tournament) -> Optional[Dict]:
+    """
+    Probability of each final rank for every active player, from
+    ``SIMULATIONS`` runs of the remaining games. Cached until the next result.
+
+    One request at a time computes a given state: meanwhile the others get
+    the previous forecast of the tournament, marked ``stale``, or None if
+    there is none yet.
+    """
+    key = _cache_key(tournament)
+    data = cache.get(key)
+    record_cache("forecast", data is not None)
+    if data is not None:
+        return data
+    lock = f"forecast:lock:{tournament.pk}"
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        latest = cache.get(_latest_key(tournament))
+        return dict(latest, stale=True) if latest is not None else None
+    try:
+        data = _compute(tournament)
+        cache.set_many({key: data, _latest_key(tournament): data}, None)
+    finally:
+        cache.delete(lock)
+    return data
@@ -3,6 +3,7 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 
 from .models import Match, PlayerProfile, Tournament
+from .tiebreaks import TIEBREAK_CHOICES, parse_tiebreaks
 
 User = get_user_model()
 
@@ -22,19 +23,39 @@ class TournamentForm(forms.ModelForm):
             "name",
             "description",
             "start_datetime",
+            "format",
             "rounds_planned",
+            "auto_pairing",
+            "duration_minutes",
             "mode",
             "status",
+            "tiebreaks",
         )
         widgets = {
             "start_datetime": forms.DateTimeInput(attrs={"type": "datetime-local"}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["tiebreaks"].help_text = "Ordre des départages, séparés par des virgules : " + ", ".join(
+            f"{code} ({label})" for code, label in TIEBREAK_CHOICES
+        )
+
+    def clean_tiebreaks(self):
+        try:
+            codes = parse_tiebreaks(self.cleaned_data["tiebreaks"])
+        except ValueError as exc:
+            raise forms.ValidationError(str(exc))
+        return ",".join(codes)
+
 
 class ProfileForm(forms.ModelForm):
     class Meta:
         model = PlayerProfile
-        fields = ("chesscom_elo",)
+        fields = ("chesscom_username", "chesscom_elo", "notify_pairings")
+
+    def clean_chesscom_username(self):
+        return self.cleaned_data["chesscom_username"].strip()
 
 
 class MatchResultForm(forms.ModelForm):
@@ -53,3 +74,92 @@ class MatchResultForm(forms.ModelForm):
             for code, label in Match.RESULT_CHOICES
             if code not in (Match.RESULT_PENDING, Match.RESULT_BYE)
         ]
+        if self.instance.pk and self.instance.round.tournament.is_knockout:
+            # A knockout game needs a winner.
+            self.fields["result"].choices = [
+                choice
+                for choice in self.fields["result"].choices
+                if choice[0] != Match.RESULT_DRAW
+            ]
+
+
+class BulkImportForm(forms.Form):
+    data = forms.CharField(
+        label="Données (CSV ou JSON)",
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 12}),
+    )
+    file = forms.FileField(label="ou fichier", required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        upload = cleaned.get("file")
+        if upload:
+            try:
+                cleaned["data"] = upload.read().decode("utf-8-sig")
+            except UnicodeDecodeError:
+                raise forms.ValidationError("Le fichier doit être encodé en UTF-8.")
+        if not (cleaned.get("data") or "").strip():
+            raise forms.ValidationError("Collez des données ou choisissez un fichier.")
+        return cleaned
+
+
+class PgnUploadForm(forms.Form):
+    pgn = forms.CharField(
+        label="PGN",
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 12}),
+    )
+    file = forms.FileField(label="ou fichier .pgn", required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        if not cleaned.get("file") and not (cleaned.get("pgn") or "").strip():
+            raise forms.ValidationError("Collez un PGN ou choisissez un fichier.")
+        return cleaned
+
+
+class PairingForm(forms.Form):
+    """Manual overrides of a pairing preview: White and Black of every board, and the bye."""
+
+    def __init__(self, *args, plan, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.plan = plan
+        choices = [("", "-")] + sorted(
+            ((user_id, user.username) for user_id, user in plan.players.items()),
+            key=lambda choice: choice[1].lower(),
+        )
+        for board, (white, black) in enumerate(plan.pairings, start=1):
+            self.fields[f"white_{board}"] = forms.TypedChoiceField(
+                label=f"Échiquier {board} - blancs", choices=choices, coerce=int, initial=white
+            )
+            self.fields[f"black_{board}"] = forms.TypedChoiceField(
+                label=f"Échiquier {board} - noirs", choices=choices, coerce=int, initial=black
+            )
+        self.fields["bye"] = forms.TypedChoiceField(
+            label="Exempt",
+            choices=choices,
+            coerce=int,
+            empty_value=None,
+            required=False,
+            initial=plan.bye,
+        )
+
+    def boards(self):
+        return [
+            (board, self[f"white_{board}"], self[f"black_{board}"])
+            for board in range(1, len(self.plan.pairings) + 1)
+        ]
+
+    def clean(self):
+        cleaned = super().clean()
+        if self.errors:
+            return cleaned
+        self.plan.pairings = [
+            (cleaned[f"white_{board}"], cleaned[f"black_{board}"])
+            for board in range(1, len(self.plan.pairings) + 1)
+        ]
+        self.plan.bye = cleaned["bye"]
+        for error in self.plan.errors():
+            self.add_error(None, error)
+        return cleaned
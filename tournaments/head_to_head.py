@@ -0,0 +1,90 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from .models import HeadToHead, Match, ResultEvent
+
+Pair = Tuple[int, int]
+
+# (wins, draws, losses) of White and of Black for each decided result.
+_WHITE_RECORD = {
+    Match.RESULT_WHITE: (1, 0, 0),
+    Match.RESULT_DRAW: (0, 1, 0),
+    Match.RESULT_BLACK: (0, 0, 1),
+}
+_BLACK_RECORD = {
+    Match.RESULT_WHITE: (0, 0, 1),
+    Match.RESULT_DRAW: (0, 1, 0),
+    Match.RESULT_BLACK: (1, 0, 0),
+}
+
+
+def _add(deltas, white_id, black_id, result, sign, played_at):
+    for pair, record in (
+        ((white_id, black_id), _WHITE_RECORD.get(result)),
+        ((black_id, white_id), _BLACK_RECORD.get(result)),
+    ):
+        if record is None:
+            continue
+        delta = deltas[pair]
+        for k in range(3):
+            delta[k] += sign * record[k]
+        if sign > 0 and played_at and (delta[3] is None or played_at > delta[3]):
+            delta[3] = played_at
+
+
+def _new_deltas() -> Dict[Pair, List]:
+    return defaultdict(lambda: [0, 0, 0, None])
+
+
+def apply_result_events(events: Iterable[ResultEvent]) -> None:
+    """
+    Consumer of the result log: each event takes its previous result back
+    and adds the new one, touching only the affected pairs with one SELECT
+    and at most one INSERT and one UPDATE per batch.
+    """
+    deltas = _new_deltas()
+    for event in events:
+        if not event.white_player_id or not event.black_player_id:
+            continue
+        _add(deltas, event.white_player_id, event.black_player_id, event.previous_result, -1, None)
+        _add(deltas, event.white_player_id, event.black_player_id, event.result, 1, event.created_at)
+    deltas = {pair: d for pair, d in deltas.items() if any(d[:3]) or d[3]}
+    if not deltas:
+        return
+    rows = {
+        (row.player_id, row.opponent_id): row
+        for row in HeadToHead.objects.select_for_update().filter(
+            player_id__in={player_id for player_id, _ in deltas},
+            opponent_id__in={opponent_id for _, opponent_id in deltas},
+        )
+    }
+    to_create, to_update = [], []
+    for (player_id, opponent_id), (wins, draws, losses, played_at) in deltas.items():
+        row = rows.get((player_id, opponent_id))
+        if row is None:
+            row = HeadToHead(player_id=player_id, opponent_id=opponent_id)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        row.wins = max(row.wins + wins, 0)
+        row.draws = max(row.draws + draws, 0)
+        row.losses = max(row.losses + losses, 0)
+        if played_at and (row.last_played is None or played_at > row.last_played):
+            row.last_played = played_at
+    HeadToHead.objects.bulk_create(to_create)
+    HeadToHead.objects.bulk_update(to_update, ["wins", "draws", "losses", "last_played"])
+
+
+def reset_head_to_head() -> None:
+    HeadToHead.objects.all().delete()
+
+
+def head_to_head(player_id: int, opponent_id: int) -> Dict:
+    row = HeadToHead.objects.filter(player_id=player_id, opponent_id=opponent_id).first()
+    return {
+        "wins": row.wins if row else 0,
+        "draws": row.draws if row else 0,
+        "losses": row.losses if row else 0,
+        "games": row.games if row else 0,
+        "last_played": row.last_played if row else None,
+    }
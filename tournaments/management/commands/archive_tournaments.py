@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tournaments.archive import archivable, archive_tournament, restore_tournament
+from tournaments.models import Tournament
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive les tournois terminés depuis plus de --months mois "
+        "(ARCHIVE_AFTER_MONTHS par défaut), ou en restaure avec --restore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int)
+        parser.add_argument("--dry-run", action="store_true", help="Lister sans archiver.")
+        parser.add_argument(
+            "--restore", type=int, nargs="+", metavar="ID", help="Remettre ces tournois en ligne."
+        )
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            for tournament in Tournament.objects.filter(pk__in=options["restore"]):
+                try:
+                    restore_tournament(tournament)
+                except ValueError as exc:
+                    raise CommandError(f"{tournament} : {exc}")
+                self.stdout.write(f"{tournament} restauré.")
+            return
+
+        count = size = 0
+        for tournament in archivable(options["months"]).iterator():
+            if options["dry_run"]:
+                self.stdout.write(f"{tournament} (terminé le {tournament.finished_at:%d/%m/%Y})")
+                continue
+            archive = archive_tournament(tournament)
+            count += 1
+            size += len(archive.data)
+        if not options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"{count} tournoi(s) archivé(s), {size / 1024:.1f} Kio compressés.")
+            )
@@ -0,0 +1,49 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = ["/", "/running/", "/completed/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit et la latence des pages en lecture sur un serveur lancé "
+        "(à comparer entre gunicorn chesseirb.wsgi et uvicorn chesseirb.asgi)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="Ex. http://127.0.0.1:8000")
+        parser.add_argument("--path", action="append", dest="paths", help="Page à mesurer (répétable).")
+        parser.add_argument("--requests", type=int, default=200, help="Requêtes par page.")
+        parser.add_argument("--concurrency", type=int, default=20)
+
+    def handle(self, *args, **options):
+        base = options["base_url"].rstrip("/")
+        session = requests.Session()
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=options["concurrency"]))
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        for path in options["paths"] or DEFAULT_PATHS:
+            url = base + path
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                samples = list(pool.map(fetch, [url] * options["requests"]))
+            elapsed = time.perf_counter() - start
+            latencies = sorted(duration for duration, _ in samples)
+            errors = sum(not ok for _, ok in samples)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{path}: {len(samples) / elapsed:.1f} req/s, "
+                f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p95 {p95 * 1000:.1f} ms, {errors} erreur(s)"
+            )
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tournaments.api import create_token
+
+
+class Command(BaseCommand):
+    help = "Crée un jeton d'API pour l'appareil d'un arbitre (affiché une seule fois)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--name", required=True, help="Nom de l'appareil, ex. « Tablette 1 ».")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["username"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Utilisateur « {options['username']} » introuvable.")
+        token, raw = create_token(user, options["name"])
+        self.stdout.write(self.style.SUCCESS(f"Jeton « {token.name} » créé pour {user.username} :"))
+        self.stdout.write(raw)
+        self.stdout.write("Révocable depuis l'administration. Il ne sera plus affiché.")
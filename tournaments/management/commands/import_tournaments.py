@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from tournaments.exports import CHUNK_SIZE, import_jsonl
+
+
+class Command(BaseCommand):
+    help = "Importe un export JSON Lines (.jsonl ou .jsonl.gz) de tournois."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        with open(options["path"], "rb") as stream:
+            count = import_jsonl(stream, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{count} tournoi(s) importé(s)."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tournaments.events import replay
+from tournaments.models import HeadToHead
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'index des face-à-face à partir du journal des résultats."
+
+    def handle(self, *args, **options):
+        replay(["head_to_head"])
+        count = HeadToHead.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"{count} face-à-face indexé(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from tournaments.season import rebuild_season_standings
+
+
+class Command(BaseCommand):
+    help = "Recalcule le classement de saison à partir des tournois terminés."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--season", type=int, help="Première année de la saison (ex. 2025 pour 2025-2026)."
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_season_standings(options["season"])
+        self.stdout.write(self.style.SUCCESS(f"Classement recalculé à partir de {count} tournoi(s)."))
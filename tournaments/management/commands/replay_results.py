@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from tournaments.events import CONSUMERS, replay
+from tournaments.season import rebuild_season_standings
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit les tables dérivées en rejouant le journal des résultats en une passe, "
+        "puis le classement de saison."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer",
+            action="append",
+            choices=[consumer.name for consumer in CONSUMERS],
+            help="Ne reconstruire que ce consommateur (répétable).",
+        )
+        parser.add_argument(
+            "--skip-season", action="store_true", help="Ne pas recalculer le classement de saison."
+        )
+
+    def handle(self, *args, **options):
+        count = replay(options["consumer"])
+        self.stdout.write(self.style.SUCCESS(f"{count} événement(s) rejoué(s)."))
+        if not options["skip_season"] and not options["consumer"]:
+            # Season points come from final rankings, not from single results.
+            tournaments = rebuild_season_standings()
+            self.stdout.write(
+                self.style.SUCCESS(f"Classement de saison recalculé ({tournaments} tournoi(s)).")
+            )
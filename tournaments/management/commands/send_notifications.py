@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tournaments.models import Round
+from tournaments.notifications import pending_count, send_pending
+
+
+class Command(BaseCommand):
+    help = "Envoie les notifications d'appariement en attente, par lots, sur une seule connexion."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Messages par lot (NOTIFICATION_BATCH_SIZE par défaut).")
+        parser.add_argument(
+            "--loop", action="store_true", help="Ne s'arrête pas : vérifie la file toutes les --interval secondes."
+        )
+        parser.add_argument("--interval", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            if pending_count():
+                self._send(options["batch_size"])
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def _send(self, batch_size):
+        report = send_pending(batch_size)
+        rounds = Round.objects.select_related("tournament").in_bulk(list(report.rounds))
+        for round_id, counts in sorted(report.rounds.items()):
+            rnd = rounds.get(round_id)
+            label = f"{rnd.tournament.name}, ronde {rnd.number}" if rnd else f"Ronde {round_id}"
+            line = f"{label} : {counts.sent} envoyé(s), {counts.failed} en échec"
+            if counts.retried:
+                line += f", {counts.retried} à réessayer"
+            style = self.style.ERROR if counts.failed else self.style.WARNING if counts.retried else self.style.SUCCESS
+            self.stdout.write(style(line))
+        self.stdout.write(f"{report.sent} message(s) en {report.seconds:.2f} s ({report.rate:.1f} msg/s).")
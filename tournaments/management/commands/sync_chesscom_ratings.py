@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from tournaments.chesscom import sync_ratings
+
+
+class Command(BaseCommand):
+    help = "Met à jour le Elo des membres ayant renseigné leur pseudo chess.com."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", help="API à interroger (CHESSCOM_API_BASE par défaut).")
+        parser.add_argument("--concurrency", type=int, help="Requêtes simultanées au plus.")
+        parser.add_argument(
+            "--rating", help="Catégorie chess.com (chess_rapid, chess_blitz...), CHESSCOM_RATING par défaut."
+        )
+
+    def handle(self, *args, **options):
+        report = sync_ratings(options["base_url"], options["concurrency"], options["rating"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report.requested} profil(s) : {report.updated} Elo mis à jour "
+                f"({report.fetched} téléchargé(s), {report.not_modified} inchangé(s), "
+                f"{report.cached} en cache)."
+            )
+        )
+        if report.unknown:
+            self.stdout.write(self.style.WARNING(f"Pseudos inconnus : {', '.join(report.unknown)}"))
+        if report.failed:
+            self.stdout.write(self.style.ERROR(f"Échecs (réessayer plus tard) : {', '.join(report.failed)}"))
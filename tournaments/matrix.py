@@ -0,0 +1,237 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Match, Tournament, TournamentRegistration
+
+# Per-cell outcome codes, from the point of view of the row player.
+NOT_PLAYED = 0
+WIN = 1
+DRAW = 2
+LOSS = 3
+BYE = 4
+PENDING = 5
+
+POINTS = (0.0, 1.0, 0.5, 0.0, 1.0, 0.0)
+SYMBOLS = ("", "1", "½", "0", "+", "*")
+
+NO_COLOR = 0
+WHITE = 1
+BLACK = 2
+
+_WHITE_OUTCOME = {
+    Match.RESULT_WHITE: WIN,
+    Match.RESULT_BLACK: LOSS,
+    Match.RESULT_DRAW: DRAW,
+    Match.RESULT_PENDING: PENDING,
+}
+_BLACK_OUTCOME = {
+    Match.RESULT_WHITE: LOSS,
+    Match.RESULT_BLACK: WIN,
+    Match.RESULT_DRAW: DRAW,
+    Match.RESULT_PENDING: PENDING,
+}
+
+# Matrices kept by this process, least recently used first.
+MATRIX_CACHE_SIZE = 64
+_cache: "OrderedDict[int, Tuple[int, ResultMatrix]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def bump_state_version(tournament_id: Optional[int]) -> None:
+    """
+    Mark the cached matrices of ``tournament_id`` stale after a write that
+    does not go through ``Tournament.save`` (matches, registrations, ratings).
+    """
+    if tournament_id is not None:
+        Tournament.objects.filter(pk=tournament_id).update(state_version=time.time_ns())
+
+
+def bump_player_tournaments(user_ids: Iterable[int]) -> List[int]:
+    """
+    Mark stale every tournament, live or archived, that one of ``user_ids``
+    entered: names and ratings are part of the matrix. Returns their ids.
+    """
+    user_ids = list(user_ids)
+    tournament_ids = list(
+        Tournament.objects.filter(
+            Q(registrations__user_id__in=user_ids) | Q(archive__players__in=user_ids)
+        )
+        .values_list("pk", flat=True)
+        .distinct()
+    )
+    Tournament.objects.filter(pk__in=tournament_ids).update(state_version=time.time_ns())
+    return tournament_ids
+
+
+class ResultMatrix:
+    """
+    Dense players x rounds view of a tournament.
+
+    Players are indexed 0..n-1 in registration order. Cell ``i * rounds + r``
+    of the flat ``opponent``, ``color`` and ``outcome`` arrays describes player
+    ``i`` in round ``r + 1`` (in their ``r + 1``-th game for an arena);
+    ``opponent`` holds the opponent's index or -1.
+    Built from two values queries whatever the size of the tournament, or
+    from its archive once it is archived.
+    """
+
+    __slots__ = (
+        "tournament",
+        "rounds",
+        "user_ids",
+        "usernames",
+        "ratings",
+        "active",
+        "index",
+        "opponent",
+        "color",
+        "outcome",
+        "rankings",
+    )
+
+    def __init__(self, tournament: Tournament, players, rounds: int):
+        self.tournament = tournament
+        self.rounds = rounds
+        self.user_ids: List[int] = [p[0] for p in players]
+        self.usernames: List[str] = [p[1] for p in players]
+        self.ratings: List[Optional[int]] = [p[2] for p in players]
+        self.active = array("b", (bool(p[3]) for p in players))
+        self.index: Dict[int, int] = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        size = len(players) * rounds
+        self.opponent = array("i", [-1]) * size
+        self.color = array("b", [NO_COLOR]) * size
+        self.outcome = array("b", [NOT_PLAYED]) * size
+        # tiebreaks.ranking results, by tiebreak codes.
+        self.rankings: Dict[Tuple[str, ...], tuple] = {}
+
+    @classmethod
+    def build(cls, tournament: Tournament) -> "ResultMatrix":
+        if tournament.archived_at:
+            from .archive import matrix_rows
+
+            players, matches = matrix_rows(tournament)
+        else:
+            players = list(
+                TournamentRegistration.objects.filter(tournament=tournament)
+                .order_by("joined_at", "id")
+                .values_list("user_id", "user__username", "user__profile__chesscom_elo", "is_active")
+            )
+            matches = list(
+                Match.objects.filter(round__tournament=tournament)
+                .order_by("round__number", "id")
+                .values_list("round__number", "white_player_id", "black_player_id", "result")
+            )
+        if tournament.is_arena:
+            # Arena games all share one round: columns are each player's
+            # games in the order they were paired.
+            seen: Dict[int, int] = defaultdict(int)
+            columns = []
+            for _, white_id, black_id, _ in matches:
+                columns.append((seen[white_id], seen[black_id]))
+                seen[white_id] += 1
+                if black_id:
+                    seen[black_id] += 1
+            rounds = max(seen.values(), default=0)
+        else:
+            columns = [(m[0] - 1, m[0] - 1) for m in matches]
+            rounds = max([tournament.current_round] + [m[0] for m in matches])
+        matrix = cls(tournament, players, rounds)
+        for (wr, br), (_, white_id, black_id, result) in zip(columns, matches):
+            matrix._record(wr, br, white_id, black_id, result)
+        return matrix
+
+    def _record(self, wr: int, br: int, white_id, black_id, result: str) -> None:
+        wi = self.index.get(white_id, -1)
+        bi = self.index.get(black_id, -1)
+        if result == Match.RESULT_BYE:
+            if wi >= 0:
+                self.outcome[wi * self.rounds + wr] = BYE
+            return
+        if wi < 0 or bi < 0:
+            return
+        wc = wi * self.rounds + wr
+        bc = bi * self.rounds + br
+        self.opponent[wc], self.opponent[bc] = bi, wi
+        self.color[wc], self.color[bc] = WHITE, BLACK
+        self.outcome[wc] = _WHITE_OUTCOME.get(result, NOT_PLAYED)
+        self.outcome[bc] = _BLACK_OUTCOME.get(result, NOT_PLAYED)
+
+    @classmethod
+    def cached(cls, tournament: Tournament) -> "ResultMatrix":
+        """
+        ``build`` behind a process-local cache checked against the
+        tournament's ``state_version``, so a hit costs no query. The matrix
+        is shared between requests: callers must not modify it.
+
+        Inside a transaction the matrix is always built: it may depend on
+        writes that are not committed, or not versioned yet.
+        """
+        if connection.in_atomic_block:
+            return cls.build(tournament)
+        version = tournament.state_version
+        with _cache_lock:
+            entry = _cache.get(tournament.pk)
+            if entry is not None and entry[0] == version:
+                _cache.move_to_end(tournament.pk)
+                return entry[1]
+        matrix = cls.build(tournament)
+        with _cache_lock:
+            _cache[tournament.pk] = (version, matrix)
+            _cache.move_to_end(tournament.pk)
+            while len(_cache) > MATRIX_CACHE_SIZE:
+                _cache.popitem(last=False)
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def played(self, i: int) -> bool:
+        start = i * self.rounds
+        return any(self.outcome[start : start + self.rounds])
+
+
+def crosstable(
+    matrix: ResultMatrix,
+    order: List[int],
+    scores: List[float],
+    tiebreaks: Dict[str, List[float]],
+) -> List[Dict]:
+    """
+    Rows of the crosstable for the players of ``order``, in that order. Each
+    round cell names the opponent by their rank in the table, with the colour
+    and the result for the row player; ``tiebreaks`` columns are copied as is.
+    """
+    rank_of = {i: rank for rank, i in enumerate(order, start=1)}
+    rounds = matrix.rounds
+    rows = []
+    for i in order:
+        cells = []
+        for r in range(rounds):
+            cell = i * rounds + r
+            opp = matrix.opponent[cell]
+            color = matrix.color[cell]
+            cells.append(
+                {
+                    "opponent": matrix.usernames[opp] if opp >= 0 else None,
+                    "opponent_rank": rank_of.get(opp) if opp >= 0 else None,
+                    "color": "w" if color == WHITE else "b" if color == BLACK else None,
+                    "result": SYMBOLS[matrix.outcome[cell]] or None,
+                }
+            )
+        rows.append(
+            {
+                "rank": rank_of[i],
+                "username": matrix.usernames[i],
+                "elo": matrix.ratings[i],
+                "score": scores[i],
+                "tiebreaks": {code: column[i] for code, column in tiebreaks.items()},
+                "rounds": cells,
+            }
+        )
+    return rows
@@ -0,0 +1,202 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; the last bucket (+Inf) is implicit.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+Labels = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        body = ",".join(
+            '{}="{}"'.format(name, value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+            for name, value in pairs
+        )
+        return "{" + body + "}"
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """The exposition lines of this metric, without its HELP and TYPE header."""
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_number(v)}" for key, v in values]
+
+
+class Histogram(_Metric):
+    """
+    Cumulative buckets as Prometheus expects them. An observation is one
+    bisect and three additions under a lock, cheap enough to stay on.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts (last one is +Inf), sum, count].
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def time(self, **labels):
+        """Decorator recording the duration of each call, in seconds."""
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+
+            return wrapper
+
+        return decorator
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def exposition() -> str:
+    """Every metric of this process, in the Prometheus text format (0.0.4)."""
+    return "\n".join(metric.expose() for metric in _registry) + "\n"
+
+
+# --- Application metrics ---------------------------------------------------
+
+PAIRING_SECONDS = Histogram(
+    "chesseirb_generate_next_round_seconds", "Durée de generate_next_round."
+)
+STANDINGS_SECONDS = Histogram(
+    "chesseirb_standings_for_tournament_seconds", "Durée de standings_for_tournament."
+)
+USER_STATS_SECONDS = Histogram("chesseirb_user_stats_seconds", "Durée de user_stats.")
+REQUEST_SECONDS = Histogram(
+    "chesseirb_request_seconds", "Latence des requêtes par vue.", ["view", "method"]
+)
+REQUEST_QUERIES = Histogram(
+    "chesseirb_request_db_queries",
+    "Requêtes SQL par requête HTTP, par vue.",
+    ["view"],
+    buckets=QUERY_BUCKETS,
+)
+DB_QUERIES = Counter("chesseirb_db_queries_total", "Requêtes SQL exécutées.")
+CAS_SECONDS = Histogram(
+    "chesseirb_cas_validation_seconds", "Latence de la validation des tickets CAS.", ["outcome"]
+)
+CHESSCOM_REQUESTS = Counter(
+    "chesseirb_chesscom_requests_total", "Requêtes à l'API publique chess.com.", ["status"]
+)
+NOTIFICATIONS = Counter(
+    "chesseirb_notifications_total", "Notifications d'appariement envoyées ou en échec.", ["status"]
+)
+NOTIFICATION_SEND_SECONDS = Histogram(
+    "chesseirb_notification_send_seconds", "Durée d'envoi d'une notification d'appariement."
+)
+# The hit ratio is hit / (hit + miss), computed at query time.
+CACHE_REQUESTS = Counter(
+    "chesseirb_cache_requests_total", "Consultations des caches applicatifs.", ["cache", "result"]
+)
+
+
+def record_cache(name: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=name, result="hit" if hit else "miss")
+
+
+# Query counter of the request being served, if any. A context variable
+# rather than a thread-local: it follows async views into the threads
+# their ORM calls run in.
+_request_queries: ContextVar[Optional[List[int]]] = ContextVar("request_queries", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    DB_QUERIES.inc()
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver: count every query on the new connection."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
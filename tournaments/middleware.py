@@ -0,0 +1,174 @@
+import mimetypes
+import os
+import time
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+
+from .metrics import REQUEST_QUERIES, REQUEST_SECONDS, _request_queries
+from .profiling import RequestProfile, is_requested, is_sampled, should_profile
+from .static_storage import compressed_variant
+
+# Content-hashed names never change content; other files may be replaced
+# by the next collectstatic.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_MAX_AGE = 300
+
+
+@lru_cache(maxsize=1)
+def _immutable_names():
+    hashed_files = getattr(staticfiles_storage, "hashed_files", {})
+    return frozenset(hashed_files.values())
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "<unresolved>"
+
+
+class MetricsMiddleware:
+    """
+    Record the latency and query count of each request, labelled by view
+    name (bounded, unlike the path). Serves sync and async stacks alike, so
+    async views are not pushed into a thread by this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _record(self, request, start, counter):
+        view = _view_name(request)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, view=view, method=request.method)
+        REQUEST_QUERIES.observe(counter[0], view=view)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = [0]
+        token = _request_queries.set(counter)
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+            self._record(request, start, counter)
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = _request_queries.set(counter)
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+            self._record(request, start, counter)
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from the application process. Hashed
+    names are cached for a year as immutable; a precompressed variant is
+    sent when the client accepts it. Under ``DEBUG`` the staticfiles app
+    serves the source files instead.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = "/" + settings.STATIC_URL.lstrip("/")
+        self.enabled = not settings.DEBUG and settings.STATIC_ROOT is not None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _response(self, request):
+        if not self.enabled or not request.path.startswith(self.prefix):
+            return None
+        if request.method not in ("GET", "HEAD"):
+            return None
+        name = request.path[len(self.prefix) :]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        served, encoding = compressed_variant(path, request.headers.get("Accept-Encoding", ""))
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = FileResponse(open(served, "rb"), content_type=content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Vary"] = "Accept-Encoding"
+        if name in _immutable_names():
+            response["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._response(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._response(request) or await self.get_response(request)
+
+
+class ProfilerMiddleware:
+    """
+    Profile the requests picked by ``profiling.should_profile`` and write
+    them to ``PROFILER_DIR``. A request that is not picked costs a header
+    lookup and, when sampling is on, one random number. Under ASGI only the
+    event loop thread is profiled; the SQL timeline covers every thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile.begin() if should_profile(request) else None
+        if profile is None:
+            return self.get_response(request)
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            profile.finish(request, response)
+
+    async def __acall__(self, request):
+        if is_requested(request):
+            # Only then is the user worth loading (a session query, in a thread).
+            picked = await sync_to_async(lambda: request.user.is_staff)()
+        else:
+            picked = is_sampled()
+        profile = RequestProfile.begin() if picked else None
+        if profile is None:
+            return await self.get_response(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            # On the loop thread: the profiler, the ContextVar token and the
+            # lock belong to it. Only the file writes go to a thread.
+            profile.stop()
+        await sync_to_async(profile.save)(request, response)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0003_game'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='tiebreaks',
+            field=models.CharField(default='buchholz,games', help_text='Ordre des départages, séparés par des virgules.', max_length=200),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0004_tournament_tiebreaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=60, help_text="Durée de l'arena, en minutes."),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='format',
+            field=models.CharField(choices=[('swiss', 'Système suisse'), ('arena', 'Arena (appariement continu)')], default='swiss', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0005_tournament_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='board',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tournament',
+            name='format',
+            field=models.CharField(choices=[('swiss', 'Système suisse'), ('arena', 'Arena (appariement continu)'), ('round_robin', 'Toutes rondes (tables de Berger)'), ('knockout', 'Élimination directe')], default='swiss', max_length=20),
+        ),
+    ]
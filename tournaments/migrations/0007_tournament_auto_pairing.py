@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0006_scheduled_formats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='auto_pairing',
+            field=models.BooleanField(default=True, help_text="Apparier le round suivant dès le dernier résultat saisi. Sinon, les appariements sont validés depuis l'aperçu du round."),
+        ),
+    ]
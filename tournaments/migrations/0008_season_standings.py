@@ -0,0 +1,56 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0007_tournament_auto_pairing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveIntegerField()),
+                ('points', models.FloatField(default=0)),
+                ('tournaments', models.PositiveIntegerField(default=0)),
+                ('podiums', models.PositiveIntegerField(default=0)),
+                ('titles', models.PositiveIntegerField(default=0)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('opponent_rating_sum', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_standings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['season', '-points', '-podiums'],
+                'unique_together': {('season', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SeasonResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveIntegerField()),
+                ('rank', models.PositiveIntegerField()),
+                ('points', models.FloatField(default=0)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('opponent_rating_sum', models.PositiveIntegerField(default=0)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_results', to='tournaments.tournament')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_results', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('tournament', 'user')},
+            },
+        ),
+    ]
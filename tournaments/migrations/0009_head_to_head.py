@@ -0,0 +1,70 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# (wins, draws, losses) of White, then of Black, for each decided result.
+RECORDS = {
+    'white': ((1, 0, 0), (0, 0, 1)),
+    'draw': ((0, 1, 0), (0, 1, 0)),
+    'black': ((0, 0, 1), (1, 0, 0)),
+}
+
+
+def index_existing_matches(apps, schema_editor):
+    """Seed the index from the games already played."""
+    Match = apps.get_model('tournaments', 'Match')
+    HeadToHead = apps.get_model('tournaments', 'HeadToHead')
+    totals = {}
+    decided = Match.objects.filter(
+        result__in=RECORDS, white_player__isnull=False, black_player__isnull=False
+    ).values_list('white_player_id', 'black_player_id', 'result', 'updated_at')
+    for white_id, black_id, result, played_at in decided.iterator(chunk_size=2000):
+        for pair, record in zip(((white_id, black_id), (black_id, white_id)), RECORDS[result]):
+            row = totals.setdefault(pair, [0, 0, 0, None])
+            for k in range(3):
+                row[k] += record[k]
+            if row[3] is None or played_at > row[3]:
+                row[3] = played_at
+    HeadToHead.objects.bulk_create(
+        (
+            HeadToHead(
+                player_id=player_id,
+                opponent_id=opponent_id,
+                wins=wins,
+                draws=draws,
+                losses=losses,
+                last_played=last_played,
+            )
+            for (player_id, opponent_id), (wins, draws, losses, last_played) in totals.items()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0008_season_standings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('last_played', models.DateTimeField(blank=True, null=True)),
+                ('opponent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='head_to_head', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('player', 'opponent')},
+            },
+        ),
+        migrations.RunPython(index_existing_matches, migrations.RunPython.noop),
+    ]
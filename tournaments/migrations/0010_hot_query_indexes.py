@@ -0,0 +1,58 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0009_head_to_head'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='match',
+            name='black_player',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='black_matches', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='match',
+            name='round',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='tournaments.round'),
+        ),
+        migrations.AlterField(
+            model_name='match',
+            name='white_player',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='white_matches', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['round', 'result'], name='match_round_result'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['white_player', 'result'], name='match_white_result'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['black_player', 'result'], name='match_black_result'),
+        ),
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['status', 'start_datetime'], name='tournament_status_start'),
+        ),
+        migrations.AddIndex(
+            model_name='tournamentregistration',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['tournament', 'joined_at'], name='registration_active'),
+        ),
+        # auth.User is not ours to declare indexes on. The user list and the
+        # user search read the users who logged in at least once, by username.
+        migrations.RunSQL(
+            'CREATE INDEX "auth_user_logged_in" ON "auth_user" ("username") '
+            'WHERE "last_login" IS NOT NULL',
+            'DROP INDEX "auth_user_logged_in"',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='state_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
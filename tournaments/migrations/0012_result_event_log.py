@@ -0,0 +1,113 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# (wins, draws, losses) of White, then of Black, for each decided result.
+RECORDS = {
+    'white': ((1, 0, 0), (0, 0, 1)),
+    'draw': ((0, 1, 0), (0, 1, 0)),
+    'black': ((0, 0, 1), (1, 0, 0)),
+}
+
+
+def log_existing_results(apps, schema_editor):
+    """
+    Start the log with one event per decided match, and rebuild the
+    head-to-head index from those events so that its cursor can start at
+    the end of the log.
+    """
+    Match = apps.get_model('tournaments', 'Match')
+    ResultEvent = apps.get_model('tournaments', 'ResultEvent')
+    ConsumerCursor = apps.get_model('tournaments', 'ConsumerCursor')
+    HeadToHead = apps.get_model('tournaments', 'HeadToHead')
+    decided = Match.objects.exclude(result='pending').order_by('updated_at', 'id').values_list(
+        'id', 'round__tournament_id', 'white_player_id', 'black_player_id', 'result',
+        'submitted_by_id', 'updated_at',
+    )
+    ResultEvent.objects.bulk_create(
+        (
+            ResultEvent(
+                match_id=match_id,
+                tournament_id=tournament_id,
+                white_player_id=white_id,
+                black_player_id=black_id,
+                previous_result='pending',
+                result=result,
+                submitted_by_id=submitted_by_id,
+                created_at=updated_at,
+            )
+            for match_id, tournament_id, white_id, black_id, result, submitted_by_id, updated_at
+            in decided.iterator(chunk_size=2000)
+        ),
+        batch_size=500,
+    )
+
+    totals = {}
+    events = ResultEvent.objects.filter(
+        result__in=RECORDS, white_player__isnull=False, black_player__isnull=False
+    ).values_list('white_player_id', 'black_player_id', 'result', 'created_at')
+    for white_id, black_id, result, played_at in events.iterator(chunk_size=2000):
+        for pair, record in zip(((white_id, black_id), (black_id, white_id)), RECORDS[result]):
+            row = totals.setdefault(pair, [0, 0, 0, None])
+            for k in range(3):
+                row[k] += record[k]
+            if row[3] is None or played_at > row[3]:
+                row[3] = played_at
+    HeadToHead.objects.all().delete()
+    HeadToHead.objects.bulk_create(
+        (
+            HeadToHead(
+                player_id=player_id,
+                opponent_id=opponent_id,
+                wins=wins,
+                draws=draws,
+                losses=losses,
+                last_played=last_played,
+            )
+            for (player_id, opponent_id), (wins, draws, losses, last_played) in totals.items()
+        ),
+        batch_size=500,
+    )
+    last = ResultEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    ConsumerCursor.objects.create(name='head_to_head', position=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0011_tournament_state_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumerCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResultEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_result', models.CharField(choices=[('pending', 'En attente'), ('white', 'Victoire blancs'), ('black', 'Victoire noirs'), ('draw', 'Nulle'), ('bye', 'Exempt (bye)')], max_length=20)),
+                ('result', models.CharField(choices=[('pending', 'En attente'), ('white', 'Victoire blancs'), ('black', 'Victoire noirs'), ('draw', 'Nulle'), ('bye', 'Exempt (bye)')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('black_player', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('match', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='result_events', to='tournaments.match')),
+                ('submitted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_events', to='tournaments.tournament')),
+                ('white_player', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(log_existing_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0012_result_event_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='TournamentArchive',
+            fields=[
+                ('tournament', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='tournaments.tournament')),
+                ('participants', models.PositiveIntegerField(default=0)),
+                ('rounds_played', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('players', models.ManyToManyField(related_name='archived_tournaments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
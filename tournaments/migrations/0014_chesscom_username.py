@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0013_tournament_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerprofile',
+            name='chesscom_synced_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='playerprofile',
+            name='chesscom_username',
+            field=models.CharField(blank=True, help_text='Pseudo chess.com : le Elo est alors mis à jour automatiquement.', max_length=50),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0014_chesscom_username'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerprofile',
+            name='notify_pairings',
+            field=models.BooleanField(default=True, verbose_name='Recevoir mes appariements par e-mail'),
+        ),
+        migrations.CreateModel(
+            name='PairingNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'E-mail')], default='email', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'À envoyer'), ('sent', 'Envoyée'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tournaments.match')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='tournaments.round')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairing_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='notification_pending')],
+                'unique_together': {('round', 'user', 'channel')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def unscore_future_byes(apps, schema_editor):
+    """Byes of round-robin rounds not opened yet were scored when the schedule was written."""
+    Match = apps.get_model('tournaments', 'Match')
+    Match.objects.filter(
+        round__tournament__format='round_robin',
+        round__number__gt=F('round__tournament__current_round'),
+        result='bye',
+    ).update(result='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0016_api_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(unscore_future_byes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+import json
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_archived_players(apps, schema_editor):
+    """Copy each player's decided matches out of the archives they appear in."""
+    TournamentArchive = apps.get_model('tournaments', 'TournamentArchive')
+    ArchivedPlayer = apps.get_model('tournaments', 'ArchivedPlayer')
+    for archive in TournamentArchive.objects.iterator(chunk_size=100):
+        matches = json.loads(zlib.decompress(bytes(archive.data)))['matches']
+        ArchivedPlayer.objects.bulk_create(
+            (
+                ArchivedPlayer(
+                    archive=archive,
+                    user_id=user_id,
+                    matches=[m[:6] for m in matches if user_id in (m[2], m[3]) and m[4] != 'pending'],
+                )
+                for user_id in archive.players.values_list('pk', flat=True)
+            ),
+            batch_size=500,
+        )
+
+
+def unindex_archived_players(apps, schema_editor):
+    TournamentArchive = apps.get_model('tournaments', 'TournamentArchive')
+    ArchivedPlayer = apps.get_model('tournaments', 'ArchivedPlayer')
+    Through = TournamentArchive.players.through
+    Through.objects.bulk_create(
+        (
+            Through(tournamentarchive_id=archive_id, user_id=user_id)
+            for archive_id, user_id in ArchivedPlayer.objects.values_list('archive_id', 'user_id')
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tournaments', '0017_unscore_future_byes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPlayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.JSONField(default=list)),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='tournaments.tournamentarchive')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('archive', 'user')},
+            },
+        ),
+        migrations.RunPython(index_archived_players, unindex_archived_players),
+        migrations.RemoveField(
+            model_name='tournamentarchive',
+            name='players',
+        ),
+        migrations.AddField(
+            model_name='tournamentarchive',
+            name='players',
+            field=models.ManyToManyField(related_name='archived_tournaments', through='tournaments.ArchivedPlayer', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
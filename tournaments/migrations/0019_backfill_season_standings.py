@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def backfill_season_standings(apps, schema_editor):
+    """
+    Rank the tournaments completed before the leaderboard existed. This runs
+    the current ``rebuild_season_standings``, which reads the live models: it
+    is skipped when there is nothing to rank, so that a fresh database never
+    depends on later schema.
+    """
+    Tournament = apps.get_model('tournaments', 'Tournament')
+    if not Tournament.objects.filter(status='completed').exists():
+        return
+    from tournaments.season import rebuild_season_standings
+
+    rebuild_season_standings()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0018_archived_player'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_season_standings, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from collections import defaultdict
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
@@ -8,12 +8,23 @@ from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 
+from .metrics import STANDINGS_SECONDS
+
 User = get_user_model()
 
 
 class PlayerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     chesscom_elo = models.PositiveIntegerField(null=True, blank=True)
+    chesscom_username = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Pseudo chess.com : le Elo est alors mis à jour automatiquement.",
+    )
+    chesscom_synced_at = models.DateTimeField(null=True, blank=True, editable=False)
+    notify_pairings = models.BooleanField(
+        "Recevoir mes appariements par e-mail", default=True
+    )
     is_banned = models.BooleanField(default=False)
 
     def __str__(self) -> str:
@@ -28,6 +39,17 @@ class Tournament(models.Model):
         (MODE_PLAYER, "Résultats saisis par les joueurs"),
     ]
 
+    FORMAT_SWISS = "swiss"
+    FORMAT_ARENA = "arena"
+    FORMAT_ROUND_ROBIN = "round_robin"
+    FORMAT_KNOCKOUT = "knockout"
+    FORMAT_CHOICES = [
+        (FORMAT_SWISS, "Système suisse"),
+        (FORMAT_ARENA, "Arena (appariement continu)"),
+        (FORMAT_ROUND_ROBIN, "Toutes rondes (tables de Berger)"),
+        (FORMAT_KNOCKOUT, "Élimination directe"),
+    ]
+
     STATUS_DRAFT = "draft"
     STATUS_REGISTRATION = "registration"
     STATUS_RUNNING = "running"
@@ -46,6 +68,17 @@ class Tournament(models.Model):
     mode = models.CharField(
         max_length=20, choices=MODE_CHOICES, default=MODE_ADMIN
     )
+    format = models.CharField(
+        max_length=20, choices=FORMAT_CHOICES, default=FORMAT_SWISS
+    )
+    duration_minutes = models.PositiveIntegerField(
+        default=60, help_text="Durée de l'arena, en minutes."
+    )
+    auto_pairing = models.BooleanField(
+        default=True,
+        help_text="Apparier le round suivant dès le dernier résultat saisi. "
+        "Sinon, les appariements sont validés depuis l'aperçu du round.",
+    )
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=STATUS_DRAFT
     )
@@ -53,15 +86,39 @@ class Tournament(models.Model):
         User, on_delete=models.SET_NULL, null=True, related_name="tournaments_created"
     )
     current_round = models.PositiveIntegerField(default=0)
+    tiebreaks = models.CharField(
+        max_length=200,
+        default="buchholz,games",
+        help_text="Ordre des départages, séparés par des virgules.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Changes with anything the result matrix is built from; see
+    # ResultMatrix.cached and bump_state_version.
+    state_version = models.BigIntegerField(default=0, editable=False)
+    # Set once the registrations, rounds and matches have moved to a
+    # TournamentArchive (see tournaments.archive).
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ["-start_datetime", "-created_at"]
+        indexes = [
+            # Listing pages: one status, keyset-paginated on start_datetime.
+            models.Index(fields=["status", "start_datetime"], name="tournament_status_start"),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # A fresh stamp rather than an increment: saving an instance loaded
+        # before another write must not bring an older version back.
+        self.state_version = time.time_ns()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "state_version"}
+        super().save(*args, **kwargs)
+
     @property
     def is_registration_open(self) -> bool:
         return self.status == self.STATUS_REGISTRATION
@@ -74,6 +131,24 @@ class Tournament(models.Model):
     def is_completed(self) -> bool:
         return self.status == self.STATUS_COMPLETED
 
+    @property
+    def is_arena(self) -> bool:
+        return self.format == self.FORMAT_ARENA
+
+    @property
+    def is_knockout(self) -> bool:
+        return self.format == self.FORMAT_KNOCKOUT
+
+    @property
+    def has_fixed_schedule(self) -> bool:
+        """Every round is scheduled when the tournament starts."""
+        return self.format in (self.FORMAT_ROUND_ROBIN, self.FORMAT_KNOCKOUT)
+
+    @property
+    def pairs_automatically(self) -> bool:
+        """Whether rounds are paired without an organizer validating them."""
+        return self.auto_pairing or self.is_arena or self.has_fixed_schedule
+
     def can_edit_setup(self) -> bool:
         return self.status in {self.STATUS_DRAFT, self.STATUS_REGISTRATION}
 
@@ -94,6 +169,14 @@ class TournamentRegistration(models.Model):
     class Meta:
         unique_together = ("tournament", "user")
         ordering = ["joined_at"]
+        indexes = [
+            # Participant lists: active registrations of a tournament, in order.
+            models.Index(
+                fields=["tournament", "joined_at"],
+                condition=Q(is_active=True),
+                name="registration_active",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} @ {self.tournament}"
@@ -135,18 +218,30 @@ class Match(models.Model):
         (RESULT_BYE, "Exempt (bye)"),
     ]
 
+    # Indexed by the composite indexes in Meta, of which they are the prefix.
     round = models.ForeignKey(
-        Round, related_name="matches", on_delete=models.CASCADE
+        Round, related_name="matches", on_delete=models.CASCADE, db_index=False
     )
     white_player = models.ForeignKey(
-        User, related_name="white_matches", on_delete=models.CASCADE, null=True, blank=True
+        User,
+        related_name="white_matches",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
     )
     black_player = models.ForeignKey(
-        User, related_name="black_matches", on_delete=models.CASCADE, null=True, blank=True
+        User,
+        related_name="black_matches",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
     )
     result = models.CharField(
         max_length=20, choices=RESULT_CHOICES, default=RESULT_PENDING
     )
+    board = models.PositiveIntegerField(null=True, blank=True)
     submitted_by = models.ForeignKey(
         User, null=True, blank=True, on_delete=models.SET_NULL, related_name="results_submitted"
     )
@@ -155,6 +250,13 @@ class Match(models.Model):
 
     class Meta:
         ordering = ["round", "id"]
+        indexes = [
+            # Pending games of a round; results of a tournament.
+            models.Index(fields=["round", "result"], name="match_round_result"),
+            # A player's games (user_stats, head-to-head).
+            models.Index(fields=["white_player", "result"], name="match_white_result"),
+            models.Index(fields=["black_player", "result"], name="match_black_result"),
+        ]
 
     def __str__(self) -> str:
         return f"Round {self.round.number}: {self.white_player} vs {self.black_player}"
@@ -180,71 +282,317 @@ class Match(models.Model):
         return self.result == self.RESULT_BYE or (self.white_player and not self.black_player)
 
 
+class Game(models.Model):
+    """Moves of a match, stored with the compact encoding of ``tournaments.pgn``."""
+
+    match = models.OneToOneField(Match, related_name="game", on_delete=models.CASCADE)
+    headers = models.JSONField(default=dict, blank=True)
+    moves = models.BinaryField()
+    ply_count = models.PositiveIntegerField(default=0)
+    uploaded_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name="games_uploaded"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Partie de {self.match}"
+
+
+class PairingNotification(models.Model):
+    """
+    One player to tell about their pairing in a new round. Rows are written
+    in the transaction that creates the round and sent later, in batches, by
+    the ``send_notifications`` worker (see ``tournaments.notifications``).
+    """
+
+    CHANNEL_EMAIL = "email"
+    CHANNEL_CHOICES = [(CHANNEL_EMAIL, "E-mail")]
+
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "À envoyer"),
+        (STATUS_SENT, "Envoyée"),
+        (STATUS_FAILED, "Échec"),
+    ]
+
+    round = models.ForeignKey(Round, related_name="notifications", on_delete=models.CASCADE)
+    match = models.ForeignKey(Match, related_name="+", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="pairing_notifications", on_delete=models.CASCADE)
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default=CHANNEL_EMAIL)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("round", "user", "channel")
+        indexes = [
+            # The worker's queue.
+            models.Index(
+                fields=["id"], condition=Q(status="pending"), name="notification_pending"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user} - {self.round}"
+
+
+class ApiToken(models.Model):
+    """
+    Credential of one device (an arbiter's tablet) for the JSON API. Only
+    the SHA-256 of the token is stored; the token itself is shown once, by
+    ``python manage.py create_api_token``.
+    """
+
+    user = models.ForeignKey(User, related_name="api_tokens", on_delete=models.CASCADE)
+    name = models.CharField("Appareil", max_length=100)
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True, editable=False)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.user})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response to an API request sent with an ``Idempotency-Key`` header,
+    replayed as is when the device retries the same request.
+    """
+
+    token = models.ForeignKey(ApiToken, related_name="idempotency_keys", on_delete=models.CASCADE)
+    key = models.CharField(max_length=100)
+    # SHA-256 of the method, path and body: a key reused for another request is refused.
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(default=200)
+    response = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ("token", "key")
+
+    def __str__(self) -> str:
+        return self.key
+
+
+def season_of(when) -> int:
+    """Club seasons run from September to August; a season is named by its first year."""
+    return when.year if when.month >= 9 else when.year - 1
+
+
+class SeasonResult(models.Model):
+    """One player's contribution to the season leaderboard from one completed tournament."""
+
+    tournament = models.ForeignKey(
+        Tournament, related_name="season_results", on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(User, related_name="season_results", on_delete=models.CASCADE)
+    season = models.PositiveIntegerField()
+    rank = models.PositiveIntegerField()
+    points = models.FloatField(default=0)
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    opponent_rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("tournament", "user")
+
+
+class SeasonStanding(models.Model):
+    """
+    Running totals of a player over a season, maintained incrementally from
+    ``SeasonResult`` rows so that the leaderboard is a single table read.
+    """
+
+    season = models.PositiveIntegerField()
+    user = models.ForeignKey(User, related_name="season_standings", on_delete=models.CASCADE)
+    points = models.FloatField(default=0)
+    tournaments = models.PositiveIntegerField(default=0)
+    podiums = models.PositiveIntegerField(default=0)
+    titles = models.PositiveIntegerField(default=0)
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    opponent_rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("season", "user")
+        ordering = ["season", "-points", "-podiums"]
+
+    def __str__(self) -> str:
+        return f"{self.user} - saison {self.season}"
+
+    @property
+    def performance(self) -> Optional[int]:
+        # Same linear approximation as the tournament performance tiebreak.
+        if not self.games:
+            return None
+        return round(
+            self.opponent_rating_sum / self.games + 400 * (self.wins - self.losses) / self.games
+        )
+
+
+class HeadToHead(models.Model):
+    """
+    Record of ``player`` against ``opponent``, kept up to date as results are
+    saved. Every pair is stored in both directions so that either player's
+    view is one lookup on the unique (player, opponent) index.
+    """
+
+    player = models.ForeignKey(User, related_name="head_to_head", on_delete=models.CASCADE)
+    opponent = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    last_played = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("player", "opponent")
+
+    def __str__(self) -> str:
+        return f"{self.player} - {self.opponent}"
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+
+class ResultEvent(models.Model):
+    """
+    One result change, appended in the transaction that writes it to
+    ``Match.result``: the log is never updated, so derived tables can be
+    maintained from it incrementally and rebuilt by replaying it in order.
+    Players are copied from the match so that an event stays meaningful
+    after its match is gone.
+    """
+
+    tournament = models.ForeignKey(
+        Tournament, related_name="result_events", on_delete=models.CASCADE
+    )
+    match = models.ForeignKey(
+        Match, related_name="result_events", null=True, on_delete=models.SET_NULL
+    )
+    white_player = models.ForeignKey(
+        User, related_name="+", null=True, on_delete=models.SET_NULL
+    )
+    black_player = models.ForeignKey(
+        User, related_name="+", null=True, on_delete=models.SET_NULL
+    )
+    previous_result = models.CharField(max_length=20, choices=Match.RESULT_CHOICES)
+    result = models.CharField(max_length=20, choices=Match.RESULT_CHOICES)
+    submitted_by = models.ForeignKey(
+        User, related_name="+", null=True, blank=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.previous_result} -> {self.result}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Le journal des résultats n'est jamais modifié.")
+        super().save(*args, **kwargs)
+
+
+class TournamentArchive(models.Model):
+    """
+    Registrations, rounds, matches and games of an archived tournament, as
+    one compressed document (see ``tournaments.archive``), so that the hot
+    tables only hold recent tournaments. ``players`` indexes the archive by
+    everyone who registered or played, for the player pages.
+    """
+
+    tournament = models.OneToOneField(
+        Tournament, primary_key=True, related_name="archive", on_delete=models.CASCADE
+    )
+    players = models.ManyToManyField(
+        User, through="ArchivedPlayer", related_name="archived_tournaments"
+    )
+    # Counts of the list pages, which no longer find the rows to count.
+    participants = models.PositiveIntegerField(default=0)
+    rounds_played = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+
+    def __str__(self) -> str:
+        return f"Archive de {self.tournament}"
+
+
+class ArchivedPlayer(models.Model):
+    """
+    A player of an archived tournament, with their decided matches copied
+    out of the document: the player pages read these rows and never have
+    to decompress an archive.
+    """
+
+    archive = models.ForeignKey(TournamentArchive, related_name="entries", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="archive_entries", on_delete=models.CASCADE)
+    # id, round number, white_id, black_id, result, board of each match.
+    matches = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ("archive", "user")
+
+    def __str__(self) -> str:
+        return f"{self.user} ({self.archive})"
+
+
+class ConsumerCursor(models.Model):
+    """Last ``ResultEvent`` applied by a consumer of the log (see ``tournaments.events``)."""
+
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.position}"
+
+
 def color_balance_for_player(tournament: Tournament, user: User) -> Tuple[int, int]:
-    whites = Match.objects.filter(
-        round__tournament=tournament, white_player=user
-    ).count()
-    blacks = Match.objects.filter(
-        round__tournament=tournament, black_player=user
-    ).count()
-    return whites, blacks
-
-
-def points_table(tournament: Tournament) -> Dict[int, float]:
-    scores: Dict[int, float] = defaultdict(float)
-    matches = Match.objects.filter(round__tournament=tournament).exclude(
-        result=Match.RESULT_PENDING
-    )
-    for match in matches:
-        if match.white_player:
-            scores[match.white_player_id] += match.points_for(match.white_player)
-        if match.black_player:
-            scores[match.black_player_id] += match.points_for(match.black_player)
-    return scores
-
-
-def buchholz_scores(tournament: Tournament, scores: Dict[int, float]) -> Dict[int, float]:
-    buchholz: Dict[int, float] = defaultdict(float)
-    matches = Match.objects.filter(round__tournament=tournament).exclude(
-        result=Match.RESULT_PENDING
-    )
-    for match in matches:
-        if match.white_player and match.black_player:
-            white_score = scores.get(match.black_player_id, 0)
-            black_score = scores.get(match.white_player_id, 0)
-            buchholz[match.white_player_id] += white_score
-            buchholz[match.black_player_id] += black_score
-        elif match.white_player and not match.black_player:
-            # bye: add nothing
-            buchholz[match.white_player_id] += 0
-    return buchholz
+    from .matrix import BLACK, WHITE, ResultMatrix
+
+    matrix = ResultMatrix.cached(tournament)
+    i = matrix.index.get(user.pk)
+    if i is None:
+        return 0, 0
+    colors = matrix.color[i * matrix.rounds : (i + 1) * matrix.rounds]
+    return colors.count(WHITE), colors.count(BLACK)
 
 
+@STANDINGS_SECONDS.time()
 def standings_for_tournament(tournament: Tournament) -> List[Dict]:
-    regs = TournamentRegistration.objects.filter(
-        tournament=tournament, is_active=True
-    ).select_related("user")
-    scores = points_table(tournament)
-    buchholz = buchholz_scores(tournament, scores)
+    from .matrix import BLACK, WHITE, ResultMatrix
+    from .tiebreaks import BUCHHOLZ, GAMES, ranking
+
+    matrix = ResultMatrix.cached(tournament)
+    order, scores, values = ranking(matrix)
+    rounds = matrix.rounds
     table = []
-    for reg in regs:
-        whites, blacks = color_balance_for_player(tournament, reg.user)
+    for i in order:
+        if not matrix.active[i]:
+            continue
+        colors = matrix.color[i * rounds : (i + 1) * rounds]
         table.append(
             {
-                "user": reg.user,
-                "score": scores.get(reg.user_id, 0),
-                "buchholz": buchholz.get(reg.user_id, 0),
-                "whites": whites,
-                "blacks": blacks,
-                "matches_played": whites + blacks,
+                "user_id": matrix.user_ids[i],
+                "username": matrix.usernames[i],
+                "elo": matrix.ratings[i],
+                "score": scores[i],
+                "buchholz": values[BUCHHOLZ][i],
+                "whites": colors.count(WHITE),
+                "blacks": colors.count(BLACK),
+                "matches_played": int(values[GAMES][i]),
+                "tiebreaks": {code: column[i] for code, column in values.items()},
             }
         )
-    table.sort(
-        key=lambda row: (
-            -row["score"],
-            -row["buchholz"],
-            -row["matches_played"],
-            row["user"].username.lower(),
-        )
-    )
     return table
@@ -0,0 +1,177 @@
+import smtplib
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .metrics import NOTIFICATION_SEND_SECONDS, NOTIFICATIONS
+from .models import Match, PairingNotification, Round
+
+User = get_user_model()
+
+# A message still failing after this many attempts is given up on.
+MAX_ATTEMPTS = 3
+
+# Errors of one message: the next one is still tried on the same connection.
+SEND_ERRORS = (smtplib.SMTPException, OSError)
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def queue_pairing_notifications(round_obj: Round) -> int:
+    """
+    Queue one e-mail per paired player of ``round_obj``, in the transaction
+    that creates the round: the worker only sees rounds that were committed.
+    Players without an e-mail address or who opted out are skipped, and so
+    are empty knockout boards. Returns the number of messages queued.
+    """
+    matches = list(
+        Match.objects.filter(round=round_obj).values_list("pk", "white_player_id", "black_player_id")
+    )
+    player_ids = {p for _, white, black in matches for p in (white, black) if p}
+    recipients = set(
+        User.objects.filter(pk__in=player_ids)
+        .exclude(email="")
+        .exclude(profile__notify_pairings=False)
+        .values_list("pk", flat=True)
+    )
+    rows = [
+        PairingNotification(round=round_obj, match_id=match_id, user_id=user_id)
+        for match_id, white, black in matches
+        for user_id in (white, black)
+        if user_id in recipients
+    ]
+    PairingNotification.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def _message(notification: PairingNotification) -> EmailMessage:
+    match, user = notification.match, notification.user
+    tournament = notification.round.tournament
+    if match.white_player_id == user.pk:
+        color, opponent = "blancs", match.black_player
+    else:
+        color, opponent = "noirs", match.white_player
+    context = {
+        "user": user,
+        "tournament": tournament,
+        "round": notification.round,
+        "match": match,
+        "color": color,
+        "opponent": opponent,
+        "is_bye": match.result == Match.RESULT_BYE,
+        "url": _setting("SITE_URL", "").rstrip("/") + reverse("tournament_detail", args=[tournament.pk]),
+    }
+    return EmailMessage(
+        subject=f"{tournament.name} : ronde {notification.round.number}",
+        body=render_to_string("tournaments/email/pairing.txt", context),
+        to=[user.email],
+    )
+
+
+@dataclass
+class RoundReport:
+    sent: int = 0
+    failed: int = 0
+    # Attempted again by a later run.
+    retried: int = 0
+
+
+@dataclass
+class SendReport:
+    seconds: float = 0.0
+    rounds: Dict[int, RoundReport] = field(default_factory=dict)
+
+    @property
+    def sent(self) -> int:
+        return sum(r.sent for r in self.rounds.values())
+
+    @property
+    def failed(self) -> int:
+        return sum(r.failed for r in self.rounds.values())
+
+    @property
+    def rate(self) -> float:
+        """Messages sent per second."""
+        return self.sent / self.seconds if self.seconds else 0.0
+
+
+def send_pending(batch_size: Optional[int] = None, connection=None) -> SendReport:
+    """
+    Send every queued notification, oldest first, ``batch_size`` rows per
+    transaction and over one connection to the mail backend for the whole
+    run (an SMTP handshake per message is what makes naive sending slow).
+    A message that fails is retried by later runs up to ``MAX_ATTEMPTS``;
+    the others go on. Each row is sent at most once per run.
+    """
+    batch_size = batch_size or _setting("NOTIFICATION_BATCH_SIZE", 100)
+    report = SendReport()
+    start = time.perf_counter()
+    connection = connection or get_connection()
+    connection.open()
+    last_id = 0
+    try:
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    PairingNotification.objects.select_for_update(skip_locked=True, of=("self",))
+                    .filter(status=PairingNotification.STATUS_PENDING, pk__gt=last_id)
+                    .select_related(
+                        "user", "round__tournament", "match__white_player", "match__black_player"
+                    )
+                    .order_by("pk")[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+                _send_batch(batch, connection, report)
+                PairingNotification.objects.bulk_update(
+                    batch, ["status", "attempts", "error", "sent_at"]
+                )
+    finally:
+        connection.close()
+        report.seconds = time.perf_counter() - start
+    return report
+
+
+def _send_batch(batch: List[PairingNotification], connection, report: SendReport) -> None:
+    for notification in batch:
+        counts = report.rounds.setdefault(notification.round_id, RoundReport())
+        notification.attempts += 1
+        sent_at = time.perf_counter()
+        try:
+            message = _message(notification)
+            message.connection = connection
+            message.send()
+        except SEND_ERRORS as exc:
+            NOTIFICATIONS.inc(status="error")
+            notification.error = f"{type(exc).__name__}: {exc}"[:1000]
+            if notification.attempts >= MAX_ATTEMPTS:
+                notification.status = PairingNotification.STATUS_FAILED
+                counts.failed += 1
+            else:
+                counts.retried += 1
+            if isinstance(exc, smtplib.SMTPServerDisconnected):
+                # The server hung up: the rest of the batch needs a new session.
+                connection.close()
+                connection.open()
+            continue
+        NOTIFICATION_SEND_SECONDS.observe(time.perf_counter() - sent_at)
+        NOTIFICATIONS.inc(status="sent")
+        notification.status = PairingNotification.STATUS_SENT
+        notification.error = ""
+        notification.sent_at = timezone.now()
+        counts.sent += 1
+
+
+def pending_count() -> int:
+    return PairingNotification.objects.filter(status=PairingNotification.STATUS_PENDING).count()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from functools import wraps
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+
+from .metrics import record_cache
+
+# Upper bound on staleness when another process made the change (each process
+# has its own cache unless a shared backend is configured), and on how late a
+# due tournament starts when only anonymous visitors load the pages.
+PAGE_CACHE_TIMEOUT = 60
+
+GLOBAL_VERSION_KEY = "pages:version"
+
+
+def _tournament_version_key(tournament_id: int) -> str:
+    return f"pages:version:{tournament_id}"
+
+
+def _fresh_version() -> int:
+    # Not 0: a version key evicted from the cache must not come back with a
+    # value that older pages were stored under.
+    return time.time_ns()
+
+
+def _version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        version = _fresh_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_page_versions(tournament_id: Optional[int] = None) -> None:
+    """
+    Invalidate cached pages: the list pages, plus the pages of
+    ``tournament_id`` when given. Keys are versioned, nothing is deleted.
+
+    The bump waits for the current transaction to commit, otherwise a page
+    rendered from the old data could be stored under the new version.
+    """
+    keys = [GLOBAL_VERSION_KEY]
+    if tournament_id is not None:
+        keys.append(_tournament_version_key(tournament_id))
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _fresh_version(), None)
+
+    transaction.on_commit(bump)
+
+
+def _page_key(request, tournament_id: Optional[int]) -> str:
+    if tournament_id is None:
+        version = _version(GLOBAL_VERSION_KEY)
+    else:
+        version = _version(_tournament_version_key(tournament_id))
+    return f"page:{version}:{request.method}:{request.get_full_path()}"
+
+
+def _bypasses_cache(request) -> bool:
+    return (
+        request.method not in ("GET", "HEAD")
+        or request.user.is_authenticated
+        or CookieStorage.cookie_name in request.COOKIES
+    )
+
+
+def _is_cacheable(request, response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_USED")
+    )
+
+
+def cache_anonymous_page(per_tournament: bool = False):
+    """
+    Serve anonymous GET requests of the decorated view from the cache.
+
+    Works on sync and async views. The key holds the global version, or with
+    ``per_tournament`` the version of the tournament named by the ``pk`` URL
+    argument. Authenticated users, pending flash messages and responses that
+    set cookies (a CSRF token, for instance) bypass the cache.
+    """
+
+    def decorator(view):
+        def key_for(request, kwargs):
+            return _page_key(request, kwargs.get("pk") if per_tournament else None)
+
+        if asyncio.iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if await sync_to_async(_bypasses_cache)(request):
+                    return await view(request, *args, **kwargs)
+                key = key_for(request, kwargs)
+                response = await cache.aget(key)
+                record_cache("page", response is not None)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    if _is_cacheable(request, response):
+                        await cache.aset(key, response, PAGE_CACHE_TIMEOUT)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if _bypasses_cache(request):
+                return view(request, *args, **kwargs)
+            key = key_for(request, kwargs)
+            response = cache.get(key)
+            record_cache("page", response is not None)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if _is_cacheable(request, response):
+                    cache.set(key, response, PAGE_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,72 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+PAGE_SIZE = 20
+# Primary keys are 64-bit integers.
+MAX_PK = 2**63
+
+
+def encode_cursor(when: datetime, pk: int) -> str:
+    raw = json.dumps([when.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """The position encoded in ``cursor``, or None when it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        when, pk = json.loads(raw)
+        when, pk = datetime.fromisoformat(when), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    # Only what encode_cursor writes: an aware datetime and a pk the database can compare.
+    if when.tzinfo is None or not 0 <= pk < MAX_PK:
+        return None
+    return when, pk
+
+
+def _page_queryset(
+    queryset: QuerySet, cursor: Optional[str], field: str, descending: bool, size: int
+) -> QuerySet:
+    position = decode_cursor(cursor)
+    after = "lt" if descending else "gt"
+    if position is not None:
+        when, pk = position
+        queryset = queryset.filter(
+            Q(**{f"{field}__{after}": when}) | Q(**{field: when, f"pk__{after}": pk})
+        )
+    prefix = "-" if descending else ""
+    return queryset.order_by(f"{prefix}{field}", f"{prefix}pk")[: size + 1]
+
+
+def _split_page(rows: List, field: str, size: int) -> Tuple[List, Optional[str]]:
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field), last.pk)
+
+
+async def akeyset_page(
+    queryset: QuerySet,
+    cursor: Optional[str],
+    field: str = "start_datetime",
+    descending: bool = False,
+    size: int = PAGE_SIZE,
+) -> Tuple[List, Optional[str]]:
+    """
+    One page of ``queryset`` ordered by ``field`` then pk, starting after the
+    row encoded in ``cursor``. The position is a WHERE clause on the ordering
+    columns rather than an OFFSET, so the cost of a page does not grow with
+    the number of pages before it. Returns the rows and the next page's
+    cursor (None on the last page).
+    """
+    rows = [row async for row in _page_queryset(queryset, cursor, field, descending, size)]
+    return _split_page(rows, field, size)
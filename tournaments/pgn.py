@@ -0,0 +1,199 @@
+import io
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List
+
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+SEVEN_TAG_ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+
+_HEADER_RE = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]\s*$')
+_TOKEN_RE = re.compile(r"\{|\}|\(|\)|;|\$\d+|[^\s{}();]+")
+_MOVE_NUMBER_RE = re.compile(r"^\d+\.+")
+_UNESCAPE_RE = re.compile(r'\\(["\\])')
+_SAN_RE = re.compile(
+    r"^(?:(?P<castle>O-O-O|O-O)"
+    r"|(?P<piece>[NBRQK])?(?P<file>[a-h])?(?P<rank>[1-8])?(?P<capture>x)?"
+    r"(?P<dest>[a-h][1-8])(?:=?(?P<promo>[NBRQ]))?)"
+    r"(?P<check>[+#])?$"
+)
+
+
+class PgnError(ValueError):
+    pass
+
+
+@dataclass
+class PgnGame:
+    headers: Dict[str, str] = field(default_factory=dict)
+    moves: List[str] = field(default_factory=list)
+    result: str = "*"
+
+
+# --- Streaming parser ------------------------------------------------------
+
+
+def iter_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    """
+    Parse PGN from an iterable of lines, yielding one ``PgnGame`` at a time.
+
+    Only the main line is kept: comments, variations, NAGs and move numbers are
+    dropped. Memory use is bounded by the largest single game, not by the input.
+    """
+    game = PgnGame()
+    in_movetext = False
+    comment = False
+    depth = 0
+
+    for raw in lines:
+        line = raw.strip()
+        if not comment and depth == 0:
+            if line.startswith("%"):
+                continue
+            header = _HEADER_RE.match(line)
+            if header:
+                if in_movetext:
+                    # New game starting without a termination marker.
+                    yield game
+                    game, in_movetext = PgnGame(), False
+                game.headers[header.group(1)] = _UNESCAPE_RE.sub(r"\1", header.group(2))
+                continue
+        for token in _TOKEN_RE.findall(line):
+            if comment:
+                comment = token != "}"
+                continue
+            if token == "{":
+                comment = True
+            elif token == ";":
+                break
+            elif token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(depth - 1, 0)
+            elif depth or token.startswith("$"):
+                continue
+            elif token in RESULTS:
+                game.result = token
+                yield game
+                game, in_movetext = PgnGame(), False
+            else:
+                in_movetext = True
+                san = _MOVE_NUMBER_RE.sub("", token).rstrip("!?")
+                if san:
+                    game.moves.append(san)
+
+    if in_movetext or game.headers:
+        game.result = game.headers.get("Result", game.result)
+        yield game
+
+
+def iter_text_lines(upload, encoding: str = "utf-8") -> Iterator[str]:
+    """Read an uploaded file lazily as text lines, without loading it whole."""
+    upload.seek(0)
+    return io.TextIOWrapper(upload.file, encoding=encoding, errors="replace")
+
+
+def first_game(lines: Iterable[str]) -> PgnGame:
+    for game in iter_games(lines):
+        if game.moves:
+            return game
+    raise PgnError("Aucune partie trouvée dans ce PGN.")
+
+
+# --- Compact move encoding -------------------------------------------------
+#
+# Each SAN move packs into a big-endian 16-bit word:
+#   bits 0-5   destination square (file + 8 * rank)
+#   bits 6-8   piece: 0 pawn, 1 N, 2 B, 3 R, 4 Q, 5 K, 6 O-O, 7 O-O-O
+#   bit  9     capture
+#   bits 10-11 suffix: 0 none, 1 "+", 2 "#"
+#   bits 12-14 promotion: 0 none, 1 N, 2 B, 3 R, 4 Q
+#   bit  15    a disambiguation byte follows: from-file (high nibble, 1-8)
+#              and from-rank (low nibble, 1-8), 0 when absent
+# Most moves take 2 bytes, pawn captures and disambiguated moves 3.
+
+_PIECES = "PNBRQK"
+_PROMOTIONS = " NBRQ"
+_SUFFIXES = ("", "+", "#")
+_FILES = "abcdefgh"
+
+
+def _encode_san(san: str) -> bytes:
+    m = _SAN_RE.match(san.replace("0", "O"))
+    if not m:
+        raise PgnError(f"Coup invalide : {san}")
+    word = _SUFFIXES.index(m.group("check") or "") << 10
+    if m.group("castle"):
+        word |= (6 if m.group("castle") == "O-O" else 7) << 6
+        return word.to_bytes(2, "big")
+    dest = m.group("dest")
+    word |= _FILES.index(dest[0]) + 8 * (int(dest[1]) - 1)
+    word |= _PIECES.index(m.group("piece") or "P") << 6
+    word |= bool(m.group("capture")) << 9
+    word |= _PROMOTIONS.index(m.group("promo") or " ") << 12
+    from_file = _FILES.index(m.group("file")) + 1 if m.group("file") else 0
+    from_rank = int(m.group("rank")) if m.group("rank") else 0
+    if from_file or from_rank:
+        return (word | 0x8000).to_bytes(2, "big") + bytes([from_file << 4 | from_rank])
+    return word.to_bytes(2, "big")
+
+
+def encode_moves(moves: Iterable[str]) -> bytes:
+    return b"".join(_encode_san(san) for san in moves)
+
+
+def iter_decoded_moves(data: bytes) -> Iterator[str]:
+    i = 0
+    while i < len(data):
+        word = int.from_bytes(data[i : i + 2], "big")
+        i += 2
+        piece = (word >> 6) & 0x7
+        suffix = _SUFFIXES[(word >> 10) & 0x3]
+        if piece >= 6:
+            yield ("O-O" if piece == 6 else "O-O-O") + suffix
+            continue
+        dest = word & 0x3F
+        origin = ""
+        if word & 0x8000:
+            extra = data[i]
+            i += 1
+            if extra >> 4:
+                origin += _FILES[(extra >> 4) - 1]
+            if extra & 0xF:
+                origin += str(extra & 0xF)
+        san = (_PIECES[piece] if piece else "") + origin
+        san += "x" if word & 0x200 else ""
+        san += _FILES[dest % 8] + str(dest // 8 + 1)
+        promo = (word >> 12) & 0x7
+        if promo:
+            san += "=" + _PROMOTIONS[promo]
+        yield san + suffix
+
+
+def decode_moves(data: bytes) -> List[str]:
+    return list(iter_decoded_moves(bytes(data)))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def export_pgn(headers: Dict[str, str], moves: List[str], result: str) -> str:
+    """Render a game back to PGN text, Seven Tag Roster first."""
+    ordered = [(k, headers.get(k, "?")) for k in SEVEN_TAG_ROSTER]
+    ordered += [(k, v) for k, v in headers.items() if k not in SEVEN_TAG_ROSTER]
+    lines = [f'[{k} "{_escape(v)}"]' for k, v in ordered]
+    tokens = []
+    for ply, san in enumerate(moves):
+        if ply % 2 == 0:
+            tokens.append(f"{ply // 2 + 1}.")
+        tokens.append(san)
+    tokens.append(result)
+    movetext, current = [], ""
+    for token in tokens:
+        if current and len(current) + len(token) + 1 > 79:
+            movetext.append(current)
+            current = token
+        else:
+            current = f"{current} {token}" if current else token
+    movetext.append(current)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n"
@@ -0,0 +1,218 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+# How many functions of the call tree are kept in the summary.
+TOP_FUNCTIONS = 40
+# SQL statements are cut to this length in the timeline.
+SQL_PREVIEW = 500
+
+_NAME = re.compile(r"^[0-9]+-[\w.:-]+$")
+_UNSAFE = re.compile(r"[^\w.:-]")
+
+# Statements of the request being profiled: (start offset, duration, sql).
+_timeline: ContextVar[Optional[list]] = ContextVar("sql_timeline", default=None)
+
+# One profiled request at a time per process: profilers would see each
+# other's calls, and it bounds the overhead when sampling is too generous.
+_busy = threading.Lock()
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def profile_dir() -> Path:
+    return Path(_setting("PROFILER_DIR", settings.BASE_DIR / "profiles"))
+
+
+def is_requested(request) -> bool:
+    """Whether the request carries ``PROFILER_HEADER`` (honoured for staff only)."""
+    return bool(request.headers.get(_setting("PROFILER_HEADER", "X-Profile")))
+
+
+def is_sampled() -> bool:
+    rate = _setting("PROFILER_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def should_profile(request) -> bool:
+    """Sampled at ``PROFILER_SAMPLE_RATE``, or asked for by a staff member."""
+    if is_requested(request):
+        return request.user.is_staff
+    return is_sampled()
+
+
+def record_sql(execute, sql, params, many, context):
+    """``connection_created`` execute wrapper: time statements of profiled requests."""
+    timeline = _timeline.get()
+    if timeline is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timeline.append((start, time.perf_counter() - start, sql))
+
+
+def install_sql_timeline(sender, connection, **kwargs) -> None:
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+class RequestProfile:
+    """
+    cProfile and SQL timeline of one request, from ``begin`` to ``stop``.
+    ``begin`` and ``stop`` must run in the same thread and context (the
+    event loop's, under ASGI); ``save`` may run anywhere.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.timeline: list = []
+        self.started_at = time.time()
+        self.start = 0.0
+        self.duration = 0.0
+        self._token = None
+
+    @classmethod
+    def begin(cls) -> Optional["RequestProfile"]:
+        if not _busy.acquire(blocking=False):
+            return None
+        profile = cls()
+        profile._token = _timeline.set(profile.timeline)
+        profile.start = time.perf_counter()
+        profile.profiler.enable()
+        return profile
+
+    def stop(self) -> None:
+        try:
+            self.profiler.disable()
+            self.duration = time.perf_counter() - self.start
+            _timeline.reset(self._token)
+        finally:
+            _busy.release()
+
+    def save(self, request, response) -> None:
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        try:
+            write_profile(self, view, request, response, self.duration)
+        except OSError:
+            pass  # never fail the request over a profile
+
+    def finish(self, request, response) -> None:
+        self.stop()
+        self.save(request, response)
+
+
+def _short_path(filename: str) -> str:
+    base = str(settings.BASE_DIR)
+    return os.path.relpath(filename, base) if filename.startswith(base) else filename
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, nc, tottime, cumtime, callers) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{function} ({_short_path(filename)}:{line})",
+                "calls": nc,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+                "callers": sorted(
+                    f"{name} ({os.path.basename(path)}:{at})" for path, at, name in callers
+                )[:5],
+            }
+        )
+    rows.sort(key=lambda row: -row["cumtime_ms"])
+    return rows[:TOP_FUNCTIONS]
+
+
+def write_profile(profile: RequestProfile, view: str, request, response, duration: float) -> str:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{_UNSAFE.sub('_', view)}"
+    profile.profiler.dump_stats(directory / f"{name}.prof")
+    summary = {
+        "name": name,
+        "view": view,
+        "method": request.method,
+        "path": request.get_full_path()[:300],
+        "status": getattr(response, "status_code", None),
+        "started_at": profile.started_at,
+        "duration_ms": round(duration * 1000, 2),
+        "sql_count": len(profile.timeline),
+        "sql_ms": round(sum(d for _, d, _ in profile.timeline) * 1000, 2),
+        "sql": [
+            {
+                "at_ms": round((start - profile.start) * 1000, 2),
+                "duration_ms": round(d * 1000, 3),
+                "sql": sql[:SQL_PREVIEW],
+            }
+            for start, d, sql in profile.timeline
+        ],
+        "functions": _top_functions(profile.profiler),
+    }
+    (directory / f"{name}.json").write_text(json.dumps(summary), encoding="utf-8")
+    _rotate(directory, _setting("PROFILER_MAX_FILES", 200))
+    return name
+
+
+def _rotate(directory: Path, keep: int) -> None:
+    """Keep the ``keep`` newest profiles (names start with a timestamp)."""
+    names = sorted(path.stem for path in directory.glob("*.json"))
+    for name in names[: max(len(names) - keep, 0)]:
+        for suffix in (".json", ".prof"):
+            try:
+                (directory / f"{name}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+
+def load_profile(name: str) -> Optional[Dict]:
+    if not _NAME.match(name):
+        return None
+    try:
+        return json.loads((profile_dir() / f"{name}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def profile_path(name: str) -> Optional[Path]:
+    """The raw cProfile dump of ``name``, for pstats or snakeviz."""
+    path = profile_dir() / f"{name}.prof"
+    return path if _NAME.match(name) and path.is_file() else None
+
+
+def slowest_by_view(per_view: int = 5) -> List[Dict]:
+    """Recent profiles grouped by view, slowest first; views by their worst request."""
+    groups: Dict[str, List[Dict]] = defaultdict(list)
+    for path in profile_dir().glob("*.json"):
+        summary = load_profile(path.stem)
+        if summary is None:
+            continue
+        summary.pop("sql", None)
+        summary.pop("functions", None)
+        summary["started"] = datetime.fromtimestamp(summary["started_at"], tz=timezone.utc)
+        groups[summary["view"]].append(summary)
+    views = []
+    for view, profiles in groups.items():
+        profiles.sort(key=lambda p: -p["duration_ms"])
+        views.append({"view": view, "count": len(profiles), "slowest": profiles[:per_view]})
+    views.sort(key=lambda v: -v["slowest"][0]["duration_ms"])
+    return views
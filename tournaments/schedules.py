@@ -0,0 +1,65 @@
+from typing import List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+Pairing = Tuple[Optional[T], Optional[T]]
+
+
+def round_robin(players: Sequence[T]) -> List[List[Pairing]]:
+    """
+    Berger-style all-play-all schedule, as ``rounds[r] = [(white, black), ...]``.
+
+    Circle method: the first slot stays put while the others rotate one step per
+    round. With an odd field a ``None`` takes the fixed slot and whoever meets it
+    has the bye (returned as ``(player, None)``). Colours alternate by board, and
+    the fixed slot alternates by round, so nobody gets more than two of the same
+    colour in a row and the totals differ by at most one.
+    """
+    slots: List[Optional[T]] = list(players)
+    if len(slots) % 2:
+        slots.insert(0, None)
+    size = len(slots)
+    rounds = []
+    for r in range(size - 1):
+        pairs = []
+        for k in range(size // 2):
+            white, black = slots[k], slots[size - 1 - k]
+            if (k == 0 and r % 2 == 1) or k % 2 == 1:
+                white, black = black, white
+            if white is None:
+                white, black = black, None
+            pairs.append((white, black))
+        rounds.append(pairs)
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+    return rounds
+
+
+def bracket_order(size: int) -> List[int]:
+    """Seed numbers (1-based) in bracket order, so that seeds 1 and 2 can only meet in the final."""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+def knockout(players: Sequence[T]) -> List[List[Pairing]]:
+    """
+    Single-elimination bracket for ``players`` in seeding order.
+
+    The field is padded to a power of two: the top seeds get a first-round bye,
+    returned as ``(player, None)``. Later rounds are all ``(None, None)``
+    placeholders, filled in as winners advance: the winner of board ``b`` of a
+    round plays board ``b // 2`` of the next one, as white when ``b`` is even.
+    """
+    size = 1
+    while size < len(players):
+        size *= 2
+    seeds = [players[seed - 1] if seed <= len(players) else None for seed in bracket_order(size)]
+    rounds = [[(seeds[i], seeds[i + 1]) for i in range(0, size, 2)]]
+    rounds[0] = [(a, b) if a is not None else (b, None) for a, b in rounds[0]]
+    boards = size // 4
+    while boards >= 1:
+        rounds.append([(None, None)] * boards)
+        boards //= 2
+    return rounds
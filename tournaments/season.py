@@ -0,0 +1,138 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .matrix import DRAW, LOSS, WIN, ResultMatrix
+from .models import SeasonResult, SeasonStanding, Tournament, season_of
+from .tiebreaks import DEFAULT_RATING, ranking
+
+# Totals copied from each SeasonResult into the season standing.
+SUMMED_FIELDS = ("points", "games", "wins", "draws", "losses", "opponent_rating_sum")
+COUNTED_FIELDS = ("tournaments", "podiums", "titles")
+
+Key = Tuple[int, int]
+
+
+def tournament_season(tournament: Tournament) -> int:
+    return season_of(timezone.localtime(tournament.start_datetime))
+
+
+def season_results(tournament: Tournament) -> List[SeasonResult]:
+    """Final rank and game totals of every ranked player, from the result matrix."""
+    matrix = ResultMatrix.cached(tournament)
+    order, scores, _ = ranking(matrix)
+    ratings = [r or DEFAULT_RATING for r in matrix.ratings]
+    season = tournament_season(tournament)
+    rounds = matrix.rounds
+    results = []
+    for rank, i in enumerate(order, start=1):
+        result = SeasonResult(
+            tournament=tournament,
+            user_id=matrix.user_ids[i],
+            season=season,
+            rank=rank,
+            points=scores[i],
+        )
+        for cell in range(i * rounds, (i + 1) * rounds):
+            outcome = matrix.outcome[cell]
+            if outcome not in (WIN, DRAW, LOSS):
+                continue
+            result.games += 1
+            result.wins += outcome == WIN
+            result.draws += outcome == DRAW
+            result.losses += outcome == LOSS
+            result.opponent_rating_sum += ratings[matrix.opponent[cell]]
+        results.append(result)
+    return results
+
+
+def _add(totals: Dict[Key, Dict[str, float]], results: Iterable[SeasonResult], sign: int) -> None:
+    for result in results:
+        row = totals[(result.season, result.user_id)]
+        for name in SUMMED_FIELDS:
+            row[name] += sign * getattr(result, name)
+        row["tournaments"] += sign
+        row["podiums"] += sign * (result.rank <= 3)
+        row["titles"] += sign * (result.rank == 1)
+
+
+@transaction.atomic
+def record_season_results(tournament: Tournament) -> None:
+    """
+    Bring the season leaderboard in line with ``tournament``: its previous
+    contribution (if any) is replaced by the current one, applied as a delta
+    to the touched standings only. A tournament that is no longer completed
+    simply has its contribution removed.
+    """
+    old = list(SeasonResult.objects.filter(tournament=tournament))
+    new = season_results(tournament) if tournament.is_completed else []
+    deltas: Dict[Key, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    _add(deltas, old, -1)
+    _add(deltas, new, 1)
+    if not deltas:
+        return
+
+    standings = {
+        (s.season, s.user_id): s
+        for s in SeasonStanding.objects.select_for_update().filter(
+            season__in={season for season, _ in deltas},
+            user_id__in={user_id for _, user_id in deltas},
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for (season, user_id), delta in deltas.items():
+        standing = standings.get((season, user_id))
+        if standing is None:
+            standing = SeasonStanding(season=season, user_id=user_id)
+            to_create.append(standing)
+        else:
+            to_update.append(standing)
+        for name, value in delta.items():
+            total = getattr(standing, name) + value
+            setattr(standing, name, total if name == "points" else int(total))
+        if standing.tournaments <= 0 and standing.pk:
+            to_delete.append(standing.pk)
+    SeasonStanding.objects.bulk_create(s for s in to_create if s.tournaments > 0)
+    SeasonStanding.objects.bulk_update(to_update, SUMMED_FIELDS + COUNTED_FIELDS)
+    SeasonStanding.objects.filter(pk__in=to_delete).delete()
+
+    SeasonResult.objects.filter(tournament=tournament).delete()
+    SeasonResult.objects.bulk_create(new)
+
+
+@transaction.atomic
+def rebuild_season_standings(season: Optional[int] = None) -> int:
+    """Recompute the leaderboard from scratch (one season or all). Returns the number of tournaments."""
+    results = SeasonResult.objects.all()
+    standings = SeasonStanding.objects.all()
+    if season is not None:
+        results = results.filter(season=season)
+        standings = standings.filter(season=season)
+    results.delete()
+    standings.delete()
+
+    new: List[SeasonResult] = []
+    count = 0
+    for tournament in Tournament.objects.filter(status=Tournament.STATUS_COMPLETED).iterator():
+        if season is not None and tournament_season(tournament) != season:
+            continue
+        new.extend(season_results(tournament))
+        count += 1
+    totals: Dict[Key, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    _add(totals, new, 1)
+    SeasonResult.objects.bulk_create(new, batch_size=500)
+    SeasonStanding.objects.bulk_create(
+        (
+            SeasonStanding(
+                season=key[0],
+                user_id=key[1],
+                points=row["points"],
+                **{name: int(row[name]) for name in SUMMED_FIELDS + COUNTED_FIELDS if name != "points"},
+            )
+            for key, row in totals.items()
+        ),
+        batch_size=500,
+    )
+    return count
@@ -1,38 +1,95 @@
 import random
-from typing import List, Tuple
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils import timezone
 
+from .arena import drop_queue, on_results as on_arena_results, start_arena
+from .events import log_results
+from .matrix import BLACK, PENDING, WHITE, ResultMatrix, bump_state_version
+from .metrics import PAIRING_SECONDS
 from .models import (
+    Game,
     Match,
     Round,
     Tournament,
     TournamentRegistration,
-    color_balance_for_player,
-    standings_for_tournament,
 )
+from .notifications import queue_pairing_notifications
+from .page_cache import bump_page_versions
+from .pgn import PgnGame, encode_moves
+from .schedules import knockout, round_robin
+from .season import record_season_results
+from .tiebreaks import BUCHHOLZ, ranking
 
 User = get_user_model()
 
 
-def _sorted_players_for_round(tournament: Tournament) -> List[User]:
-    table = standings_for_tournament(tournament)
-    table.sort(
-        key=lambda row: (
-            -row["score"],
-            -row["buchholz"],
-            row["user"].username.lower(),
-        )
-    )
-    return [row["user"] for row in table]
+@dataclass
+class PairingPlan:
+    """
+    Pairings of the next Swiss round, computed in memory without writing
+    anything. ``pairings`` and ``bye`` hold user ids and may be overridden
+    before the plan is committed; ``colors`` and ``met`` are the history the
+    plan was computed from.
+    """
+
+    round_number: int
+    players: Dict[int, User]
+    pairings: List[Tuple[int, int]]
+    bye: Optional[int]
+    colors: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+    met: Set[FrozenSet[int]] = field(default_factory=set)
+    pending_games: int = 0
+    elapsed_ms: float = 0.0
+    queries: int = 0
+
+    def errors(self) -> List[str]:
+        seen: Dict[int, int] = {}
+        for white, black in self.pairings:
+            for user_id in (white, black):
+                seen[user_id] = seen.get(user_id, 0) + 1
+        if self.bye is not None:
+            seen[self.bye] = seen.get(self.bye, 0) + 1
+        errors = []
+        twice = [self.players[u].username for u, n in seen.items() if n > 1 and u in self.players]
+        if twice:
+            errors.append(f"Apparié plusieurs fois : {', '.join(sorted(twice))}.")
+        unknown = [u for u in seen if u not in self.players]
+        if unknown:
+            errors.append("Un joueur apparié n'est pas inscrit au tournoi.")
+        missing = [user.username for u, user in self.players.items() if u not in seen]
+        if missing:
+            errors.append(f"Non apparié : {', '.join(sorted(missing))}.")
+        return errors
+
+    def rematches(self) -> List[Tuple[User, User]]:
+        return [
+            (self.players[white], self.players[black])
+            for white, black in self.pairings
+            if frozenset((white, black)) in self.met
+        ]
 
+    def rows(self) -> List[Dict]:
+        rows = []
+        for board, (white, black) in enumerate(self.pairings, start=1):
+            rows.append(
+                {
+                    "board": board,
+                    "white": self.players[white].username,
+                    "black": self.players[black].username,
+                    "rematch": frozenset((white, black)) in self.met,
+                }
+            )
+        return rows
 
-def _choose_colors(
-    tournament: Tournament, p1: User, p2: User
-) -> Tuple[User, User]:
-    w1, b1 = color_balance_for_player(tournament, p1)
-    w2, b2 = color_balance_for_player(tournament, p2)
+
+def _choose_colors(plan: PairingPlan, p1: int, p2: int) -> Tuple[int, int]:
+    w1, b1 = plan.colors[p1]
+    w2, b2 = plan.colors[p2]
     diff1 = w1 - b1
     diff2 = w2 - b2
     # Assign colors to reduce imbalance
@@ -41,14 +98,124 @@ def _choose_colors(
     if diff2 > diff1:
         return p1, p2
     # If perfectly balanced, alternate by username for determinism
-    if p1.username < p2.username:
+    if plan.players[p1].username < plan.players[p2].username:
         return p1, p2
     return p2, p1
 
 
+def _compute_pairings(tournament: Tournament) -> PairingPlan:
+    matrix = ResultMatrix.cached(tournament)
+    order, scores, values = ranking(matrix)
+    active = [i for i in range(len(matrix)) if matrix.active[i]]
+    players = User.objects.select_related("profile").in_bulk(
+        [matrix.user_ids[i] for i in active]
+    )
+    rounds = matrix.rounds
+    plan = PairingPlan(tournament.current_round + 1, players, [], None)
+    for i in range(len(matrix)):
+        cells = range(i * rounds, (i + 1) * rounds)
+        colors = matrix.color[i * rounds : (i + 1) * rounds]
+        plan.colors[matrix.user_ids[i]] = (colors.count(WHITE), colors.count(BLACK))
+        for cell in cells:
+            if matrix.outcome[cell] == PENDING:
+                plan.pending_games += 1
+            if matrix.opponent[cell] >= 0:
+                plan.met.add(frozenset((matrix.user_ids[i], matrix.user_ids[matrix.opponent[cell]])))
+
+    if plan.round_number == 1:
+        queue = [matrix.user_ids[i] for i in active]
+        random.shuffle(queue)
+    else:
+        queue = [
+            matrix.user_ids[i]
+            for i in sorted(
+                active,
+                key=lambda i: (-scores[i], -values[BUCHHOLZ][i], matrix.usernames[i].lower()),
+            )
+        ]
+    while len(queue) >= 2:
+        plan.pairings.append(_choose_colors(plan, queue.pop(0), queue.pop(0)))
+    plan.bye = queue[0] if queue else None
+    plan.pending_games //= 2
+    return plan
+
+
+def plan_next_round(tournament: Tournament) -> PairingPlan:
+    """
+    Dry run of the next Swiss round: the pairings ``generate_next_round``
+    would write, with the time and number of queries it took to compute them.
+    While the current round is still being played, the preview treats its
+    pending games as not played (``plan.pending_games`` counts them).
+    """
+    if tournament.is_arena or tournament.has_fixed_schedule:
+        raise ValueError("Ce format de tournoi n'a pas d'appariement par round.")
+    if not tournament.is_running or tournament.current_round >= tournament.rounds_planned:
+        raise ValueError("Aucun round à apparier.")
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    with connection.execute_wrapper(count):
+        plan = _compute_pairings(tournament)
+    plan.elapsed_ms = (time.perf_counter() - started) * 1000
+    plan.queries = queries
+    return plan
+
+
+@transaction.atomic
+def commit_pairings(tournament: Tournament, plan: PairingPlan) -> Round:
+    """
+    Write a (possibly overridden) plan: the round and all its boards in one
+    bulk INSERT. Refused if the tournament moved on since the plan was made.
+    """
+    current = (
+        Tournament.objects.select_for_update()
+        .filter(pk=tournament.pk)
+        .values_list("current_round", flat=True)
+        .get()
+    )
+    if current + 1 != plan.round_number:
+        raise ValueError("Le tournoi a changé depuis l'aperçu : recalculez les appariements.")
+    if not can_generate_next_round(tournament):
+        raise ValueError("Terminez d'abord tous les matchs du round en cours.")
+    errors = plan.errors()
+    if errors:
+        raise ValueError(" ".join(errors))
+
+    round_obj, _ = Round.objects.get_or_create(
+        tournament=tournament, number=plan.round_number
+    )
+    matches = [
+        Match(round=round_obj, board=board, white_player_id=white, black_player_id=black)
+        for board, (white, black) in enumerate(plan.pairings, start=1)
+    ]
+    if plan.bye is not None:
+        matches.append(
+            Match(
+                round=round_obj,
+                board=len(matches) + 1,
+                white_player_id=plan.bye,
+                result=Match.RESULT_BYE,
+            )
+        )
+    Match.objects.bulk_create(matches)
+
+    tournament.current_round = plan.round_number
+    tournament.save(update_fields=["current_round"])
+    queue_pairing_notifications(round_obj)
+    return round_obj
+
+
 def can_generate_next_round(tournament: Tournament) -> bool:
     if tournament.status != Tournament.STATUS_RUNNING:
         return False
+    if tournament.is_arena:
+        # Arena games are paired continuously after the opening round.
+        return tournament.current_round == 0
     if tournament.current_round == 0:
         return True
     last_round = tournament.rounds.filter(number=tournament.current_round).first()
@@ -57,45 +224,325 @@ def can_generate_next_round(tournament: Tournament) -> bool:
     return tournament.current_round < tournament.rounds_planned
 
 
+def _next_knockout_board(match: Match) -> Tuple[int, bool]:
+    """Board of the next round the winner of ``match`` plays on, and whether as white."""
+    return (match.board - 1) // 2 + 1, (match.board - 1) % 2 == 0
+
+
+def can_submit_result(tournament, match, user):
+    if match.is_bye:
+        return False
+    if match.white_player_id is None or match.black_player_id is None:
+        # Knockout board still waiting for the winners of the previous round.
+        return False
+    if tournament.has_fixed_schedule and match.round.number > tournament.current_round:
+        return False
+    if tournament.is_knockout and match.result != Match.RESULT_PENDING:
+        board, _ = _next_knockout_board(match)
+        if Match.objects.filter(
+            round__tournament=tournament, round__number=match.round.number + 1, board=board
+        ).exclude(result=Match.RESULT_PENDING).exists():
+            # The winner already played on: the bracket can no longer change.
+            return False
+    # Once a result is set, only admins can modify it
+    if match.result != Match.RESULT_PENDING:
+        return user.is_staff
+    if tournament.mode == Tournament.MODE_ADMIN:
+        return user.is_staff
+    return user.is_staff or match.involves(user)
+
+
+@PAIRING_SECONDS.time()
 @transaction.atomic
 def generate_next_round(tournament: Tournament) -> Round:
     if not can_generate_next_round(tournament):
         raise ValueError("Les conditions pour générer un round ne sont pas remplies.")
+    if tournament.is_arena:
+        return start_arena(tournament)
+    if tournament.has_fixed_schedule:
+        if tournament.current_round == 0:
+            round_obj = _create_schedule(tournament)
+        else:
+            round_obj = _open_scheduled_round(tournament, tournament.current_round + 1)
+        queue_pairing_notifications(round_obj)
+        return round_obj
+
+    return commit_pairings(tournament, plan_next_round(tournament))
 
-    next_number = tournament.current_round + 1
-    round_obj, _ = Round.objects.get_or_create(
-        tournament=tournament, number=next_number
-    )
 
-    registrations = list(
-        TournamentRegistration.objects.filter(
-            tournament=tournament, is_active=True
-        ).select_related("user")
+def _seeded_players(tournament: Tournament) -> List[int]:
+    """Active players by chess.com Elo (unrated last), then registration order."""
+    regs = (
+        TournamentRegistration.objects.filter(tournament=tournament, is_active=True)
+        .order_by("joined_at", "id")
+        .values_list("user_id", "user__profile__chesscom_elo")
     )
-    players = [r.user for r in registrations]
+    return [user_id for user_id, elo in sorted(regs, key=lambda reg: -(reg[1] or 0))]
 
-    if next_number == 1:
-        random.shuffle(players)
+
+def _create_schedule(tournament: Tournament) -> Round:
+    """
+    Write the whole schedule of a round-robin or knockout tournament at once:
+    one bulk INSERT for the rounds and one for every board of every round.
+    Later rounds then only need opening; knockout boards of later rounds start
+    empty and are filled in as winners advance.
+    """
+    players = _seeded_players(tournament)
+    if len(players) < 2:
+        raise ValueError("Il faut au moins deux joueurs inscrits.")
+    if tournament.is_knockout:
+        schedule = knockout(players)
     else:
-        players = _sorted_players_for_round(tournament)
-
-    pairings: List[Tuple[User, User]] = []
-    while len(players) >= 2:
-        p1 = players.pop(0)
-        p2 = players.pop(0)
-        pairings.append(_choose_colors(tournament, p1, p2))
-    bye_player = players[0] if players else None
-
-    for white, black in pairings:
-        Match.objects.create(round=round_obj, white_player=white, black_player=black)
-    if bye_player:
-        Match.objects.create(
-            round=round_obj,
-            white_player=bye_player,
-            black_player=None,
-            result=Match.RESULT_BYE,
+        random.shuffle(players)
+        schedule = round_robin(players)
+
+    Round.objects.filter(tournament=tournament).delete()
+    Round.objects.bulk_create(
+        Round(tournament=tournament, number=number)
+        for number in range(1, len(schedule) + 1)
+    )
+    round_ids = dict(
+        Round.objects.filter(tournament=tournament).values_list("number", "id")
+    )
+    boards = []
+    for number, pairings in enumerate(schedule, start=1):
+        boards.append(
+            [
+                Match(
+                    round_id=round_ids[number],
+                    board=board,
+                    white_player_id=white,
+                    black_player_id=black,
+                    # Later byes are scored when their round opens.
+                    result=(
+                        Match.RESULT_BYE if number == 1 and white and not black else Match.RESULT_PENDING
+                    ),
+                )
+                for board, (white, black) in enumerate(pairings, start=1)
+            ]
         )
+    if tournament.is_knockout and len(boards) > 1:
+        # First-round byes go straight to the second round.
+        for match in boards[0]:
+            if match.result == Match.RESULT_BYE:
+                _place_winner(boards[1], match, match.white_player_id)
+    Match.objects.bulk_create(match for pairings in boards for match in pairings)
+
+    tournament.current_round = 1
+    tournament.rounds_planned = len(schedule)
+    tournament.save(update_fields=["current_round", "rounds_planned"])
+    return Round.objects.get(pk=round_ids[1])
+
 
-    tournament.current_round = next_number
+def _open_scheduled_round(tournament: Tournament, number: int) -> Round:
+    round_obj = tournament.rounds.get(number=number)
+    round_obj.started_at = timezone.now()
+    round_obj.save(update_fields=["started_at"])
+    if not tournament.is_knockout:
+        # A knockout board with one player is waiting for a winner, not a bye.
+        round_obj.matches.filter(
+            white_player__isnull=False, black_player__isnull=True, result=Match.RESULT_PENDING
+        ).update(result=Match.RESULT_BYE, updated_at=round_obj.started_at)
+    tournament.current_round = number
     tournament.save(update_fields=["current_round"])
     return round_obj
+
+
+def _place_winner(next_boards: List[Match], match: Match, winner_id: Optional[int]) -> Match:
+    board, as_white = _next_knockout_board(match)
+    target = next_boards[board - 1]
+    if as_white:
+        target.white_player_id = winner_id
+    else:
+        target.black_player_id = winner_id
+    return target
+
+
+def _advance_knockout(tournament: Tournament, matches: List[Match]) -> None:
+    """Copy the winners of ``matches`` into their next-round boards, in one UPDATE."""
+    decided = [m for m in matches if m.board and m.round.number < tournament.rounds_planned]
+    if not decided:
+        return
+    next_rounds: Dict[int, List[Match]] = {}
+    for m in (
+        Match.objects.filter(
+            round__tournament=tournament,
+            round__number__in={m.round.number + 1 for m in decided},
+        )
+        .select_related("round")
+        .order_by("board")
+    ):
+        next_rounds.setdefault(m.round.number, []).append(m)
+    touched = {}
+    for match in decided:
+        winner = {
+            Match.RESULT_WHITE: match.white_player_id,
+            Match.RESULT_BLACK: match.black_player_id,
+        }.get(match.result)
+        target = _place_winner(next_rounds[match.round.number + 1], match, winner)
+        touched[target.pk] = target
+    Match.objects.bulk_update(touched.values(), ["white_player", "black_player"])
+
+
+@transaction.atomic
+def mark_tournament_completed(tournament: Tournament) -> None:
+    tournament.status = Tournament.STATUS_COMPLETED
+    tournament.save(update_fields=["status"])
+    record_season_results(tournament)
+    if tournament.is_arena:
+        transaction.on_commit(lambda: drop_queue(tournament))
+
+
+def close_round_if_complete(tournament: Tournament, rnd: Round) -> Optional[str]:
+    """
+    Stamp ``rnd`` as ended once no match is pending and move the tournament on.
+
+    Returns ``"next_round"`` when the following round was paired,
+    ``"completed"`` when the last round closed the tournament, ``None`` otherwise.
+    """
+    if rnd.matches.filter(result=Match.RESULT_PENDING).exists():
+        return None
+    rnd.ended_at = timezone.now()
+    rnd.save(update_fields=["ended_at"])
+    if (
+        tournament.status != Tournament.STATUS_RUNNING
+        or tournament.current_round != rnd.number
+    ):
+        return None
+    if tournament.current_round < tournament.rounds_planned:
+        if not tournament.pairs_automatically:
+            return None
+        try:
+            generate_next_round(tournament)
+        except ValueError:
+            return None
+        return "next_round"
+    mark_tournament_completed(tournament)
+    return "completed"
+
+
+@transaction.atomic
+def apply_results(
+    tournament: Tournament, updates: Iterable[Tuple[Match, str]], user: User
+) -> Optional[str]:
+    """
+    Write every ``(match, result)`` pair in one batched UPDATE, then check round
+    completion once per touched round (oldest first) so the next round is paired
+    at most once, after all results are in.
+
+    Current results are re-read under a row lock first: when two players submit
+    the same board concurrently, only the first write of a pending result wins
+    (staff may still overwrite). Every change is appended to the result log in
+    the same transaction, which keeps the head-to-head index current.
+    """
+    updates = list(updates)
+    if tournament.is_knockout and any(result == Match.RESULT_DRAW for _, result in updates):
+        raise ValueError("Pas de nulle en élimination directe : indiquez le vainqueur.")
+    previous = dict(
+        Match.objects.select_for_update()
+        .filter(pk__in=[match.pk for match, _ in updates])
+        .values_list("pk", "result")
+    )
+    now = timezone.now()
+    changes: List[Tuple[Match, str]] = []
+    for match, result in updates:
+        before = previous.get(match.pk, Match.RESULT_PENDING)
+        if before != Match.RESULT_PENDING and not user.is_staff:
+            continue
+        match.result = result
+        match.submitted_by = user
+        match.updated_at = now
+        changes.append((match, before))
+    if not changes:
+        return None
+    Match.objects.bulk_update(
+        [match for match, _ in changes], ["result", "submitted_by", "updated_at"]
+    )
+    log_results(tournament.pk, changes)
+    bump_state_version(tournament.pk)
+    bump_page_versions(tournament.pk)
+
+    if tournament.is_completed:
+        # Staff correcting a finished tournament.
+        record_season_results(tournament)
+        return None
+
+    if tournament.is_arena:
+        still_open = on_arena_results(tournament, changes)
+        if (
+            not still_open
+            and tournament.is_running
+            and not Match.objects.filter(
+                round__tournament=tournament, result=Match.RESULT_PENDING
+            ).exists()
+        ):
+            mark_tournament_completed(tournament)
+            return "completed"
+        return None
+
+    if tournament.is_knockout:
+        _advance_knockout(tournament, [match for match, _ in changes])
+
+    rounds = {match.round_id: match.round for match, _ in changes}
+    outcome = None
+    for rnd in sorted(rounds.values(), key=lambda r: r.number):
+        outcome = close_round_if_complete(tournament, rnd) or outcome
+    return outcome
+
+
+def record_result(tournament: Tournament, match: Match, result: str, user: User) -> Optional[str]:
+    return apply_results(tournament, [(match, result)], user)
+
+
+def can_attach_game(match: Match, user: User) -> bool:
+    if match.is_bye or not user.is_authenticated:
+        return False
+    return user.is_staff or match.involves(user)
+
+
+def save_game(match: Match, pgn_game: PgnGame, user: User) -> Game:
+    game, _ = Game.objects.update_or_create(
+        match=match,
+        defaults={
+            "headers": dict(pgn_game.headers, Result=pgn_game.result),
+            "moves": encode_moves(pgn_game.moves),
+            "ply_count": len(pgn_game.moves),
+            "uploaded_by": user,
+        },
+    )
+    return game
+
+
+@transaction.atomic
+def attach_round_games(rnd: Round, games: Iterable[PgnGame], user: User) -> Tuple[int, List[str]]:
+    """
+    Store every game of a round-wide PGN upload on the match whose players match
+    its White/Black tags. Games are encoded as they stream in; existing games of
+    the matched boards are replaced with one DELETE and one bulk INSERT.
+    Returns the number of stored games and a description of the unmatched ones.
+    """
+    boards: Dict[Tuple[str, str], Match] = {
+        (m.white_player.username.lower(), m.black_player.username.lower()): m
+        for m in rnd.matches.select_related("white_player", "black_player")
+        if m.white_player and m.black_player
+    }
+    to_create: Dict[int, Game] = {}
+    unmatched: List[str] = []
+    for pgn_game in games:
+        white = pgn_game.headers.get("White", "")
+        black = pgn_game.headers.get("Black", "")
+        match = boards.get((white.lower(), black.lower()))
+        if match is None:
+            unmatched.append(f"{white or '?'} - {black or '?'}")
+            continue
+        to_create[match.pk] = Game(
+            match=match,
+            headers=dict(pgn_game.headers, Result=pgn_game.result),
+            moves=encode_moves(pgn_game.moves),
+            ply_count=len(pgn_game.moves),
+            uploaded_by=user,
+        )
+    Game.objects.filter(match_id__in=to_create).delete()
+    Game.objects.bulk_create(to_create.values())
+    bump_page_versions(rnd.tournament_id)
+    return len(to_create), unmatched
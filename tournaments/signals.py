@@ -1,13 +1,92 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import PlayerProfile
+from .matrix import bump_player_tournaments, bump_state_version
+from .metrics import install_query_counter
+from .models import Game, Match, PlayerProfile, Round, Tournament, TournamentRegistration
+from .page_cache import bump_page_versions
+from .profiling import install_sql_timeline
+from .user_cache import forget_user
 
 User = get_user_model()
 
+connection_created.connect(install_query_counter)
+connection_created.connect(install_sql_timeline)
+
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         PlayerProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=PlayerProfile)
+@receiver(post_delete, sender=PlayerProfile)
+def forget_cached_profile(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+# Bulk writes send no signals: the services doing them bump the versions themselves.
+@receiver(post_save, sender=Tournament)
+@receiver(post_delete, sender=Tournament)
+def invalidate_tournament_pages(sender, instance, **kwargs):
+    bump_page_versions(instance.pk)
+
+
+@receiver(post_save, sender=TournamentRegistration)
+@receiver(post_delete, sender=TournamentRegistration)
+def invalidate_registration(sender, instance, **kwargs):
+    bump_state_version(instance.tournament_id)
+    bump_page_versions(instance.tournament_id)
+
+
+@receiver(post_save, sender=Round)
+@receiver(post_delete, sender=Round)
+def invalidate_pages_of_tournament(sender, instance, **kwargs):
+    bump_page_versions(instance.tournament_id)
+
+
+@receiver(post_save, sender=Match)
+@receiver(post_delete, sender=Match)
+def invalidate_match_pages(sender, instance, **kwargs):
+    tournament_id = (
+        Round.objects.filter(pk=instance.round_id).values_list("tournament_id", flat=True).first()
+    )
+    bump_state_version(tournament_id)
+    bump_page_versions(tournament_id)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_game_pages(sender, instance, **kwargs):
+    tournament_id = (
+        Match.objects.filter(pk=instance.match_id)
+        .values_list("round__tournament_id", flat=True)
+        .first()
+    )
+    bump_page_versions(tournament_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_player_name(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    bump_player_tournaments([instance.pk])
+
+
+# Bulk rating updates (tournaments.chesscom) invalidate the same way themselves.
+@receiver(post_save, sender=PlayerProfile)
+def invalidate_rating_pages(sender, instance, **kwargs):
+    tournament_ids = bump_player_tournaments([instance.user_id])
+    # Ratings are shown next to player names on the pages of their tournaments.
+    bump_page_versions()
+    for tournament_id in tournament_ids:
+        bump_page_versions(tournament_id)
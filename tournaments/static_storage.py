@@ -0,0 +1,185 @@
+import gzip
+import os
+import struct
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are written without it
+    brotli = None
+
+COMPRESSED_EXTENSIONS = (".css", ".js", ".svg", ".txt", ".json", ".xml", ".map", ".ico")
+# A variant is kept only when it saves at least this share of the size.
+MIN_SAVING = 0.05
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Metadata chunks that do not change how the image looks.
+PNG_DROPPED_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"tIME", b"pHYs", b"eXIf"}
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _png_chunks(data: bytes) -> Iterator[Tuple[bytes, bytes]]:
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        yield data[pos + 4 : pos + 8], data[pos + 8 : pos + 8 + length]
+        pos += 12 + length
+
+
+def _png_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _unfilter(raw: bytes, width: int, height: int, bpp: int) -> List[bytearray]:
+    stride = width * bpp
+    rows = []
+    prev = bytearray(stride)
+    pos = 0
+    for _ in range(height):
+        kind, line = raw[pos], bytearray(raw[pos + 1 : pos + 1 + stride])
+        pos += 1 + stride
+        for x in range(stride):
+            left = line[x - bpp] if x >= bpp else 0
+            if kind == 1:
+                line[x] = (line[x] + left) & 0xFF
+            elif kind == 2:
+                line[x] = (line[x] + prev[x]) & 0xFF
+            elif kind == 3:
+                line[x] = (line[x] + ((left + prev[x]) >> 1)) & 0xFF
+            elif kind == 4:
+                upper_left = prev[x - bpp] if x >= bpp else 0
+                line[x] = (line[x] + _paeth(left, prev[x], upper_left)) & 0xFF
+        rows.append(line)
+        prev = line
+    return rows
+
+
+def _filter(rows: List[bytearray], bpp: int) -> bytes:
+    """Filter each row with the type giving the smallest sum of absolute values."""
+    out = bytearray()
+    prev = bytearray(len(rows[0])) if rows else bytearray()
+    for line in rows:
+        candidates = [bytes(line)]
+        sub, up, avg, paeth = (bytearray(len(line)) for _ in range(4))
+        for x, value in enumerate(line):
+            left = line[x - bpp] if x >= bpp else 0
+            upper_left = prev[x - bpp] if x >= bpp else 0
+            sub[x] = (value - left) & 0xFF
+            up[x] = (value - prev[x]) & 0xFF
+            avg[x] = (value - ((left + prev[x]) >> 1)) & 0xFF
+            paeth[x] = (value - _paeth(left, prev[x], upper_left)) & 0xFF
+        candidates.extend((sub, up, avg, paeth))
+        kind = min(range(5), key=lambda k: sum(v if v < 128 else 256 - v for v in candidates[k]))
+        out.append(kind)
+        out += candidates[kind]
+        prev = line
+    return bytes(out)
+
+
+def optimize_png(data: bytes) -> Optional[bytes]:
+    """
+    Losslessly smaller version of a PNG, or None when there is nothing to
+    gain or the image is in a form this does not handle (interlaced, or not
+    8 bits per sample): pixels are re-filtered row by row and recompressed
+    at the highest level, and metadata chunks are dropped.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    chunks = list(_png_chunks(data))
+    if not chunks or chunks[0][0] != b"IHDR":
+        return None
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    if depth != 8 or interlace or color_type not in _CHANNELS:
+        return None
+    bpp = _CHANNELS[color_type]
+    raw = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+    rows = _unfilter(raw, width, height, bpp)
+    if color_type == 3:
+        # Palette indices: filters rarely help, store them unfiltered.
+        filtered = b"".join(b"\x00" + bytes(row) for row in rows)
+    else:
+        filtered = _filter(rows, bpp)
+
+    out = [PNG_SIGNATURE]
+    idat_written = False
+    for kind, body in chunks:
+        if kind in PNG_DROPPED_CHUNKS:
+            continue
+        if kind == b"IDAT":
+            if not idat_written:
+                out.append(_png_chunk(b"IDAT", zlib.compress(filtered, 9)))
+                idat_written = True
+            continue
+        out.append(_png_chunk(kind, body))
+    optimized = b"".join(out)
+    return optimized if len(optimized) < len(data) else None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed file names (the manifest storage), with PNG images
+    optimized before they are hashed and ``.gz`` / ``.br`` variants written
+    next to the hashed text assets, all at ``collectstatic`` time. The files
+    are served by ``tournaments.middleware.StaticAssetMiddleware``.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (tests, a fresh checkout): link the plain name.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for path in paths:
+                if path.lower().endswith(".png"):
+                    self._optimize_png(path)
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSED_EXTENSIONS):
+                self._write_variants(name)
+
+    def _optimize_png(self, path: str) -> None:
+        with self.open(path) as handle:
+            optimized = optimize_png(handle.read())
+        if optimized is not None:
+            self.delete(path)
+            self._save(path, ContentFile(optimized))
+
+    def _write_variants(self, name: str) -> None:
+        with self.open(name) as handle:
+            content = handle.read()
+        variants = [(".gz", gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(content)))
+        for suffix, compressed in variants:
+            target = name + suffix
+            if len(compressed) > len(content) * (1 - MIN_SAVING):
+                continue
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, ContentFile(compressed))
+
+
+def compressed_variant(path: str, accept_encoding: str) -> Tuple[str, Optional[str]]:
+    """The file to send for ``accept_encoding``, and its Content-Encoding."""
+    accepted = {token.split(";")[0].strip() for token in accept_encoding.split(",")}
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
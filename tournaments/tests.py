@@ -1,3 +1,1650 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import re
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .api import create_token
+from .archive import archive_tournament, archived_matches, restore_tournament
+from .arena import ArenaQueue, _create_games, _queues
+from .bulk import BulkError, apply_registrations, parse_rows, validate_registrations
+from .chesscom import sync_ratings
+from .events import catch_up_all, replay
+from .exports import gzip_stream, import_jsonl, iter_jsonl
+from .forecast import ForecastModel, build_model, forecast, simulate
+from .head_to_head import head_to_head
+from .matrix import _cache as matrix_cache
+from .matrix import POINTS, ResultMatrix, bump_state_version
+from .middleware import IMMUTABLE_MAX_AGE, STATIC_MAX_AGE, _immutable_names
+from .models import (
+    ArchivedPlayer,
+    ConsumerCursor,
+    HeadToHead,
+    Match,
+    PairingNotification,
+    ResultEvent,
+    Round,
+    SeasonResult,
+    SeasonStanding,
+    Tournament,
+    TournamentArchive,
+    TournamentRegistration,
+)
+from .notifications import MAX_ATTEMPTS, send_pending
+from .pagination import PAGE_SIZE
+from .pgn import SEVEN_TAG_ROSTER, PgnError, decode_moves, encode_moves, export_pgn, iter_games
+from .schedules import knockout, round_robin
+from .season import record_season_results
+from .user_cache import CachedModelBackend
+from .services import apply_results, generate_next_round, mark_tournament_completed
+from .tiebreaks import (
+    BUCHHOLZ,
+    BUCHHOLZ_CUT1,
+    BUCHHOLZ_MEDIAN,
+    DIRECT_ENCOUNTER,
+    GAMES,
+    PERFORMANCE,
+    PROGRESSIVE,
+    SONNEBORN_BERGER,
+    compute_tiebreaks,
+    ranking,
+)
+from .views import _listed_tournaments, user_stats
+
+User = get_user_model()
+
+# A "SCAN <table>" step that reads neither an index nor a subquery result.
+FULL_SCAN = re.compile(r"\bSCAN (?!.*\bUSING\b)(?!CONSTANT ROW)(\S+)")
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+class HotQueryPlanTests(TestCase):
+    """
+    The hot queries must be served by an index. A failure means a query no
+    longer matches the indexes declared for it, or an index went missing.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.players = [
+            User.objects.create_user(f"p{i}", last_login=timezone.now()) for i in range(4)
+        ]
+        cls.tournament = Tournament.objects.create(
+            name="T",
+            start_datetime=timezone.now() + timedelta(days=1),
+            rounds_planned=3,
+            status=Tournament.STATUS_RUNNING,
+            current_round=1,
+        )
+        for player in cls.players:
+            TournamentRegistration.objects.create(tournament=cls.tournament, user=player)
+        rnd = Round.objects.create(tournament=cls.tournament, number=1)
+        Match.objects.create(round=rnd, white_player=cls.players[0], black_player=cls.players[1])
+        Match.objects.create(round=rnd, white_player=cls.players[2], black_player=cls.players[3])
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        scans = FULL_SCAN.findall(plan)
+        self.assertFalse(scans, f"Full table scan of {', '.join(scans)}:\n{plan}")
+
+    def test_pending_matches_of_tournament(self):
+        self.assertUsesIndexes(
+            Match.objects.filter(round__tournament=self.tournament, result=Match.RESULT_PENDING)
+        )
+
+    def test_pending_matches_of_round(self):
+        self.assertUsesIndexes(
+            Match.objects.filter(
+                round__tournament=self.tournament,
+                round__number=self.tournament.current_round,
+                result=Match.RESULT_PENDING,
+            )
+        )
+
+    def test_finished_matches_of_player(self):
+        player = self.players[0]
+        self.assertUsesIndexes(
+            Match.objects.filter(Q(white_player=player) | Q(black_player=player)).exclude(
+                result=Match.RESULT_PENDING
+            )
+        )
+
+    def test_player_wins_with_white(self):
+        self.assertUsesIndexes(
+            Match.objects.filter(white_player=self.players[0], result=Match.RESULT_WHITE)
+        )
+
+    def test_active_registrations(self):
+        self.assertUsesIndexes(
+            TournamentRegistration.objects.filter(
+                tournament=self.tournament, is_active=True
+            ).order_by("joined_at")
+        )
+
+    def test_tournament_list(self):
+        self.assertUsesIndexes(
+            _listed_tournaments(Tournament.STATUS_RUNNING).order_by("start_datetime", "pk")[:21]
+        )
+
+    def test_due_tournaments(self):
+        self.assertUsesIndexes(
+            Tournament.objects.filter(
+                status=Tournament.STATUS_REGISTRATION, start_datetime__lte=timezone.now()
+            )
+        )
+
+    def test_archives_of_player(self):
+        self.assertUsesIndexes(TournamentArchive.objects.filter(players=self.players[0]))
+
+    def test_logged_in_users(self):
+        self.assertUsesIndexes(
+            User.objects.filter(last_login__isnull=False).order_by("username")
+        )
+
+
+class _StubChessCom(BaseHTTPRequestHandler):
+    """Stands in for https://api.chess.com/pub/player/<username>/stats."""
+
+    ratings = {}
+    cache_control = "max-age=0"
+    delay = 0.0
+    # Usernames answered 429 on their first request.
+    throttled = set()
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(self.delay)
+            self._answer()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _answer(self):
+        username = self.path.split("/")[3]
+        if username in self.throttled:
+            self.throttled.discard(username)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if username not in self.ratings:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{username}-{self.ratings[username]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = json.dumps({"chess_rapid": {"last": {"rating": self.ratings[username]}}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", self.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ChessComSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.handler = type(
+            "Handler", (_StubChessCom,), {"ratings": {}, "throttled": set()}
+        )
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.in_flight = self.server.max_in_flight = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/pub"
+
+    def link(self, username, chesscom_username, elo=None):
+        user = User.objects.create_user(username)
+        user.profile.chesscom_username = chesscom_username
+        user.profile.chesscom_elo = elo
+        user.profile.save()
+        return user
+
+    def test_ratings_are_updated(self):
+        self.handler.ratings = {"alice": 1500, "bob": 1720}
+        self.handler.throttled = {"bob"}
+        alice = self.link("a", "Alice", elo=1400)
+        bob = self.link("b", "bob")
+        self.link("c", "ghost", elo=1000)
+        User.objects.create_user("unlinked")
+        report = sync_ratings(self.base_url)
+        self.assertEqual(report.updated, 2)
+        self.assertEqual(report.unknown, ["ghost"])
+        self.assertEqual(report.failed, [])
+        alice.profile.refresh_from_db()
+        bob.profile.refresh_from_db()
+        self.assertEqual((alice.profile.chesscom_elo, bob.profile.chesscom_elo), (1500, 1720))
+        self.assertIsNotNone(alice.profile.chesscom_synced_at)
+        self.assertEqual(User.objects.get(username="c").profile.chesscom_elo, 1000)
+
+    def test_unchanged_ratings_are_revalidated(self):
+        self.handler.ratings = {"alice": 1500}
+        self.link("a", "alice")
+        sync_ratings(self.base_url)
+        report = sync_ratings(self.base_url)
+        self.assertEqual((report.fetched, report.not_modified, report.updated), (0, 1, 0))
+
+    def test_fresh_responses_are_not_requested(self):
+        self.handler.ratings = {"alice": 1500}
+        self.handler.cache_control = "max-age=300"
+        self.link("a", "alice")
+        sync_ratings(self.base_url)
+        report = sync_ratings(self.base_url)
+        self.assertEqual(report.cached, 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_usernames_are_quoted_in_the_path(self):
+        self.link("a", "../Alice?x=1")
+        report = sync_ratings(self.base_url)
+        self.assertEqual(report.unknown, ["../Alice?x=1"])
+        self.assertEqual(self.server.requests, ["/pub/player/..%2Falice%3Fx%3D1/stats"])
+
+    def test_concurrency_is_bounded(self):
+        self.handler.delay = 0.05
+        self.handler.ratings = {f"player{i}": 1200 + i for i in range(12)}
+        for i in range(12):
+            self.link(f"p{i}", f"player{i}")
+        report = sync_ratings(self.base_url, concurrency=3)
+        self.assertEqual(report.updated, 12)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+
+
+class _RefusingBackend(EmailBackend):
+    """locmem backend whose SMTP server rejects one address, counting the sessions opened."""
+
+    opened = 0
+
+    def open(self):
+        type(self).opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if "refused@example.org" in message.to:
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b"No such user")})
+        return super().send_messages(messages)
+
+
+class PairingNotificationTests(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(
+            name="Open",
+            start_datetime=timezone.now(),
+            rounds_planned=3,
+            status=Tournament.STATUS_RUNNING,
+        )
+        emails = ["a@example.org", "b@example.org", "refused@example.org", "", "c@example.org"]
+        self.players = [
+            User.objects.create_user(f"n{i}", email=email) for i, email in enumerate(emails)
+        ]
+        for player in self.players:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        opted_out = self.players[4].profile
+        opted_out.notify_pairings = False
+        opted_out.save()
+        _RefusingBackend.opened = 0
+
+    def test_paired_players_are_mailed_once(self):
+        rnd = generate_next_round(self.tournament)
+        # No address for n3, n4 opted out.
+        self.assertEqual(rnd.notifications.count(), 3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        report = send_pending(batch_size=2, connection=_RefusingBackend())
+        self.assertEqual(_RefusingBackend.opened, 1)
+        self.assertEqual(report.rounds[rnd.pk].sent, 2)
+        self.assertEqual(report.rounds[rnd.pk].retried, 1)
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox), ["a@example.org", "b@example.org"]
+        )
+        self.assertIn("ronde 1", mail.outbox[0].subject)
+
+        # The next run only retries the refused message.
+        report = send_pending()
+        self.assertEqual(report.sent, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(send_pending().sent, 0)
+
+    def test_failing_message_is_given_up_after_max_attempts(self):
+        generate_next_round(self.tournament)
+        for _ in range(MAX_ATTEMPTS + 1):
+            send_pending(connection=_RefusingBackend())
+        failed = PairingNotification.objects.get(status=PairingNotification.STATUS_FAILED)
+        self.assertEqual(failed.user, self.players[2])
+        self.assertEqual(failed.attempts, MAX_ATTEMPTS)
+        self.assertIn("SMTPRecipientsRefused", failed.error)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+    def test_tournament_with_notifications_is_archived(self):
+        self.tournament.rounds_planned = 1
+        self.tournament.save()
+        rnd = generate_next_round(self.tournament)
+        arbiter = User.objects.create_user("arbiter", is_staff=True)
+        apply_results(
+            self.tournament,
+            [(m, Match.RESULT_WHITE) for m in rnd.matches.exclude(result=Match.RESULT_BYE)],
+            arbiter,
+        )
+        self.assertTrue(self.tournament.is_completed)
+        matches = sorted(Match.objects.filter(round__tournament=self.tournament).values_list("pk", "result"))
+
+        archive_tournament(self.tournament)
+        self.assertFalse(PairingNotification.objects.exists())
+        restore_tournament(self.tournament)
+        self.assertEqual(
+            sorted(Match.objects.filter(round__tournament=self.tournament).values_list("pk", "result")),
+            matches,
+        )
+
+
+class ResultApiTests(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(
+            name="Open",
+            start_datetime=timezone.now(),
+            rounds_planned=2,
+            status=Tournament.STATUS_RUNNING,
+        )
+        players = [User.objects.create_user(f"r{i}") for i in range(4)]
+        for player in players:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        self.round = generate_next_round(self.tournament)
+        self.matches = list(self.round.matches.order_by("board"))
+        arbiter = User.objects.create_user("arbiter", is_staff=True)
+        _, self.token = create_token(arbiter, "Tablette")
+        _, self.player_token = create_token(players[0], "Téléphone")
+        self.url = f"/api/tournaments/{self.tournament.pk}/results/"
+
+    def post(self, rows, key="k1", token=None):
+        return self.client.post(
+            self.url,
+            json.dumps(rows),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token or self.token}",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_is_not_applied_twice(self):
+        rows = [{"match": self.matches[0].pk, "result": "1-0"}]
+        first = self.post(rows)
+        self.assertEqual(first.status_code, 200)
+        body = first.json()
+        self.assertEqual(body["matches"][0]["result"], Match.RESULT_WHITE)
+        self.assertEqual(body["rounds"], [{"number": 1, "pending": 1}])
+
+        retry = self.post(rows)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), body)
+        self.assertEqual(ResultEvent.objects.count(), 1)
+
+        self.assertEqual(self.post([{"match": self.matches[1].pk, "result": "0-1"}]).status_code, 422)
+
+    def test_last_result_pairs_the_next_round(self):
+        rows = [{"match": m.pk, "result": "1/2-1/2"} for m in self.matches]
+        body = self.post(rows).json()
+        self.assertEqual(body["outcome"], "next_round")
+        self.assertEqual(body["tournament"]["current_round"], 2)
+        self.assertEqual(body["rounds"], [{"number": 1, "pending": 0}])
+
+    def test_permissions_and_authentication(self):
+        # Admin mode: only staff enter results, even for their own board.
+        response = self.post([{"match": self.matches[0].pk, "result": "1-0"}], token=self.player_token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post([], token="wrong").status_code, 401)
+        missing_key = self.client.post(
+            self.url, "[]", content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual(missing_key.status_code, 400)
+        self.assertFalse(ResultEvent.objects.exists())
+
+
+class ProfilerMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.async_client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    async def test_requested_profiles_under_asgi(self):
+        with self.settings(PROFILER_DIR=self.directory):
+            for _ in range(2):
+                response = await self.async_client.get("/", headers={"X-Profile": "1"})
+                self.assertEqual(response.status_code, 200)
+        # The second request was profiled too: the first one released the lock.
+        self.assertEqual(len(list(self.directory.glob("*.json"))), 2)
+
+    async def test_unsampled_request_stays_on_the_event_loop(self):
+        with self.settings(PROFILER_DIR=self.directory, PROFILER_SAMPLE_RATE=0.0):
+            with mock.patch("tournaments.middleware.sync_to_async", side_effect=AssertionError):
+                response = await self.async_client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(list(self.directory.glob("*.json")))
+
+
+class ScheduleTests(SimpleTestCase):
+    def test_berger_table(self):
+        players = list("ABCDE")
+        rounds = round_robin(players)
+        self.assertEqual(len(rounds), 5)
+        pairs, byes = [], []
+        colors = {p: [] for p in players}
+        for pairings in rounds:
+            for white, black in pairings:
+                if black is None:
+                    byes.append(white)
+                    continue
+                pairs.append(frozenset((white, black)))
+                colors[white].append("w")
+                colors[black].append("b")
+        # Everyone meets everyone once and sits out once.
+        self.assertEqual(len(pairs), 10)
+        self.assertEqual(len(set(pairs)), 10)
+        self.assertEqual(sorted(byes), players)
+        for sequence in colors.values():
+            self.assertLessEqual(abs(sequence.count("w") - sequence.count("b")), 1)
+            self.assertNotIn("www", "".join(sequence))
+            self.assertNotIn("bbb", "".join(sequence))
+
+    def test_knockout_seeds(self):
+        rounds = knockout([1, 2, 3, 4, 5, 6])
+        self.assertEqual(rounds[0], [(1, None), (4, 5), (2, None), (3, 6)])
+        self.assertEqual(rounds[1:], [[(None, None)] * 2, [(None, None)]])
+
+
+class ScheduledTournamentTests(TestCase):
+    def setUp(self):
+        self.players = [User.objects.create_user(f"s{i}") for i in range(5)]
+        self.arbiter = User.objects.create_user("arbiter", is_staff=True)
+
+    def start(self, format, players):
+        tournament = Tournament.objects.create(
+            name="Sched",
+            start_datetime=timezone.now(),
+            format=format,
+            status=Tournament.STATUS_RUNNING,
+        )
+        for player in players:
+            TournamentRegistration.objects.create(tournament=tournament, user=player)
+        generate_next_round(tournament)
+        return tournament
+
+    def finish_round(self, tournament, number):
+        matches = Match.objects.filter(
+            round__tournament=tournament, round__number=number, result=Match.RESULT_PENDING
+        ).select_related("round")
+        apply_results(tournament, [(m, Match.RESULT_WHITE) for m in matches], self.arbiter)
+
+    def scores(self, tournament):
+        matrix = ResultMatrix.build(tournament)
+        rounds = matrix.rounds
+        return {
+            matrix.usernames[i]: sum(POINTS[o] for o in matrix.outcome[i * rounds : (i + 1) * rounds])
+            for i in range(len(matrix))
+        }
+
+    def test_round_robin_bye_is_scored_when_its_round_opens(self):
+        tournament = self.start(Tournament.FORMAT_ROUND_ROBIN, self.players)
+        self.assertEqual(tournament.rounds_planned, 5)
+        self.assertEqual(sum(self.scores(tournament).values()), 1.0)
+        self.finish_round(tournament, 1)
+        self.assertEqual(tournament.current_round, 2)
+        # Two wins and a bye in round 1, one bye in round 2.
+        self.assertEqual(sum(self.scores(tournament).values()), 4.0)
+
+    def test_knockout_winners_advance_and_boards_survive_export(self):
+        tournament = self.start(Tournament.FORMAT_KNOCKOUT, self.players[:4])
+        first = list(tournament.rounds.get(number=1).matches.order_by("board"))
+        self.finish_round(tournament, 1)
+        final = Match.objects.get(round__tournament=tournament, round__number=2)
+        self.assertEqual(
+            (final.white_player_id, final.black_player_id),
+            (first[0].white_player_id, first[1].white_player_id),
+        )
+
+        lines = "".join(iter_jsonl(Tournament.objects.filter(pk=tournament.pk)))
+        import_jsonl(io.BytesIO(lines.encode("utf-8")))
+        copy = Tournament.objects.exclude(pk=tournament.pk).get(name="Sched")
+        fields = ("round__number", "board", "white_player_id", "black_player_id", "result")
+        self.assertEqual(
+            list(Match.objects.filter(round__tournament=copy).order_by(*fields).values_list(*fields)),
+            list(Match.objects.filter(round__tournament=tournament).order_by(*fields).values_list(*fields)),
+        )
+
+
+class ResultLogTests(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(
+            name="Log", start_datetime=timezone.now(), rounds_planned=2, status=Tournament.STATUS_RUNNING
+        )
+        for i in range(4):
+            TournamentRegistration.objects.create(
+                tournament=self.tournament, user=User.objects.create_user(f"l{i}")
+            )
+        self.arbiter = User.objects.create_user("arbiter", is_staff=True)
+        self.matches = list(generate_next_round(self.tournament).matches.select_related("round"))
+
+    def head_to_head(self):
+        return sorted(
+            HeadToHead.objects.values_list("player_id", "opponent_id", "wins", "draws", "losses")
+        )
+
+    def test_results_and_corrections_are_appended(self):
+        first, second = self.matches
+        apply_results(self.tournament, [(first, Match.RESULT_WHITE)], self.arbiter)
+        apply_results(self.tournament, [(first, Match.RESULT_DRAW)], self.arbiter)
+        self.assertEqual(
+            list(ResultEvent.objects.values_list("match_id", "previous_result", "result")),
+            [
+                (first.pk, Match.RESULT_PENDING, Match.RESULT_WHITE),
+                (first.pk, Match.RESULT_WHITE, Match.RESULT_DRAW),
+            ],
+        )
+        event = ResultEvent.objects.last()
+        self.assertEqual(ConsumerCursor.objects.get(name="head_to_head").position, event.pk)
+        self.assertIn((first.white_player_id, first.black_player_id, 0, 1, 0), self.head_to_head())
+        with self.assertRaises(ValueError):
+            event.save()
+
+    def test_replay_matches_incremental_state(self):
+        first, second = self.matches
+        apply_results(self.tournament, [(first, Match.RESULT_WHITE)], self.arbiter)
+        apply_results(self.tournament, [(first, Match.RESULT_BLACK), (second, Match.RESULT_DRAW)], self.arbiter)
+        incremental = self.head_to_head()
+        self.assertEqual(len(incremental), 4)
+
+        HeadToHead.objects.all().delete()
+        self.assertEqual(replay(), 3)
+        self.assertEqual(self.head_to_head(), incremental)
+        self.assertEqual(
+            ConsumerCursor.objects.get(name="head_to_head").position, ResultEvent.objects.last().pk
+        )
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("cached", is_staff=True)
+        self.backend = CachedModelBackend()
+
+    def test_changes_from_another_process_are_seen(self):
+        self.assertTrue(self.backend.get_user(self.user.pk).is_staff)
+        # Bulk writes send no signal: the entry stays, as in a process that
+        # did not handle the change.
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.assertFalse(self.backend.get_user(self.user.pk).is_staff)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_unchanged_user_is_served_from_the_cache(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.user.pk)
+        self.assertEqual(user.profile.pk, self.user.profile.pk)
+
+    def test_shared_cache_serves_warm_user_without_queries(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = {
+            "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}
+        }
+        with self.settings(CACHES=shared):
+            self.backend.get_user(self.user.pk)
+            with self.assertNumQueries(0):
+                user = self.backend.get_user(self.user.pk)
+            self.assertEqual((user.pk, user.profile.pk), (self.user.pk, self.user.profile.pk))
+
+
+class ArenaTests(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(
+            name="Arena",
+            start_datetime=timezone.now(),
+            format=Tournament.FORMAT_ARENA,
+            status=Tournament.STATUS_RUNNING,
+        )
+        for i in range(4):
+            TournamentRegistration.objects.create(
+                tournament=self.tournament, user=User.objects.create_user(f"a{i}")
+            )
+        self.arbiter = User.objects.create_user("arbiter", is_staff=True)
+
+    def test_player_busy_in_another_process_is_not_paired(self):
+        # The queue of another process, loaded before the arena started.
+        stale = ArenaQueue(self.tournament.pk)
+        stale.load(self.tournament)
+        generate_next_round(self.tournament)
+        self.assertEqual(Match.objects.filter(round__tournament=self.tournament).count(), 2)
+        self.assertEqual(_create_games(self.tournament, stale, stale.pair_waiting()), [])
+        self.assertEqual(Match.objects.filter(round__tournament=self.tournament).count(), 2)
+        # The refused games are not counted: nobody had a colour or met anyone.
+        self.assertEqual(
+            {(p.whites, p.blacks, p.last_opponent) for p in stale.players.values()}, {(0, 0, None)}
+        )
+        self.assertFalse(stale.met)
+
+    def test_created_games_are_counted(self):
+        generate_next_round(self.tournament)
+        queue = _queues[self.tournament.pk]
+        matches = Match.objects.filter(round__tournament=self.tournament)
+        self.assertEqual(sum(p.whites for p in queue.players.values()), 2)
+        for match in matches:
+            self.assertEqual(queue.players[match.white_player_id].last_opponent, match.black_player_id)
+            self.assertEqual(queue.met[queue._pair_key(match.white_player_id, match.black_player_id)], 1)
+
+    def test_queue_is_dropped_when_the_arena_ends(self):
+        generate_next_round(self.tournament)
+        self.assertIn(self.tournament.pk, _queues)
+        _queues[self.tournament.pk].ends_at = timezone.now()
+        matches = Match.objects.filter(round__tournament=self.tournament).select_related("round")
+        with self.captureOnCommitCallbacks(execute=True):
+            outcome = apply_results(self.tournament, [(m, Match.RESULT_DRAW) for m in matches], self.arbiter)
+        self.assertEqual(outcome, "completed")
+        self.assertNotIn(self.tournament.pk, _queues)
+
+
+class MetricsAccessTests(TestCase):
+    def test_local_address_is_not_enough(self):
+        # The test client's REMOTE_ADDR is 127.0.0.1, as behind a local proxy.
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with self.settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(
+                self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+            )
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"chesseirb_db_queries_total", response.content)
+
+
+class BulkEntryTests(TestCase):
+    def setUp(self):
+        self.players = [User.objects.create_user(f"b{i}") for i in range(4)]
+        self.tournament = Tournament.objects.create(
+            name="Bulk", start_datetime=timezone.now(), rounds_planned=2, status=Tournament.STATUS_RUNNING
+        )
+        for player in self.players:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        self.matches = list(generate_next_round(self.tournament).matches.order_by("board"))
+        self.client.force_login(User.objects.create_user("arbiter", is_staff=True))
+        self.url = f"/tournaments/{self.tournament.pk}/results/bulk/"
+
+    def test_csv_and_json_rows_are_the_same(self):
+        csv_rows = parse_rows("\ufeffmatch,Result\n12, 1-0 \n13,nulle\n")
+        json_rows = parse_rows('{"rows": [{"match": 12, "result": "1-0"}, {"Match": "13", "result": "nulle"}]}')
+        self.assertEqual(csv_rows, [{"match": "12", "result": "1-0"}, {"match": "13", "result": "nulle"}])
+        self.assertEqual(json_rows, csv_rows)
+        self.assertEqual(parse_rows('["b0", "b1"]'), [{"username": "b0"}, {"username": "b1"}])
+        with self.assertRaises(BulkError):
+            parse_rows("[1, 2]")
+
+    def test_results_by_id_and_by_usernames(self):
+        first, second = self.matches
+        text = (
+            "match,white,black,result\n"
+            f"{first.pk},,,1-0\n"
+            f",{second.white_player.username},{second.black_player.username},1/2-1/2\n"
+        )
+        response = self.client.post(self.url, text, content_type="text/csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(response.json()["current_round"], 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.result, second.result), (Match.RESULT_WHITE, Match.RESULT_DRAW))
+
+    def test_invalid_payload_writes_nothing(self):
+        first, _ = self.matches
+        rows = [
+            {"match": first.pk, "result": "1-0"},
+            {"match": first.pk, "result": "0-1"},
+            {"match": 999999, "result": "1-0"},
+            {"white": "nobody", "black": "b1", "result": "1-0"},
+            {"match": first.pk, "result": "2-0"},
+        ]
+        response = self.client.post(self.url, json.dumps(rows), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()["errors"]), 4)
+        self.assertFalse(
+            Match.objects.filter(round__tournament=self.tournament).exclude(result=Match.RESULT_PENDING).exists()
+        )
+
+    def test_registrations_are_all_checked(self):
+        tournament = Tournament.objects.create(
+            name="Open", start_datetime=timezone.now(), status=Tournament.STATUS_REGISTRATION
+        )
+        banned = self.players[1].profile
+        banned.is_banned = True
+        banned.save()
+        with self.assertRaises(BulkError) as raised:
+            validate_registrations(tournament, parse_rows("username\nB0\nb1\nghost\n\n"))
+        self.assertEqual(len(raised.exception.errors), 2)
+        self.assertEqual(
+            validate_registrations(tournament, parse_rows('["B0", "b2", "b0"]')),
+            [self.players[0], self.players[2]],
+        )
+
+    def test_registrations_count_only_new_and_returning_players(self):
+        tournament = Tournament.objects.create(
+            name="Open", start_datetime=timezone.now(), status=Tournament.STATUS_REGISTRATION
+        )
+        active, returning, new = self.players[:3]
+        TournamentRegistration.objects.create(tournament=tournament, user=active)
+        TournamentRegistration.objects.create(tournament=tournament, user=returning, is_active=False)
+        url = f"/tournaments/{tournament.pk}/registrations/bulk/"
+        response = self.client.post(url, '["b0", "b1", "b2"]', content_type="application/json")
+        self.assertEqual(response.json()["registered"], 2)
+        self.assertEqual(
+            set(tournament.registrations.filter(is_active=True).values_list("user_id", flat=True)),
+            {active.pk, returning.pk, new.pk},
+        )
+        self.assertEqual(apply_registrations(tournament, [active, returning, new]), 0)
+
+
+class JsonlRoundTripTests(TestCase):
+    def test_export_import_round_trip(self):
+        players = [User.objects.create_user(f"j{i}") for i in range(5)]
+        tournament = Tournament.objects.create(
+            name="Export", start_datetime=timezone.now(), rounds_planned=2, status=Tournament.STATUS_RUNNING
+        )
+        for player in players:
+            TournamentRegistration.objects.create(tournament=tournament, user=player)
+        arbiter = User.objects.create_user("arbiter", is_staff=True)
+        rnd = generate_next_round(tournament)
+        apply_results(
+            tournament,
+            [(m, Match.RESULT_BLACK) for m in rnd.matches.filter(result=Match.RESULT_PENDING)],
+            arbiter,
+        )
+        TournamentRegistration.objects.filter(user=players[4]).update(is_active=False)
+
+        def records(queryset):
+            # As written to the file: datetimes to the millisecond.
+            rows = [json.loads(line) for line in iter_jsonl(queryset)]
+            for record in rows:
+                record.pop("id", None)
+                record.pop("tournament", None)
+            return rows
+
+        original = records(Tournament.objects.filter(pk=tournament.pk))
+        data = b"".join(gzip_stream(iter_jsonl(Tournament.objects.filter(pk=tournament.pk))))
+        self.assertEqual(import_jsonl(io.BufferedReader(io.BytesIO(data))), 1)
+        copy = Tournament.objects.exclude(pk=tournament.pk).get()
+        self.assertEqual(records(Tournament.objects.filter(pk=copy.pk)), original)
+        # Imported results (byes included) are in the log, as if entered here.
+        self.assertEqual(
+            ResultEvent.objects.filter(tournament=copy).count(),
+            Match.objects.filter(round__tournament=tournament).exclude(result=Match.RESULT_PENDING).count(),
+        )
+
+
+SAMPLE_PGN = """
+[Event "Blitz \\"du jeudi\\""]
+[White "alice"]
+[Black "bob"]
+[Result "1-0"]
+[ECO "C42"]
+
+1. e4 e5 2. Nf3 Nc6 {Italienne ?} 3. Bc4 (3. Bb5 a6) Bc5 4. O-O Nf6 $1 5. d4 exd4
+6. Re1 d5!? 7. exd5 Qe7+ 8. Kh1 d3 9. Rxe7+ Kf8 10. dxc6 Nbd7 11. Qh4xe1# 1-0
+
+[Event "Suite"]
+[White "bob"]
+[Black "alice"]
+[Result "*"]
+
+1. d4 d5 2. c4 dxc3 3. b8=Q exf8=N+ 4. 0-0-0 *
+"""
+
+
+class PgnTests(SimpleTestCase):
+    def test_moves_round_trip_compactly(self):
+        moves = ["e4", "Nf3", "exd5", "Nbd7", "R1e2", "Qh4xe1#", "O-O", "O-O-O+", "b8=Q", "exf8=N+", "Kxh1"]
+        data = encode_moves(moves)
+        self.assertEqual(decode_moves(data), moves)
+        self.assertEqual(len(encode_moves(["e4", "Nf3", "O-O", "Qxe7+"])), 8)
+        self.assertEqual(len(encode_moves(["exd5"])), 3)
+        # Castling written with zeros is stored as the SAN letters.
+        self.assertEqual(decode_moves(encode_moves(["0-0"])), ["O-O"])
+        with self.assertRaises(PgnError):
+            encode_moves(["e9"])
+
+    def test_parse_export_round_trip(self):
+        games = list(iter_games(SAMPLE_PGN.splitlines()))
+        self.assertEqual(len(games), 2)
+        first = games[0]
+        self.assertEqual(first.headers["Event"], 'Blitz "du jeudi"')
+        self.assertEqual(first.result, "1-0")
+        self.assertEqual(first.moves[:6], ["e4", "e5", "Nf3", "Nc6", "Bc4", "Bc5"])
+        self.assertEqual(first.moves[-1], "Qh4xe1#")
+        self.assertEqual(games[1].result, "*")
+
+        for game in games:
+            stored = decode_moves(encode_moves(game.moves))
+            text = export_pgn(game.headers, stored, game.result)
+            self.assertTrue(all(len(line) <= 79 for line in text.splitlines()))
+            (again,) = iter_games(text.splitlines())
+            # The export fills in the seven tag roster with "?".
+            self.assertEqual(again.headers, {**dict.fromkeys(SEVEN_TAG_ROSTER, "?"), **game.headers})
+            self.assertEqual((again.moves, again.result), (stored, game.result))
+
+
+class TiebreakTests(SimpleTestCase):
+    """Values worked out by hand on a four-player, three-round fixture."""
+
+    def setUp(self):
+        players = [(1, "anna", 1800, True), (2, "bob", 1600, True), (3, "carl", None, True), (4, "dora", 1400, True)]
+        games = [
+            (1, 1, 2, Match.RESULT_WHITE),
+            (1, 3, 4, Match.RESULT_DRAW),
+            (2, 1, 3, Match.RESULT_DRAW),
+            (2, 2, 4, Match.RESULT_WHITE),
+            (3, 1, 4, Match.RESULT_BLACK),
+            (3, 2, 3, Match.RESULT_WHITE),
+        ]
+        self.matrix = ResultMatrix(None, players, 3)
+        for number, white_id, black_id, result in games:
+            self.matrix._record(number - 1, number - 1, white_id, black_id, result)
+
+    def test_values(self):
+        scores, values = compute_tiebreaks(self.matrix)
+        self.assertEqual(scores, [1.5, 2.0, 1.0, 1.5])
+        self.assertEqual(values[BUCHHOLZ], [4.5, 4.0, 5.0, 4.5])
+        self.assertEqual(values[BUCHHOLZ_CUT1], [3.5, 3.0, 3.5, 3.5])
+        self.assertEqual(values[BUCHHOLZ_MEDIAN], [1.5, 1.5, 1.5, 1.5])
+        self.assertEqual(values[SONNEBORN_BERGER], [2.5, 2.5, 1.5, 2.0])
+        self.assertEqual(values[PROGRESSIVE], [4.0, 3.0, 2.5, 2.5])
+        # carl has no rating and counts as 1500 for his opponents.
+        self.assertEqual(values[PERFORMANCE], [1500, 1700, 1467, 1633])
+        self.assertEqual(values[GAMES], [3, 3, 3, 3])
+
+    def test_ranking_breaks_ties_in_order(self):
+        # anna and dora are tied on score and Buchholz; dora won their game.
+        order, _, values = ranking(self.matrix, [BUCHHOLZ, DIRECT_ENCOUNTER])
+        self.assertEqual(order, [1, 3, 0, 2])
+        self.assertEqual((values[DIRECT_ENCOUNTER][0], values[DIRECT_ENCOUNTER][3]), (0.0, 1.0))
+        order, _, _ = ranking(self.matrix, [SONNEBORN_BERGER])
+        self.assertEqual(order, [1, 0, 3, 2])
+        # Still tied: by username.
+        order, _, _ = ranking(self.matrix, [BUCHHOLZ_MEDIAN])
+        self.assertEqual(order, [1, 0, 3, 2])
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Rewind the app to ``migrate_from``, fill it through ``self.apps``, then ``migrate(...)`` forward."""
+
+    migrate_from = None
+
+    def setUp(self):
+        self.apps = self.migrate(self.migrate_from)
+
+    def tearDown(self):
+        self.migrate()
+
+    def migrate(self, name=None):
+        """Migrate to ``name``, or to the latest migrations, and return the models of that state."""
+        executor = MigrationExecutor(connection)
+        target = [("tournaments", name)] if name else executor.loader.graph.leaf_nodes()
+        executor.migrate(target)
+        return executor.loader.project_state(target).apps
+
+    def played(self, *results):
+        """Two players per result, in one round of one tournament, the matches decided."""
+        User = self.apps.get_model("auth", "User")
+        Tournament = self.apps.get_model("tournaments", "Tournament")
+        tournament = Tournament.objects.create(
+            name="Avant", start_datetime=timezone.now(), rounds_planned=1, status="completed", current_round=1
+        )
+        rnd = self.apps.get_model("tournaments", "Round").objects.create(tournament=tournament, number=1)
+        players = []
+        for k, result in enumerate(results):
+            white = User.objects.create(username=f"w{k}")
+            black = User.objects.create(username=f"b{k}")
+            self.apps.get_model("tournaments", "Match").objects.create(
+                round=rnd, white_player=white, black_player=black, result=result
+            )
+            players.append((white.pk, black.pk))
+        return players
+
+
+class HeadToHeadTests(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(
+            name="H2H", start_datetime=timezone.now(), rounds_planned=2, status=Tournament.STATUS_RUNNING
+        )
+        self.players = [User.objects.create_user(f"h{i}", password="pw") for i in range(2)]
+        for player in self.players:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        self.arbiter = User.objects.create_user("arbiter", is_staff=True)
+
+    def play(self, result):
+        number = self.tournament.rounds.count() + 1
+        rnd = Round.objects.create(tournament=self.tournament, number=number)
+        match = Match.objects.create(round=rnd, white_player=self.players[0], black_player=self.players[1])
+        apply_results(self.tournament, [(match, result)], self.arbiter)
+        return match
+
+    def test_record_from_both_sides(self):
+        first = self.play(Match.RESULT_WHITE)
+        white, black = first.white_player_id, first.black_player_id
+        self.play(Match.RESULT_DRAW)
+        self.assertEqual(
+            (head_to_head(white, black)["wins"], head_to_head(white, black)["draws"]), (1, 1)
+        )
+        self.assertEqual(head_to_head(black, white)["losses"], 1)
+
+        self.client.force_login(self.players[0])
+        data = self.client.get(reverse("head_to_head_json", args=[black, white])).json()
+        self.assertEqual((data["games"], data["wins"], data["draws"], data["losses"]), (2, 0, 1, 1))
+        self.assertIsNotNone(data["last_played"])
+
+
+class HeadToHeadMigrationTests(MigrationTestCase):
+    migrate_from = "0008_season_standings"
+
+    def test_existing_results_are_indexed(self):
+        (win, draw, pending) = self.played("white", "draw", "pending")
+        apps = self.migrate("0009_head_to_head")
+        rows = set(
+            apps.get_model("tournaments", "HeadToHead").objects.values_list(
+                "player_id", "opponent_id", "wins", "draws", "losses"
+            )
+        )
+        self.assertEqual(
+            rows,
+            {win + (1, 0, 0), win[::-1] + (0, 0, 1), draw + (0, 1, 0), draw[::-1] + (0, 1, 0)},
+        )
+
+
+class ResultLogMigrationTests(MigrationTestCase):
+    migrate_from = "0011_tournament_state_version"
+
+    def test_existing_results_reach_head_to_head(self):
+        # Results the index missed (it used to start empty) are applied from the seeded log.
+        self.apps.get_model("tournaments", "HeadToHead").objects.all().delete()
+        ((white, black),) = self.played("black")
+        self.migrate()
+        event = ResultEvent.objects.get()
+        self.assertEqual(ConsumerCursor.objects.get(name="head_to_head").position, event.pk)
+        self.assertEqual(head_to_head(black, white)["wins"], 1)
+        self.assertEqual(head_to_head(white, black)["losses"], 1)
+
+    def test_indexed_results_are_not_counted_twice(self):
+        # Through the head-to-head backfill of 0009, then the log of 0012.
+        self.apps = self.migrate("0008_season_standings")
+        ((white, black),) = self.played("white")
+        self.migrate()
+        self.assertEqual(head_to_head(white, black)["wins"], 1)
+        self.assertEqual(catch_up_all(), 0)
+        self.assertEqual(head_to_head(white, black)["games"], 1)
+
+
+class ForecastModelTests(SimpleTestCase):
+    def test_swiss_rounds_hand_out_every_point(self):
+        model = ForecastModel(
+            [1.0, 0.0, 0.5, 0.5, 0.0], [2400, 1000, 1500, 1500, 1500], [0, 1, 2, 3, 4], [], extra_rounds=2
+        )
+        counts, score_sums = simulate(model, 500, seed=1)
+        # Five players: two games and a bye per round.
+        self.assertAlmostEqual(sum(score_sums) / 500, 2.0 + 2 * 3)
+        self.assertEqual([sum(counts[i * 5 : (i + 1) * 5]) for i in range(5)], [500] * 5)
+        self.assertGreater(counts[0], 400)
+        self.assertEqual(simulate(model, 500, seed=1), (counts, score_sums))
+
+    def test_scheduled_games_and_byes(self):
+        model = ForecastModel([0.0] * 3, [1500] * 3, [0, 1, 2], [(0, 1), (1, 2), (2, 0)], byes=[0, 1, 2])
+        _, score_sums = simulate(model, 1000, seed=2)
+        self.assertAlmostEqual(sum(score_sums) / 1000, 6.0)
+        for total in score_sums:
+            self.assertAlmostEqual(total / 1000, 2.0, delta=0.15)
+
+    def test_bracket_winners_advance(self):
+        bracket = [[(0, 1, True), (2, 3, False)], [(-1, 2, True)]]
+        model = ForecastModel([0.0, 0.0, 1.0, 0.0], [2800, 800, 1500, 1500], [0, 1, 2, 3], [], bracket=bracket)
+        counts, score_sums = simulate(model, 200, seed=3)
+        # Player 0 beats player 1 and meets player 2 in the final; nobody draws.
+        self.assertAlmostEqual(score_sums[0] / 200, 2.0, delta=0.02)
+        self.assertEqual(score_sums[3], 0.0)
+        self.assertAlmostEqual(sum(score_sums) / 200, 1.0 + 2)
+        self.assertEqual(counts[0 * 4 + 0], 200)
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(
+            name="Prévision",
+            start_datetime=timezone.now(),
+            rounds_planned=3,
+            status=Tournament.STATUS_RUNNING,
+        )
+        for i in range(4):
+            TournamentRegistration.objects.create(
+                tournament=self.tournament, user=User.objects.create_user(f"f{i}")
+            )
+        self.arbiter = User.objects.create_user("arbiter", is_staff=True)
+        self.matches = list(generate_next_round(self.tournament).matches.all())
+        self.url = reverse("tournament_forecast_json", args=[self.tournament.pk])
+
+    def test_model_of_a_running_swiss(self):
+        apply_results(self.tournament, [(self.matches[0], Match.RESULT_WHITE)], self.arbiter)
+        self.tournament.refresh_from_db()
+        matrix, model = build_model(self.tournament)
+        self.assertEqual(sorted(model.scores), [0.0, 0.0, 0.0, 1.0])
+        pending = self.matches[1]
+        self.assertEqual(
+            model.fixed, [(matrix.index[pending.white_player_id], matrix.index[pending.black_player_id])]
+        )
+        self.assertEqual(model.extra_rounds, 2)
+        self.assertEqual(model.games_per_run(), 5)
+
+    def test_cached_until_the_next_result(self):
+        with mock.patch("tournaments.forecast.simulate", wraps=simulate) as run:
+            first = self.client.get(self.url).json()
+            self.assertEqual(self.client.get(self.url).json(), first)
+            self.assertEqual(run.call_count, 1)
+            # Two games a round for three rounds.
+            self.assertAlmostEqual(sum(p["expected_score"] for p in first["players"]), 6.0, delta=0.05)
+
+            apply_results(self.tournament, [(self.matches[0], Match.RESULT_DRAW)], self.arbiter)
+            self.client.get(self.url)
+            self.assertEqual(run.call_count, 2)
+
+    def test_one_request_computes_while_the_others_wait(self):
+        cache.add(f"forecast:lock:{self.tournament.pk}", True)
+        with mock.patch("tournaments.forecast.simulate") as run:
+            response = self.client.get(self.url)
+            self.assertEqual((response.status_code, response["Retry-After"]), (503, "1"))
+            run.assert_not_called()
+
+        cache.delete(f"forecast:lock:{self.tournament.pk}")
+        previous = forecast(self.tournament)
+        apply_results(self.tournament, [(self.matches[0], Match.RESULT_DRAW)], self.arbiter)
+        cache.add(f"forecast:lock:{self.tournament.pk}", True)
+        self.assertEqual(forecast(self.tournament), dict(previous, stale=True))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.players = [User.objects.create_user(f"r{i}", password="pw") for i in range(5)]
+        self.tournament = Tournament.objects.create(
+            name="Ancien", start_datetime=timezone.now(), rounds_planned=1, status=Tournament.STATUS_RUNNING
+        )
+        for player in self.players:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        arbiter = User.objects.create_user("arbiter", is_staff=True)
+        rnd = generate_next_round(self.tournament)
+        apply_results(
+            self.tournament,
+            [(m, Match.RESULT_DRAW) for m in rnd.matches.filter(result=Match.RESULT_PENDING)],
+            arbiter,
+        )
+        self.tournament.refresh_from_db()
+        self.assertTrue(self.tournament.is_completed)
+
+    def live_rows(self):
+        return (
+            sorted(
+                TournamentRegistration.objects.filter(tournament=self.tournament).values_list(
+                    "pk", "user_id", "joined_at", "is_active"
+                )
+            ),
+            sorted(
+                Match.objects.filter(round__tournament=self.tournament).values_list(
+                    "pk", "white_player_id", "black_player_id", "result", "board", "updated_at"
+                )
+            ),
+        )
+
+    def records(self):
+        rows = [json.loads(line) for line in iter_jsonl(Tournament.objects.filter(pk=self.tournament.pk))]
+        return [row for row in rows if row["type"] != "tournament"]
+
+    def stats(self, user):
+        stats = user_stats(user)
+        return stats["wins"], stats["draws"], stats["losses"], len(stats["all_matches"])
+
+    def test_archive_read_restore(self):
+        rows, records = self.live_rows(), self.records()
+        stats = {player.pk: self.stats(player) for player in self.players}
+        detail = self.client.get(reverse("tournament_detail", args=[self.tournament.pk])).content.decode()
+
+        archive_tournament(self.tournament)
+        self.assertEqual(self.live_rows(), ([], []))
+        self.assertFalse(ResultEvent.objects.filter(match__isnull=False).exists())
+        self.assertEqual(ArchivedPlayer.objects.filter(archive__tournament=self.tournament).count(), 5)
+
+        self.assertEqual(self.records(), records)
+        page = self.client.get(reverse("tournament_detail", args=[self.tournament.pk])).content.decode()
+        for player in self.players:
+            self.assertIn(player.username, page)
+        self.assertEqual(page.count("Nulle"), detail.count("Nulle"))
+        # The player pages read their own rows, not the archive.
+        with mock.patch("tournaments.archive.load") as load:
+            self.assertEqual({player.pk: self.stats(player) for player in self.players}, stats)
+            load.assert_not_called()
+        self.assertEqual(len(archived_matches(self.players[0])), stats[self.players[0].pk][3])
+
+        restore_tournament(self.tournament)
+        self.assertEqual(self.live_rows(), rows)
+        self.assertFalse(ArchivedPlayer.objects.exists())
+        self.assertEqual(self.records(), records)
+
+
+class ArchivedPlayerMigrationTests(MigrationTestCase):
+    migrate_from = "0017_unscore_future_byes"
+
+    def test_players_get_their_matches(self):
+        import zlib
+
+        ((white, black),) = self.played("black")
+        Tournament = self.apps.get_model("tournaments", "Tournament")
+        TournamentArchive = self.apps.get_model("tournaments", "TournamentArchive")
+        document = {
+            "matches": [[7, 1, white, black, "black", 1, None, None, None], [8, 1, white, None, "bye", 2]]
+        }
+        archive = TournamentArchive.objects.create(
+            tournament=Tournament.objects.get(), data=zlib.compress(json.dumps(document).encode())
+        )
+        archive.players.set([white, black])
+        self.migrate()
+        self.assertEqual(
+            sorted(ArchivedPlayer.objects.values_list("user_id", "matches")),
+            [
+                (white, [[7, 1, white, black, "black", 1], [8, 1, white, None, "bye", 2]]),
+                (black, [[7, 1, white, black, "black", 1]]),
+            ],
+        )
+
+
+class CrosstableTests(TransactionTestCase):
+    # Not TestCase: the matrix cache is bypassed inside a transaction.
+
+    def setUp(self):
+        matrix_cache.clear()
+
+    def tournament(self, players, rounds):
+        """Round-robin-ish fixture: every round but the last is decided, the odd player out gets a bye."""
+        users = [User.objects.create_user(f"x{players}_{i}") for i in range(players)]
+        tournament = Tournament.objects.create(
+            name="Grille",
+            start_datetime=timezone.now(),
+            rounds_planned=rounds,
+            status=Tournament.STATUS_RUNNING,
+            current_round=rounds,
+        )
+        for user in users:
+            TournamentRegistration.objects.create(tournament=tournament, user=user)
+        for number in range(1, rounds + 1):
+            rnd = Round.objects.create(tournament=tournament, number=number)
+            order = users[number - 1 :] + users[: number - 1]
+            for board, k in enumerate(range(0, players - 1, 2), start=1):
+                result = Match.RESULT_WHITE if number < rounds else Match.RESULT_PENDING
+                Match.objects.create(
+                    round=rnd, white_player=order[k], black_player=order[k + 1], result=result, board=board
+                )
+            if players % 2:
+                Match.objects.create(round=rnd, white_player=order[-1], result=Match.RESULT_BYE, board=0)
+        return tournament, users
+
+    def test_cells(self):
+        tournament, users = self.tournament(5, 3)
+        data = self.client.get(reverse("tournament_crosstable_json", args=[tournament.pk])).json()
+        self.assertEqual(data["rounds"], 3)
+        rows = {row["username"]: row for row in data["players"]}
+        # x5_0: beat x5_1, bye in round 2, game still to play in round 3.
+        first = rows["x5_0"]["rounds"]
+        self.assertEqual(
+            [(c["opponent"], c["color"], c["result"]) for c in first],
+            [("x5_1", "w", "1"), (None, None, "+"), ("x5_4", "b", "*")],
+        )
+        self.assertEqual(first[0]["opponent_rank"], rows["x5_1"]["rank"])
+        self.assertEqual(rows["x5_0"]["score"], 2.0)
+        self.assertEqual(sorted(row["rank"] for row in data["players"]), [1, 2, 3, 4, 5])
+        # Two decided rounds of two games and a bye, and the bye of round 3.
+        self.assertEqual(sum(row["score"] for row in data["players"]), 7.0)
+
+        page = self.client.get(reverse("tournament_crosstable", args=[tournament.pk]))
+        self.assertContains(page, "x5_4")
+
+    def test_query_count_does_not_grow(self):
+        small, _ = self.tournament(5, 3)
+        large, _ = self.tournament(11, 7)
+        for tournament in (small, large):
+            # Tournament, registrations, matches.
+            with self.assertNumQueries(3):
+                self.client.get(reverse("tournament_crosstable_json", args=[tournament.pk]))
+            # Then the matrix comes from the cache.
+            with self.assertNumQueries(1):
+                self.client.get(reverse("tournament_crosstable_json", args=[tournament.pk]))
+
+
+class SeasonStandingTests(TestCase):
+    def setUp(self):
+        self.players = [User.objects.create_user(f"s{i}") for i in range(4)]
+        self.arbiter = User.objects.create_user("arbiter", is_staff=True)
+
+    def play(self, result):
+        """A one-round tournament of the four players; every game ends with ``result``."""
+        tournament = Tournament.objects.create(
+            name="Saison", start_datetime=timezone.now(), rounds_planned=1, status=Tournament.STATUS_RUNNING
+        )
+        for player in self.players:
+            TournamentRegistration.objects.create(tournament=tournament, user=player)
+        matches = list(generate_next_round(tournament).matches.select_related("round"))
+        apply_results(tournament, [(m, result) for m in matches], self.arbiter)
+        tournament.refresh_from_db()
+        self.assertTrue(tournament.is_completed)
+        return tournament, matches
+
+    def standings(self):
+        return {
+            s.user_id: (s.points, s.tournaments, s.titles, s.wins, s.draws, s.losses)
+            for s in SeasonStanding.objects.all()
+        }
+
+    def test_completion_correction_and_reopening(self):
+        tournament, (first, second) = self.play(Match.RESULT_WHITE)
+        winners = {first.white_player_id, second.white_player_id}
+        self.assertEqual(SeasonResult.objects.filter(tournament=tournament).count(), 4)
+        standings = self.standings()
+        for user_id in winners:
+            self.assertEqual(standings[user_id][:2], (1.0, 1))
+            self.assertEqual(standings[user_id][3:], (1, 0, 0))
+        self.assertEqual(sum(row[2] for row in standings.values()), 1)
+
+        # A corrected result moves the standings by the difference only.
+        apply_results(tournament, [(first, Match.RESULT_DRAW)], self.arbiter)
+        standings = self.standings()
+        self.assertEqual(standings[first.white_player_id][:2], (0.5, 1))
+        self.assertEqual(standings[first.black_player_id][3:], (0, 1, 0))
+        self.assertEqual(standings[second.white_player_id][0], 1.0)
+
+        # A second tournament of the season adds up.
+        self.play(Match.RESULT_BLACK)
+        self.assertEqual({row[1] for row in self.standings().values()}, {2})
+
+        # Reopening takes the tournament's contribution back; completing it again restores it.
+        before = self.standings()
+        tournament.status = Tournament.STATUS_REGISTRATION
+        tournament.save(update_fields=["status"])
+        record_season_results(tournament)
+        self.assertFalse(SeasonResult.objects.filter(tournament=tournament).exists())
+        self.assertEqual({row[1] for row in self.standings().values()}, {1})
+        mark_tournament_completed(tournament)
+        self.assertEqual(self.standings(), before)
+
+
+class SeasonBackfillMigrationTests(MigrationTestCase):
+    migrate_from = "0018_archived_player"
+
+    def test_completed_tournaments_are_ranked(self):
+        ((white, black),) = self.played("white")
+        Registration = self.apps.get_model("tournaments", "TournamentRegistration")
+        tournament = self.apps.get_model("tournaments", "Tournament").objects.get()
+        for user_id in (white, black):
+            Registration.objects.create(tournament=tournament, user_id=user_id)
+        self.migrate()
+        self.assertEqual(
+            sorted(SeasonResult.objects.values_list("user_id", "rank", "points")),
+            [(white, 1, 1.0), (black, 2, 0.0)],
+        )
+        self.assertEqual(SeasonStanding.objects.get(user_id=white).titles, 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create(self, status, start, count):
+        """``count`` tournaments, three at a time sharing a start time, from ``start`` on."""
+        return [
+            Tournament.objects.create(
+                name=f"{status} {i}", start_datetime=start + timedelta(hours=i // 3), status=status
+            )
+            for i in range(count)
+        ]
+
+    def pages(self, url):
+        names, cursor = [], None
+        while True:
+            response = self.client.get(url, {"cursor": cursor} if cursor else {})
+            names.append([t.name for t in response.context["tournaments"]])
+            cursor = response.context["next_cursor"]
+            if cursor is None:
+                return names
+
+    def test_completed_list_newest_first_across_ties(self):
+        start = timezone.now() - timedelta(days=30)
+        tournaments = self.create(Tournament.STATUS_COMPLETED, start, PAGE_SIZE + 5)
+        pages = self.pages(reverse("tournament_list_completed"))
+        self.assertEqual([len(page) for page in pages], [PAGE_SIZE, 5])
+        expected = sorted(tournaments, key=lambda t: (t.start_datetime, t.pk), reverse=True)
+        self.assertEqual([name for page in pages for name in page], [t.name for t in expected])
+
+    def test_open_list_soonest_first_across_ties(self):
+        start = timezone.now() + timedelta(days=1)
+        tournaments = self.create(Tournament.STATUS_REGISTRATION, start, PAGE_SIZE + 1)
+        pages = self.pages(reverse("tournament_list_open"))
+        self.assertEqual([len(page) for page in pages], [PAGE_SIZE, 1])
+        self.assertEqual([name for page in pages for name in page], [t.name for t in tournaments])
+
+    def test_bad_cursor_gives_the_first_page(self):
+        self.create(Tournament.STATUS_COMPLETED, timezone.now() - timedelta(days=30), PAGE_SIZE + 1)
+        url = reverse("tournament_list_completed")
+        first = [t.name for t in self.client.get(url).context["tournaments"]]
+
+        def encoded(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        for cursor in (
+            "!!!",
+            "%%",
+            encoded("abc"),
+            encoded({"when": 1}),
+            encoded([None, 1]),
+            encoded(["2020-01-01T00:00:00", 1]),
+            encoded(["2020-01-01T00:00:00+00:00", 10**30]),
+            base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+        ):
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 200, cursor)
+            self.assertEqual([t.name for t in response.context["tournaments"]], first, cursor)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.players = [User.objects.create_user(f"c{i}", password="pw") for i in range(2)]
+        self.tournament = Tournament.objects.create(
+            name="Avant", start_datetime=timezone.now(), rounds_planned=1, status=Tournament.STATUS_RUNNING
+        )
+        for player in self.players:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        self.detail = reverse("tournament_detail", args=[self.tournament.pk])
+        self.crosstable = reverse("tournament_crosstable", args=[self.tournament.pk])
+        for url in (self.detail, self.crosstable):
+            self.assertContains(self.client.get(url), "Avant")
+        # Not seen by the cache: queryset updates send no signal.
+        Tournament.objects.filter(pk=self.tournament.pk).update(name="Après")
+
+    def test_anonymous_hits_are_served_from_the_cache(self):
+        for url in (self.detail, self.crosstable):
+            response = self.client.get(url)
+            self.assertContains(response, "Avant")
+            self.assertNotContains(response, "Après")
+
+    def test_users_messages_and_posts_bypass_the_cache(self):
+        self.assertContains(self.client.post(self.crosstable), "Après")
+        self.client.cookies[CookieStorage.cookie_name] = "pending"
+        self.assertContains(self.client.get(self.crosstable), "Après")
+        del self.client.cookies[CookieStorage.cookie_name]
+        self.client.force_login(self.players[0])
+        for url in (self.detail, self.crosstable):
+            self.assertContains(self.client.get(url), "Après")
+
+    def test_results_and_registrations_invalidate_the_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TournamentRegistration.objects.create(
+                tournament=self.tournament, user=User.objects.create_user("newcomer")
+            )
+        self.assertContains(self.client.get(self.detail), "newcomer")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rnd = Round.objects.create(tournament=self.tournament, number=1)
+            white, black = self.players
+            match = Match.objects.create(round=rnd, white_player=white, black_player=black)
+        self.assertContains(self.client.get(self.crosstable), "Après")
+        Tournament.objects.filter(pk=self.tournament.pk).update(name="Encore après")
+        self.assertNotContains(self.client.get(self.crosstable), "Encore après")
+        arbiter = User.objects.create_user("arbiter", is_staff=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_results(self.tournament, [(match, Match.RESULT_WHITE)], arbiter)
+        self.assertContains(self.client.get(self.crosstable), "Encore après")
+
+
+class MatrixCacheTests(TransactionTestCase):
+    # Not TestCase: the cache is bypassed inside a transaction.
+
+    def setUp(self):
+        matrix_cache.clear()
+        self.players = [User.objects.create_user(f"m{i}") for i in range(3)]
+        self.tournament = Tournament.objects.create(
+            name="Matrice", start_datetime=timezone.now(), rounds_planned=1, status=Tournament.STATUS_RUNNING
+        )
+        for player in self.players[:2]:
+            TournamentRegistration.objects.create(tournament=self.tournament, user=player)
+        rnd = Round.objects.create(tournament=self.tournament, number=1)
+        self.match = Match.objects.create(
+            round=rnd, white_player=self.players[0], black_player=self.players[1]
+        )
+
+    def cached(self):
+        self.tournament.refresh_from_db()
+        return ResultMatrix.cached(self.tournament)
+
+    def test_unchanged_tournament_is_served_from_the_cache(self):
+        matrix = self.cached()
+        with self.assertNumQueries(1):
+            self.assertIs(self.cached(), matrix)
+
+    def test_result_invalidates(self):
+        matrix = self.cached()
+        arbiter = User.objects.create_user("arbiter", is_staff=True)
+        apply_results(self.tournament, [(self.match, Match.RESULT_DRAW)], arbiter)
+        fresh = self.cached()
+        self.assertIsNot(fresh, matrix)
+        self.assertEqual(sum(POINTS[o] for o in fresh.outcome), 1.0)
+
+    def test_registration_invalidates(self):
+        self.cached()
+        TournamentRegistration.objects.create(tournament=self.tournament, user=self.players[2])
+        self.assertIn(self.players[2].pk, self.cached().index)
+        TournamentRegistration.objects.filter(user=self.players[2]).update(is_active=False)
+        # Bulk updates bump the version themselves, as the unregister view does.
+        bump_state_version(self.tournament.pk)
+        matrix = self.cached()
+        self.assertFalse(matrix.active[matrix.index[self.players[2].pk]])
+
+    def test_rating_and_name_changes_invalidate(self):
+        self.cached()
+        profile = self.players[0].profile
+        profile.chesscom_elo = 2100
+        profile.save()
+        matrix = self.cached()
+        self.assertEqual(matrix.ratings[matrix.index[self.players[0].pk]], 2100)
+        self.players[1].username = "renamed"
+        self.players[1].save()
+        matrix = self.cached()
+        self.assertEqual(matrix.usernames[matrix.index[self.players[1].pk]], "renamed")
+
+
+class StaticAssetTests(SimpleTestCase):
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        self.css = b"body { color: black; }\n" * 50
+        (root / "app.3f2a1b9c0d4e.css").write_bytes(self.css)
+        (root / "app.3f2a1b9c0d4e.css.gz").write_bytes(gzip.compress(self.css))
+        (root / "app.3f2a1b9c0d4e.css.br").write_bytes(b"brotli bytes")
+        (root / "robots.txt").write_bytes(b"User-agent: *\n")
+        (root / "robots.txt.gz").write_bytes(gzip.compress(b"User-agent: *\n"))
+        manifest = {"version": "1.1", "paths": {"app.css": "app.3f2a1b9c0d4e.css"}}
+        (root / "staticfiles.json").write_text(json.dumps(manifest))
+        # Changing STATIC_ROOT resets staticfiles_storage, which then reads this manifest.
+        settings_override = self.settings(DEBUG=False, STATIC_ROOT=str(root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        _immutable_names.cache_clear()
+        self.addCleanup(_immutable_names.cache_clear)
+
+    def get(self, name, accept_encoding=""):
+        response = self.client.get(f"/static/{name}", headers={"Accept-Encoding": accept_encoding})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        return response, b"".join(response.streaming_content)
+
+    def test_hashed_names_are_immutable(self):
+        response, _ = self.get("app.3f2a1b9c0d4e.css")
+        self.assertEqual(response["Cache-Control"], f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+        self.assertEqual(response["Content-Type"], "text/css")
+
+    def test_unhashed_names_are_revalidated(self):
+        for name in ("robots.txt", "staticfiles.json"):
+            response, _ = self.get(name)
+            self.assertEqual(response["Cache-Control"], f"public, max-age={STATIC_MAX_AGE}")
+
+    def test_compressed_variant_follows_accept_encoding(self):
+        response, body = self.get("app.3f2a1b9c0d4e.css", "gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), self.css)
+        response, body = self.get("app.3f2a1b9c0d4e.css", "gzip;q=0.5, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(body, b"brotli bytes")
+        # The variant does not change the caching of the hashed name.
+        self.assertIn("immutable", response["Cache-Control"])
+        response, body = self.get("app.3f2a1b9c0d4e.css", "identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(body, self.css)
+
+    def test_missing_variant_falls_back_to_the_plain_file(self):
+        response, body = self.get("robots.txt", "br")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(body, b"User-agent: *\n")
+        response, body = self.get("robots.txt", "br, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_unknown_files_and_debug_pass_through(self):
+        self.assertEqual(self.client.get("/static/missing.css").status_code, 404)
+        self.assertEqual(self.client.get("/static/../manage.py").status_code, 404)
+        with self.settings(DEBUG=True):
+            # The middleware reads DEBUG when the handler is built: use a new client.
+            response = self.client_class().get("/static/app.3f2a1b9c0d4e.css")
+        self.assertNotEqual(response.get("Cache-Control"), f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.white, cls.black = [
+            User.objects.create_user(f"a{i}", password="pw", last_login=now) for i in range(2)
+        ]
+        cls.open = Tournament.objects.create(
+            name="Ouvert", start_datetime=now + timedelta(days=1), status=Tournament.STATUS_REGISTRATION
+        )
+        cls.done = Tournament.objects.create(
+            name="Fini", start_datetime=now - timedelta(days=7), status=Tournament.STATUS_COMPLETED
+        )
+        cls.running = Tournament.objects.create(
+            name="En cours", start_datetime=now, rounds_planned=2, current_round=1,
+            status=Tournament.STATUS_RUNNING,
+        )
+        for player in (cls.white, cls.black):
+            TournamentRegistration.objects.create(tournament=cls.running, user=player)
+        rnd = Round.objects.create(tournament=cls.running, number=1)
+        cls.match = Match.objects.create(round=rnd, white_player=cls.white, black_player=cls.black)
+        cls.white.profile.chesscom_elo = 1500
+        cls.white.profile.save()
+        HeadToHead.objects.create(player=cls.white, opponent=cls.black, wins=2, last_played=now)
+        HeadToHead.objects.create(player=cls.black, opponent=cls.white, losses=2, last_played=now)
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_lists(self):
+        for name, tournament in (
+            ("tournament_list_open", self.open),
+            ("tournament_list_completed", self.done),
+            ("tournament_list_running", self.running),
+        ):
+            response = await self.async_client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([t.pk for t in response.context["tournaments"]], [tournament.pk])
+        self.assertEqual(response.context["user_pending_matches"], {})
+
+    async def test_running_list_shows_the_pending_match(self):
+        await sync_to_async(self.async_client.force_login)(self.black)
+        response = await self.async_client.get(reverse("tournament_list_running"))
+        self.assertEqual(response.context["user_pending_matches"], {self.running.pk: self.match})
+
+    async def test_detail(self):
+        url = reverse("tournament_detail", args=[self.running.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r.user for r in response.context["registrations"]], [self.white, self.black])
+        self.assertEqual(response.context["rounds"][0].matches.all()[0], self.match)
+        self.assertIsNone(response.context["user_pending_match"])
+
+        await sync_to_async(self.async_client.force_login)(self.white)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.context["user_registration"].user, self.white)
+        self.assertEqual(response.context["user_pending_match"], self.match)
+        missing = await self.async_client.get(reverse("tournament_detail", args=[self.running.pk + 100]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_participants_json(self):
+        url = reverse("tournament_participants_json", args=[self.running.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(
+            response.json(),
+            {
+                "participants": [
+                    {"username": "a0", "elo": 1500, "label": "a0 (1500)"},
+                    {"username": "a1", "elo": None, "label": "a1"},
+                ],
+                "count": 2,
+            },
+        )
+
+    async def test_user_detail(self):
+        await sync_to_async(self.async_client.force_login)(self.black)
+        response = await self.async_client.get(reverse("user_detail", args=[self.white.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["target_user"], self.white)
+        self.assertEqual(response.context["own_record"]["losses"], 2)
+        self.assertEqual([row.opponent for row in response.context["head_to_head"]], [self.black])
+
+    async def test_user_detail_redirects_anonymous_users(self):
+        url = reverse("user_detail", args=[self.white.pk])
+        response = await self.async_client.get(url)
+        self.assertRedirects(response, f"{reverse('cas_login')}?next={url}", fetch_redirect_response=False)
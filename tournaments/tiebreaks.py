@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .matrix import BYE, DRAW, LOSS, POINTS, WIN, ResultMatrix
+
+# Rating assumed for players without a chess.com Elo in performance ratings.
+DEFAULT_RATING = 1500
+
+BUCHHOLZ = "buchholz"
+BUCHHOLZ_CUT1 = "buchholz_cut1"
+BUCHHOLZ_MEDIAN = "buchholz_median"
+SONNEBORN_BERGER = "sonneborn_berger"
+PROGRESSIVE = "progressive"
+DIRECT_ENCOUNTER = "direct_encounter"
+PERFORMANCE = "performance"
+GAMES = "games"
+
+TIEBREAK_CHOICES = [
+    (BUCHHOLZ, "Buchholz"),
+    (BUCHHOLZ_CUT1, "Buchholz cut-1"),
+    (BUCHHOLZ_MEDIAN, "Buchholz médian"),
+    (SONNEBORN_BERGER, "Sonneborn-Berger"),
+    (PROGRESSIVE, "Cumulatif"),
+    (DIRECT_ENCOUNTER, "Confrontation directe"),
+    (PERFORMANCE, "Performance"),
+    (GAMES, "Parties jouées"),
+]
+TIEBREAK_LABELS = dict(TIEBREAK_CHOICES)
+DEFAULT_TIEBREAKS = f"{BUCHHOLZ},{GAMES}"
+
+
+def parse_tiebreaks(value: str) -> List[str]:
+    """Split a comma-separated tiebreak order, raising ValueError on unknown codes."""
+    codes = [code.strip() for code in (value or "").split(",") if code.strip()]
+    unknown = [code for code in codes if code not in TIEBREAK_LABELS]
+    if unknown:
+        raise ValueError(f"Départages inconnus : {', '.join(unknown)}")
+    return codes
+
+
+def compute_tiebreaks(matrix: ResultMatrix) -> Tuple[List[float], Dict[str, List[float]]]:
+    """
+    Scores and every tiebreak except direct encounter, for all players.
+
+    Scores take one pass over the outcome array; all tiebreaks then share a
+    single second pass over each player's row, since Buchholz-like criteria
+    need the opponents' final scores.
+    """
+    n, rounds = len(matrix), matrix.rounds
+    outcome, opponent = matrix.outcome, matrix.opponent
+    ratings = [r or DEFAULT_RATING for r in matrix.ratings]
+
+    scores = [0.0] * n
+    for i in range(n):
+        scores[i] = sum(POINTS[o] for o in outcome[i * rounds : (i + 1) * rounds])
+
+    values = {code: [0.0] * n for code in TIEBREAK_LABELS if code != DIRECT_ENCOUNTER}
+    for i in range(n):
+        opp_scores = []
+        sb = progressive = running = 0.0
+        rating_sum = games = 0
+        decisive = 0.0
+        for cell in range(i * rounds, (i + 1) * rounds):
+            o = outcome[cell]
+            running += POINTS[o]
+            progressive += running
+            if o in (WIN, DRAW, LOSS):
+                opp = opponent[cell]
+                opp_scores.append(scores[opp])
+                sb += scores[opp] * POINTS[o]
+                rating_sum += ratings[opp]
+                games += 1
+                decisive += 1 if o == WIN else -1 if o == LOSS else 0
+            if o in (WIN, DRAW, LOSS, BYE):
+                values[GAMES][i] += 1
+        buchholz = sum(opp_scores)
+        values[BUCHHOLZ][i] = buchholz
+        values[BUCHHOLZ_CUT1][i] = buchholz - min(opp_scores) if opp_scores else 0.0
+        values[BUCHHOLZ_MEDIAN][i] = (
+            buchholz - min(opp_scores) - max(opp_scores) if len(opp_scores) > 2 else buchholz
+        )
+        values[SONNEBORN_BERGER][i] = sb
+        values[PROGRESSIVE][i] = progressive
+        # Linear approximation of the FIDE performance: Ra + 400 * (W - L) / n.
+        values[PERFORMANCE][i] = (
+            round(rating_sum / games + 400 * decisive / games) if games else 0
+        )
+    return scores, values
+
+
+def _direct_encounter(matrix: ResultMatrix, group: Sequence[int]) -> Dict[int, float]:
+    members = set(group)
+    rounds = matrix.rounds
+    points = {}
+    for i in group:
+        total = 0.0
+        for cell in range(i * rounds, (i + 1) * rounds):
+            if matrix.opponent[cell] in members:
+                total += POINTS[matrix.outcome[cell]]
+        points[i] = total
+    return points
+
+
+def _split(group: List[int], key: Dict[int, float]) -> List[List[int]]:
+    group = sorted(group, key=lambda i: -key[i])
+    parts: List[List[int]] = []
+    for i in group:
+        if parts and key[parts[-1][0]] == key[i]:
+            parts[-1].append(i)
+        else:
+            parts.append([i])
+    return parts
+
+
+def ranking(
+    matrix: ResultMatrix, codes: Optional[List[str]] = None
+) -> Tuple[List[int], List[float], Dict[str, List[float]]]:
+    """
+    Order the listed players (active, or withdrawn with games) by score, then
+    by each tiebreak of ``codes`` in turn, then by username.
+
+    Returns the ordered indices, the scores and the tiebreak values. Direct
+    encounter only makes sense inside a group still tied on everything before
+    it, so it is evaluated per group while refining the order.
+
+    The result is memoized on the matrix, which may be shared through
+    ``ResultMatrix.cached``: callers must not modify it.
+    """
+    if codes is None:
+        codes = parse_tiebreaks(matrix.tournament.tiebreaks)
+    memo = matrix.rankings.get(tuple(codes))
+    if memo is not None:
+        return memo
+    scores, values = compute_tiebreaks(matrix)
+    values[DIRECT_ENCOUNTER] = [0.0] * len(matrix)
+
+    listed = [i for i in range(len(matrix)) if matrix.active[i] or matrix.played(i)]
+    groups = _split(listed, dict(enumerate(scores)))
+    for code in codes:
+        refined = []
+        for group in groups:
+            if len(group) == 1:
+                refined.append(group)
+                continue
+            if code == DIRECT_ENCOUNTER:
+                key = _direct_encounter(matrix, group)
+                for i, pts in key.items():
+                    values[DIRECT_ENCOUNTER][i] = pts
+            else:
+                key = {i: values[code][i] for i in group}
+            refined.extend(_split(group, key))
+        groups = refined
+
+    order = []
+    for group in groups:
+        order.extend(sorted(group, key=lambda i: matrix.usernames[i].lower()))
+    matrix.rankings[tuple(codes)] = order, scores, values
+    return order, scores, values
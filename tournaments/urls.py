@@ -6,6 +6,8 @@ urlpatterns = [
     path("", views.tournament_list_open, name="tournament_list_open"),
     path("completed/", views.tournament_list_completed, name="tournament_list_completed"),
     path("running/", views.tournament_list_running, name="tournament_list_running"),
+    path("season/", views.season_leaderboard, name="season_leaderboard"),
+    path("season/<int:season>/", views.season_leaderboard, name="season_leaderboard_for"),
     path("signup/", views.signup, name="signup"),
     path("profile/", views.profile, name="profile"),
     path("tournaments/create/", views.create_tournament, name="tournament_create"),
@@ -15,6 +17,14 @@ urlpatterns = [
     path("tournaments/<int:pk>/unregister/", views.unregister_from_tournament, name="tournament_unregister"),
     path("tournaments/<int:pk>/start/", views.start_tournament, name="tournament_start"),
     path("tournaments/<int:pk>/advance/", views.advance_round, name="tournament_next_round"),
+    path("tournaments/<int:pk>/pairings/preview/", views.pairing_preview, name="tournament_pairing_preview"),
+    path("metrics", views.metrics, name="metrics"),
+    path("tournaments/<int:pk>/forecast.json", views.tournament_forecast_json, name="tournament_forecast_json"),
+    path(
+        "tournaments/<int:pk>/pairings/preview.json",
+        views.pairing_preview_json,
+        name="tournament_pairing_preview_json",
+    ),
     path("tournaments/<int:pk>/complete/", views.complete_tournament, name="tournament_complete"),
     path("tournaments/<int:pk>/open/", views.open_registration, name="tournament_open_reg"),
     path("tournaments/<int:pk>/close/", views.close_registration, name="tournament_close_reg"),
@@ -23,13 +33,60 @@ urlpatterns = [
         views.submit_result,
         name="submit_result",
     ),
+    path(
+        "tournaments/<int:pk>/matches/<int:match_id>/pgn/",
+        views.attach_game,
+        name="match_attach_game",
+    ),
+    path("tournaments/<int:pk>/matches/<int:match_id>/game/", views.match_game, name="match_game"),
+    path(
+        "tournaments/<int:pk>/matches/<int:match_id>/game.json",
+        views.match_game_json,
+        name="match_game_json",
+    ),
+    path(
+        "tournaments/<int:pk>/rounds/<int:number>/pgn/",
+        views.upload_round_games,
+        name="round_upload_games",
+    ),
+    path("tournaments/<int:pk>/results/bulk/", views.bulk_results, name="tournament_bulk_results"),
+    path(
+        "tournaments/<int:pk>/registrations/bulk/",
+        views.bulk_registrations,
+        name="tournament_bulk_registrations",
+    ),
+    path("tournaments/<int:pk>/crosstable/", views.tournament_crosstable, name="tournament_crosstable"),
+    path(
+        "tournaments/<int:pk>/crosstable.json",
+        views.tournament_crosstable_json,
+        name="tournament_crosstable_json",
+    ),
     path(
         "tournaments/<int:pk>/participants.json",
         views.tournament_participants_json,
         name="tournament_participants_json",
     ),
+    path(
+        "tournaments/<int:pk>/export.<str:fmt>",
+        views.tournament_export,
+        name="tournament_export",
+    ),
+    path("tournaments/export.<str:fmt>", views.tournaments_export, name="tournaments_export"),
+    path("api/tournaments/<int:pk>/results/", views.api_submit_results, name="api_submit_results"),
     path("staff/users/", views.admin_users, name="admin_users"),
+    path("staff/profiles/", views.staff_profiles, name="staff_profiles"),
+    path("staff/profiles/<str:name>/", views.staff_profile_detail, name="staff_profile_detail"),
+    path(
+        "staff/profiles/<str:name>.prof",
+        views.staff_profile_download,
+        name="staff_profile_download",
+    ),
     path("admin/users/", views.admin_users, name="admin_users_legacy"),
     path("users/", views.user_search, name="user_search"),
     path("users/<int:user_id>/", views.user_detail, name="user_detail"),
+    path(
+        "users/<int:user_id>/head-to-head/<int:opponent_id>.json",
+        views.head_to_head_json,
+        name="head_to_head_json",
+    ),
 ]
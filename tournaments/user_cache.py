@@ -0,0 +1,70 @@
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .metrics import record_cache
+
+# Bounds how long another process may keep serving a user changed elsewhere
+# when the cache is not shared between processes.
+USER_CACHE_TIMEOUT = 300
+
+User = get_user_model()
+
+# What decides whether, and as whom, a session is let in. A password change
+# must end the other sessions, a ban or demotion must apply at once.
+AUTH_STATE_FIELDS = ("password", "is_active", "is_staff", "is_superuser", "profile__is_banned")
+
+
+def _user_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def forget_user(user_id) -> None:
+    """Drop the cached user once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(_user_key(user_id)))
+
+
+def _auth_state(user) -> tuple:
+    profile = getattr(user, "profile", None)
+    return (
+        user.password,
+        user.is_active,
+        user.is_staff,
+        user.is_superuser,
+        profile.is_banned if profile is not None else None,
+    )
+
+
+def _shared_cache() -> bool:
+    """Whether every process sees the same cache (not the per-process local memory)."""
+    return not isinstance(caches["default"], LocMemCache)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that loads the user of a session, with their profile,
+    from the cache. The entry is dropped when the user or their profile is
+    saved or deleted. With a shared cache an authenticated request costs no
+    query once warm; with the per-process default, another process may have
+    changed the user, so the fields in ``AUTH_STATE_FIELDS`` are re-read on
+    each request (one narrow query instead of the full load).
+    """
+
+    def get_user(self, user_id) -> Optional[User]:
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is not None and not _shared_cache():
+            state = User._default_manager.filter(pk=user_id).values_list(*AUTH_STATE_FIELDS).first()
+            if state != _auth_state(user):
+                user = None
+        record_cache("user", user is not None)
+        if user is None:
+            user = User._default_manager.select_related("profile").filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -1,22 +1,136 @@
 from datetime import datetime
+from functools import wraps
+from itertools import islice
 
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Q
-from django.http import Http404, HttpResponseForbidden, JsonResponse
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_POST
+
+from .api import api_error, idempotent, token_required
+from .archive import archived_detail, archived_matches, restore_tournament
+from .bulk import (
+    BulkError,
+    apply_registrations,
+    parse_rows,
+    validate_registrations,
+    validate_results,
+)
+from .exports import gzip_stream, iter_jsonl, iter_trf, iter_trf_many
+from .forecast import forecast
+from .forms import (
+    BulkImportForm,
+    MatchResultForm,
+    PairingForm,
+    PgnUploadForm,
+    ProfileForm,
+    SignUpForm,
+    TournamentForm,
+)
+from .head_to_head import head_to_head
+from .matrix import ResultMatrix, bump_state_version, crosstable
+from .metrics import USER_STATS_SECONDS, exposition
+from .models import (
+    Game,
+    HeadToHead,
+    Match,
+    Round,
+    SeasonResult,
+    SeasonStanding,
+    Tournament,
+    TournamentRegistration,
+    season_of,
+    standings_for_tournament,
+)
+from .page_cache import bump_page_versions, cache_anonymous_page
+from .profiling import load_profile, profile_path, slowest_by_view
+from .pagination import akeyset_page
+from .pgn import (
+    PgnError,
+    decode_moves,
+    export_pgn,
+    first_game,
+    iter_decoded_moves,
+    iter_games,
+    iter_text_lines,
+)
+from .services import (
+    apply_results,
+    attach_round_games,
+    can_attach_game,
+    can_generate_next_round,
+    can_submit_result,
+    commit_pairings,
+    generate_next_round,
+    mark_tournament_completed,
+    plan_next_round,
+    record_result,
+    save_game,
+)
+from .season import record_season_results
+from .tiebreaks import TIEBREAK_LABELS, parse_tiebreaks, ranking
 
-from .forms import MatchResultForm, ProfileForm, SignUpForm, TournamentForm
-from .models import Match, Round, Tournament, TournamentRegistration, standings_for_tournament
-from .services import can_generate_next_round, generate_next_round
+
+# Most recent opponents listed in the head-to-head panel of a profile.
+HEAD_TO_HEAD_PANEL_SIZE = 20
 
 
 def staff_required(view_func):
     return user_passes_test(lambda u: u.is_staff)(view_func)
 
 
+async def _auser(request):
+    """``request.user``, loaded in a thread: its session lookup is a sync query."""
+
+    def load():
+        request.user.is_authenticated  # evaluates the lazy object
+        return request.user
+
+    return await sync_to_async(load)()
+
+
+def async_login_required(view_func):
+    """``login_required`` for async views (the Django 4.2 decorator is sync only)."""
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await _auser(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def _aget_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404
+
+
+async def arender(request, template_name, context):
+    # Templates may still touch lazy relations, so they render in a thread.
+    return await sync_to_async(render)(request, template_name, context)
+
+
 def auto_start_due_tournaments():
     """Start any registration-open tournaments whose start_datetime has passed."""
     due = Tournament.objects.filter(
@@ -30,7 +144,10 @@ def auto_start_due_tournaments():
             status=Tournament.STATUS_REGISTRATION,
         ).update(status=Tournament.STATUS_RUNNING)
         if updated:
+            bump_page_versions(tournament.pk)
             tournament.refresh_from_db()
+            if not tournament.pairs_automatically:
+                continue
             try:
                 generate_next_round(tournament)
             except ValueError:
@@ -50,51 +167,104 @@ def signup(request):
     return render(request, "registration/signup.html", {"form": form})
 
 
-def tournament_list_open(request):
-    auto_start_due_tournaments()
-    tournaments = Tournament.objects.filter(
-        status=Tournament.STATUS_REGISTRATION
-    ).order_by("start_datetime")
-    return render(request, "tournaments/open_list.html", {"tournaments": tournaments})
+def _count_per_tournament(queryset, archived_count):
+    # Archived tournaments have no rows left to count: their archive keeps the count.
+    return Coalesce(
+        Subquery(
+            queryset.filter(tournament=OuterRef("pk"))
+            .order_by()
+            .values("tournament")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        archived_count,
+        0,
+        output_field=IntegerField(),
+    )
 
 
-def tournament_list_completed(request):
-    tournaments = Tournament.objects.filter(
-        status=Tournament.STATUS_COMPLETED
-    ).order_by("-start_datetime")
-    return render(request, "tournaments/completed_list.html", {"tournaments": tournaments})
+def _listed_tournaments(status):
+    """Tournaments of a list page, with their counts and winner computed in the same query."""
+    return Tournament.objects.filter(status=status).annotate(
+        participant_count=_count_per_tournament(
+            TournamentRegistration.objects.filter(is_active=True), "archive__participants"
+        ),
+        rounds_played=_count_per_tournament(
+            Round.objects.filter(ended_at__isnull=False), "archive__rounds_played"
+        ),
+        winner=Subquery(
+            SeasonResult.objects.filter(tournament=OuterRef("pk"), rank=1).values(
+                "user__username"
+            )[:1]
+        ),
+    )
 
 
-def tournament_list_running(request):
-    auto_start_due_tournaments()
-    tournaments = Tournament.objects.filter(
-        status=Tournament.STATUS_RUNNING
-    ).order_by("start_datetime")
+async def _list_page(request, status, descending=False):
+    cursor = request.GET.get("cursor")
+    tournaments, next_cursor = await akeyset_page(
+        _listed_tournaments(status), cursor, descending=descending
+    )
+    return {"tournaments": tournaments, "cursor": cursor, "next_cursor": next_cursor}
+
+
+@cache_anonymous_page()
+async def tournament_list_open(request):
+    await sync_to_async(auto_start_due_tournaments)()
+    context = await _list_page(request, Tournament.STATUS_REGISTRATION)
+    return await arender(request, "tournaments/open_list.html", context)
 
-    # For each tournament, find the authenticated user's pending match in the current round
-    user_pending_matches = {}
-    if request.user.is_authenticated:
-        for t in tournaments:
-            current_round = t.rounds.filter(number=t.current_round).prefetch_related(
-                "matches__white_player", "matches__black_player"
-            ).first()
-            if current_round:
-                pending_match = current_round.matches.filter(
-                    Q(white_player=request.user) | Q(black_player=request.user),
-                    result=Match.RESULT_PENDING,
-                ).first()
-                user_pending_matches[t.pk] = pending_match
 
+@cache_anonymous_page()
+async def tournament_list_completed(request):
+    context = await _list_page(request, Tournament.STATUS_COMPLETED, descending=True)
+    return await arender(request, "tournaments/completed_list.html", context)
+
+
+def season_leaderboard(request, season=None):
+    seasons = list(
+        SeasonStanding.objects.order_by("-season").values_list("season", flat=True).distinct()
+    )
+    if season is None:
+        season = seasons[0] if seasons else season_of(timezone.localtime())
+    standings = (
+        SeasonStanding.objects.filter(season=season)
+        .select_related("user")
+        .order_by("-points", "-podiums", "-titles", "user__username")
+    )
     return render(
         request,
-        "tournaments/running_list.html",
-        {
-            "tournaments": tournaments,
-            "user_pending_matches": user_pending_matches,
-        },
+        "tournaments/season.html",
+        {"season": season, "seasons": seasons, "standings": standings},
     )
 
 
+@cache_anonymous_page()
+async def tournament_list_running(request):
+    await sync_to_async(auto_start_due_tournaments)()
+    context = await _list_page(request, Tournament.STATUS_RUNNING)
+
+    # The authenticated user's pending match in the current round of each
+    # listed tournament, fetched for the whole page at once.
+    user_pending_matches = {}
+    user = await _auser(request)
+    if user.is_authenticated:
+        pending = (
+            Match.objects.filter(
+                Q(white_player=user) | Q(black_player=user),
+                round__tournament__in=context["tournaments"],
+                round__number=F("round__tournament__current_round"),
+                result=Match.RESULT_PENDING,
+            )
+            .select_related("round", "white_player", "black_player")
+            .order_by("-id")
+        )
+        async for match in pending:
+            user_pending_matches[match.round.tournament_id] = match
+    context["user_pending_matches"] = user_pending_matches
+    return await arender(request, "tournaments/running_list.html", context)
+
+
 @login_required
 def profile(request):
     profile = request.user.profile
@@ -111,28 +281,42 @@ def profile(request):
     return render(request, "tournaments/profile.html", {"form": form, "stats": stats})
 
 
+@USER_STATS_SECONDS.time()
 def user_stats(user):
-    matches = Match.objects.filter(
-        Q(white_player=user) | Q(black_player=user)
-    ).exclude(result=Match.RESULT_PENDING)
-    wins = matches.filter(
-        (Q(result=Match.RESULT_WHITE) & Q(white_player=user))
-        | (Q(result=Match.RESULT_BLACK) & Q(black_player=user))
-        | Q(result=Match.RESULT_BYE)
-    ).count()
-    losses = matches.filter(
-        (Q(result=Match.RESULT_WHITE) & Q(black_player=user))
-        | (Q(result=Match.RESULT_BLACK) & Q(white_player=user))
-    ).count()
-    draws = matches.filter(result=Match.RESULT_DRAW).count()
-    whites_played = matches.filter(white_player=user).count()
-    blacks_played = matches.filter(black_player=user).count()
-    white_wins = matches.filter(result=Match.RESULT_WHITE, white_player=user).count()
-    black_wins = matches.filter(result=Match.RESULT_BLACK, black_player=user).count()
+    matches = list(
+        Match.objects.filter(Q(white_player=user) | Q(black_player=user))
+        .exclude(result=Match.RESULT_PENDING)
+        .select_related("round__tournament", "white_player", "black_player")
+    )
+    matches.extend(archived_matches(user))
+    # Tournaments in the order "-round__tournament" gave: oldest first.
+    matches.sort(
+        key=lambda m: (m.round.tournament.start_datetime, m.round.tournament.created_at, m.round.number, m.pk)
+    )
+    as_white = [m for m in matches if m.white_player_id == user.pk]
+    as_black = [m for m in matches if m.black_player_id == user.pk]
+    wins = sum(
+        1
+        for m in matches
+        if m.result == Match.RESULT_BYE
+        or (m.result == Match.RESULT_WHITE and m.white_player_id == user.pk)
+        or (m.result == Match.RESULT_BLACK and m.black_player_id == user.pk)
+    )
+    losses = sum(
+        1
+        for m in matches
+        if (m.result == Match.RESULT_WHITE and m.black_player_id == user.pk)
+        or (m.result == Match.RESULT_BLACK and m.white_player_id == user.pk)
+    )
+    draws = sum(1 for m in matches if m.result == Match.RESULT_DRAW)
+    whites_played = len(as_white)
+    blacks_played = len(as_black)
+    white_wins = sum(1 for m in as_white if m.result == Match.RESULT_WHITE)
+    black_wins = sum(1 for m in as_black if m.result == Match.RESULT_BLACK)
     white_win_rate = (white_wins / whites_played * 100) if whites_played else 0
     black_win_rate = (black_wins / blacks_played * 100) if blacks_played else 0
     all_matches = []
-    for m in matches.select_related("round__tournament", "white_player", "black_player").order_by("-round__tournament", "round__number"):
+    for m in matches:
         opponent = m.white_player if m.white_player != user else m.black_player
         color = "blancs" if m.white_player == user else "noirs"
         pts = m.points_for(user)
@@ -163,34 +347,52 @@ def user_stats(user):
     }
 
 
-def tournament_detail(request, pk):
-    auto_start_due_tournaments()
-    tournament = get_object_or_404(Tournament, pk=pk)
-    registrations = TournamentRegistration.objects.filter(
-        tournament=tournament, is_active=True
-    ).select_related("user")
+@cache_anonymous_page(per_tournament=True)
+async def tournament_detail(request, pk):
+    await sync_to_async(auto_start_due_tournaments)()
+    tournament = await _aget_or_404(Tournament.objects.all(), pk=pk)
+    if tournament.archived_at:
+        registrations, rounds = await sync_to_async(archived_detail)(tournament)
+    else:
+        registrations = [
+            r
+            async for r in TournamentRegistration.objects.filter(
+                tournament=tournament, is_active=True
+            ).select_related("user", "user__profile")
+        ]
+        rounds = [
+            r
+            async for r in tournament.rounds.prefetch_related(
+                Prefetch(
+                    "matches",
+                    queryset=Match.objects.select_related(
+                        "white_player__profile", "black_player__profile"
+                    ).annotate(
+                        has_game=Exists(Game.objects.filter(match=OuterRef("pk")))
+                    ),
+                )
+            ).all()
+        ]
     user_registration = None
     user_pending_match = None
-    if request.user.is_authenticated:
-        user_registration = registrations.filter(user=request.user).first()
+    user = await _auser(request)
+    if user.is_authenticated:
+        user_registration = next((r for r in registrations if r.user_id == user.pk), None)
         if tournament.is_running:
-            current_round = tournament.rounds.filter(number=tournament.current_round).first()
-            if current_round:
-                user_pending_match = current_round.matches.filter(
-                    Q(white_player=request.user) | Q(black_player=request.user),
+            user_pending_match = await (
+                Match.objects.filter(
+                    Q(white_player=user) | Q(black_player=user),
+                    round__tournament=tournament,
+                    round__number=tournament.current_round,
                     result=Match.RESULT_PENDING,
-                ).exclude(
-                    white_player__isnull=False, black_player__isnull=True
-                ).first()
+                )
+                .exclude(white_player__isnull=False, black_player__isnull=True)
+                .afirst()
+            )
 
-    standings = standings_for_tournament(tournament)
-    rounds = (
-        tournament.rounds.prefetch_related(
-            "matches__white_player", "matches__black_player"
-        ).all()
-    )
+    standings = await sync_to_async(standings_for_tournament)(tournament)
 
-    return render(
+    return await arender(
         request,
         "tournaments/detail.html",
         {
@@ -198,6 +400,9 @@ def tournament_detail(request, pk):
             "registrations": registrations,
             "user_registration": user_registration,
             "standings": standings,
+            "tiebreak_columns": [
+                (code, TIEBREAK_LABELS[code]) for code in parse_tiebreaks(tournament.tiebreaks)
+            ],
             "rounds": rounds,
             "user_pending_match": user_pending_match,
         },
@@ -231,6 +436,8 @@ def unregister_from_tournament(request, pk):
     TournamentRegistration.objects.filter(
         tournament=tournament, user=request.user
     ).update(is_active=False)
+    bump_state_version(tournament.pk)
+    bump_page_versions(tournament.pk)
     messages.info(request, "Vous êtes désinscrit du tournoi.")
     return redirect("tournament_detail", pk=pk)
 
@@ -272,8 +479,13 @@ def edit_tournament(request, pk):
 @staff_required
 def open_registration(request, pk):
     tournament = get_object_or_404(Tournament, pk=pk)
+    reopened = tournament.is_completed
+    if tournament.archived_at:
+        restore_tournament(tournament)
     tournament.status = Tournament.STATUS_REGISTRATION
     tournament.save(update_fields=["status"])
+    if reopened:
+        record_season_results(tournament)
     messages.success(request, "Inscriptions ouvertes.")
     return redirect("tournament_detail", pk=pk)
 
@@ -281,8 +493,13 @@ def open_registration(request, pk):
 @staff_required
 def close_registration(request, pk):
     tournament = get_object_or_404(Tournament, pk=pk)
+    reopened = tournament.is_completed
+    if tournament.archived_at:
+        restore_tournament(tournament)
     tournament.status = Tournament.STATUS_DRAFT
     tournament.save(update_fields=["status"])
+    if reopened:
+        record_season_results(tournament)
     messages.info(request, "Inscriptions fermées.")
     return redirect("tournament_detail", pk=pk)
 
@@ -295,6 +512,9 @@ def start_tournament(request, pk):
         return redirect("tournament_detail", pk=pk)
     tournament.status = Tournament.STATUS_RUNNING
     tournament.save(update_fields=["status"])
+    if not tournament.pairs_automatically:
+        messages.success(request, "Tournoi lancé, validez les appariements du round 1.")
+        return redirect("tournament_pairing_preview", pk=pk)
     generate_next_round(tournament)
     messages.success(request, "Tournoi lancé, appariements du round 1 générés.")
     return redirect("tournament_detail", pk=pk)
@@ -311,6 +531,57 @@ def advance_round(request, pk):
     return redirect("tournament_detail", pk=pk)
 
 
+@staff_required
+def pairing_preview(request, pk):
+    """
+    Dry run of the next round: the computed pairings can be edited board by
+    board and previewed again as often as needed, nothing is written until
+    the organizer commits them.
+    """
+    tournament = get_object_or_404(Tournament, pk=pk)
+    try:
+        plan = plan_next_round(tournament)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("tournament_detail", pk=pk)
+
+    if request.method == "POST":
+        form = PairingForm(request.POST, plan=plan)
+        if form.is_valid() and request.POST.get("action") == "commit":
+            try:
+                commit_pairings(tournament, plan)
+            except ValueError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f"Round {plan.round_number} enregistré.")
+                return redirect("tournament_detail", pk=pk)
+    else:
+        form = PairingForm(plan=plan)
+    return render(
+        request,
+        "tournaments/pairing_preview.html",
+        {"tournament": tournament, "plan": plan, "form": form},
+    )
+
+
+@staff_required
+def pairing_preview_json(request, pk):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    try:
+        plan = plan_next_round(tournament)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    return JsonResponse(
+        {
+            "round": plan.round_number,
+            "pairings": plan.rows(),
+            "bye": plan.players[plan.bye].username if plan.bye is not None else None,
+            "elapsed_ms": round(plan.elapsed_ms, 2),
+            "queries": plan.queries,
+        }
+    )
+
+
 @staff_required
 def complete_tournament(request, pk):
     tournament = get_object_or_404(Tournament, pk=pk)
@@ -318,23 +589,11 @@ def complete_tournament(request, pk):
     if last_round and last_round.matches.filter(result=Match.RESULT_PENDING).exists():
         messages.error(request, "Terminez d'abord tous les matchs.")
         return redirect("tournament_detail", pk=pk)
-    tournament.status = Tournament.STATUS_COMPLETED
-    tournament.save(update_fields=["status"])
+    mark_tournament_completed(tournament)
     messages.success(request, "Tournoi marqué comme terminé.")
     return redirect("tournament_detail", pk=pk)
 
 
-def can_submit_result(tournament, match, user):
-    if match.is_bye:
-        return False
-    # Once a result is set, only admins can modify it
-    if match.result != Match.RESULT_PENDING:
-        return user.is_staff
-    if tournament.mode == Tournament.MODE_ADMIN:
-        return user.is_staff
-    return user.is_staff or match.involves(user)
-
-
 @staff_required
 def admin_users(request):
     from django.core.paginator import Paginator
@@ -399,6 +658,35 @@ def admin_users(request):
         },
     )
 
+
+@staff_required
+def staff_profiles(request):
+    return render(
+        request,
+        "tournaments/profiles.html",
+        {
+            "views": slowest_by_view(),
+            "sample_percent": settings.PROFILER_SAMPLE_RATE * 100,
+            "header": settings.PROFILER_HEADER,
+        },
+    )
+
+
+@staff_required
+def staff_profile_detail(request, name):
+    summary = load_profile(name)
+    if summary is None:
+        raise Http404
+    return render(request, "tournaments/profile_detail.html", {"profile": summary})
+
+
+@staff_required
+def staff_profile_download(request, name):
+    path = profile_path(name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=f"{name}.prof")
+
 @login_required
 def user_search(request):
     from django.contrib.auth import get_user_model
@@ -421,33 +709,81 @@ def user_search(request):
     )
 
 
-@login_required
-def user_detail(request, user_id):
+@async_login_required
+async def user_detail(request, user_id):
     from django.contrib.auth import get_user_model
 
     User = get_user_model()
-    user = get_object_or_404(User.objects.select_related("profile"), pk=user_id, last_login__isnull=False)
-    stats = user_stats(user)
-    return render(
+    user = await _aget_or_404(
+        User.objects.select_related("profile"), pk=user_id, last_login__isnull=False
+    )
+    stats = await sync_to_async(user_stats)(user)
+    own_record = None
+    viewer = await _auser(request)
+    if viewer != user:
+        own_record = await sync_to_async(head_to_head)(viewer.pk, user.pk)
+    opponents = [
+        row
+        async for row in HeadToHead.objects.filter(player=user)
+        .select_related("opponent")
+        .order_by("-last_played")[:HEAD_TO_HEAD_PANEL_SIZE]
+    ]
+    return await arender(
         request,
         "tournaments/user_detail.html",
-        {"target_user": user, "stats": stats},
+        {
+            "target_user": user,
+            "stats": stats,
+            "own_record": own_record,
+            "head_to_head": opponents,
+        },
     )
 
 
-def tournament_participants_json(request, pk):
-    tournament = get_object_or_404(Tournament, pk=pk)
+@login_required
+def head_to_head_json(request, user_id, opponent_id):
+    from django.contrib.auth import get_user_model
+
+    names = dict(
+        get_user_model()
+        .objects.filter(pk__in=(user_id, opponent_id))
+        .values_list("pk", "username")
+    )
+    if user_id not in names or opponent_id not in names:
+        raise Http404
+    record = head_to_head(user_id, opponent_id)
+    last_played = record["last_played"]
+    return JsonResponse(
+        dict(
+            record,
+            player=names[user_id],
+            opponent=names[opponent_id],
+            last_played=last_played.isoformat() if last_played else None,
+        )
+    )
+
+
+async def tournament_participants_json(request, pk):
+    tournament = await _aget_or_404(Tournament.objects.all(), pk=pk)
     registrations = TournamentRegistration.objects.filter(
         tournament=tournament, is_active=True
     ).select_related("user", "user__profile").order_by("joined_at")
     data = []
-    for reg in registrations:
+    async for reg in registrations:
         elo = getattr(getattr(reg.user, "profile", None), "chesscom_elo", None)
         label = f"{reg.user.username} ({elo})" if elo else reg.user.username
         data.append({"username": reg.user.username, "elo": elo, "label": label})
     return JsonResponse({"participants": data, "count": len(data)})
 
 
+def _round_outcome_message(tournament, rnd_number, outcome):
+    if outcome == "next_round":
+        return f"Round {rnd_number} terminé. Appariements du round {tournament.current_round} générés."
+    if outcome == "completed":
+        return "Tous les rounds sont terminés. Le tournoi a été clôturé automatiquement."
+    return None
+
+
 @login_required
 def submit_result(request, pk, match_id):
     tournament = get_object_or_404(Tournament, pk=pk)
@@ -462,36 +798,11 @@ def submit_result(request, pk, match_id):
     if request.method == "POST":
         form = MatchResultForm(request.POST, instance=match)
         if form.is_valid():
-            result_match = form.save(commit=False)
-            result_match.submitted_by = request.user
-            result_match.save()
-            # Close round end time if complete
-            rnd = match.round
-            if rnd.matches.filter(result=Match.RESULT_PENDING).count() == 0:
-                rnd.ended_at = timezone.now()
-                rnd.save(update_fields=["ended_at"])
-                if (
-                    tournament.status == Tournament.STATUS_RUNNING
-                    and tournament.current_round == rnd.number
-                ):
-                    if tournament.current_round < tournament.rounds_planned:
-                        # Generate next round
-                        try:
-                            generate_next_round(tournament)
-                            messages.success(
-                                request,
-                                f"Round {rnd.number} terminé. Appariements du round {tournament.current_round} générés.",
-                            )
-                        except ValueError:
-                            pass
-                    else:
-                        # Last round complete — auto-close the tournament
-                        tournament.status = Tournament.STATUS_COMPLETED
-                        tournament.save(update_fields=["status"])
-                        messages.success(
-                            request,
-                            "Tous les rounds sont terminés. Le tournoi a été clôturé automatiquement.",
-                        )
+            rnd_number = match.round.number
+            outcome = record_result(tournament, match, form.cleaned_data["result"], request.user)
+            note = _round_outcome_message(tournament, rnd_number, outcome)
+            if note:
+                messages.success(request, note)
             messages.success(request, "Résultat enregistré.")
             return redirect("tournament_detail", pk=pk)
     else:
@@ -501,3 +812,347 @@ def submit_result(request, pk, match_id):
         "tournaments/submit_result.html",
         {"form": form, "match": match, "tournament": tournament},
     )
+
+
+def _bulk_import(request, tournament, handle, title, help_text):
+    """
+    Shared flow of the bulk pages. ``handle(text)`` validates and applies the
+    payload, returning ``(json_data, flash_messages)``; it raises ``BulkError``
+    before writing anything. Raw CSV/JSON request bodies are answered in JSON,
+    form posts from the page with a redirect to the tournament.
+    """
+    form = BulkImportForm()
+    errors = []
+    if request.method == "POST":
+        api = request.content_type in ("application/json", "text/csv", "text/plain")
+        if api:
+            text = request.body.decode("utf-8-sig")
+        else:
+            form = BulkImportForm(request.POST, request.FILES)
+            text = form.cleaned_data["data"] if form.is_valid() else None
+        if text is not None:
+            try:
+                data, notes = handle(parse_rows(text))
+            except BulkError as exc:
+                errors = exc.errors
+                if api:
+                    return JsonResponse({"errors": errors}, status=400)
+            else:
+                if api:
+                    return JsonResponse(data)
+                for note in notes:
+                    messages.success(request, note)
+                return redirect("tournament_detail", pk=tournament.pk)
+    return render(
+        request,
+        "tournaments/bulk_import.html",
+        {
+            "tournament": tournament,
+            "form": form,
+            "errors": errors,
+            "title": title,
+            "help": help_text,
+        },
+    )
+
+
+@staff_required
+def bulk_results(request, pk):
+    tournament = get_object_or_404(Tournament, pk=pk)
+
+    def handle(rows):
+        updates = validate_results(tournament, rows, request.user)
+        round_number = tournament.current_round
+        outcome = apply_results(tournament, updates, request.user)
+        notes = [f"{len(updates)} résultat(s) enregistré(s)."]
+        note = _round_outcome_message(tournament, round_number, outcome)
+        if note:
+            notes.append(note)
+        data = {
+            "updated": len(updates),
+            "outcome": outcome,
+            "current_round": tournament.current_round,
+            "status": tournament.status,
+        }
+        return data, notes
+
+    return _bulk_import(
+        request,
+        tournament,
+        handle,
+        "Saisie groupée des résultats",
+        "Colonnes : match,result ou white,black,result (pseudos du round en cours). "
+        "Résultats acceptés : white/black/draw, 1-0, 0-1, 1/2-1/2.",
+    )
+
+
+@staff_required
+def bulk_registrations(request, pk):
+    tournament = get_object_or_404(Tournament, pk=pk)
+
+    def handle(rows):
+        count = apply_registrations(tournament, validate_registrations(tournament, rows))
+        return {"registered": count}, [f"{count} joueur(s) inscrit(s)."]
+
+    return _bulk_import(
+        request,
+        tournament,
+        handle,
+        "Inscription groupée",
+        "Une colonne username (avec en-tête), ou une liste JSON de pseudos.",
+    )
+
+
+@token_required
+@require_POST
+@idempotent
+def api_submit_results(request, pk):
+    """
+    Results from an arbiter's device: a JSON list of ``{"match": id,
+    "result": "1-0"}`` rows (or white/black usernames, as on the bulk page),
+    checked with the rules of ``can_submit_result`` and written at once.
+    The answer holds only the matches written and the state of their rounds.
+    """
+    tournament = Tournament.objects.filter(pk=pk).first()
+    if tournament is None:
+        return api_error("Tournoi introuvable.", 404)
+    try:
+        rows = parse_rows(request.body.decode("utf-8-sig"))
+        if not rows:
+            raise BulkError(["Aucun résultat envoyé."])
+        updates = validate_results(tournament, rows, request.user)
+        outcome = apply_results(tournament, updates, request.user)
+    except UnicodeDecodeError:
+        return api_error("Le corps de la requête doit être en UTF-8.", 400)
+    except BulkError as exc:
+        return JsonResponse({"errors": exc.errors}, status=400)
+
+    numbers = sorted({match.round.number for match, _ in updates})
+    pending = dict(
+        Match.objects.filter(
+            round__tournament=tournament, round__number__in=numbers, result=Match.RESULT_PENDING
+        )
+        .values("round__number")
+        .annotate(count=Count("id"))
+        .values_list("round__number", "count")
+    )
+    return JsonResponse(
+        {
+            "outcome": outcome,
+            "tournament": {"status": tournament.status, "current_round": tournament.current_round},
+            "rounds": [{"number": n, "pending": pending.get(n, 0)} for n in numbers],
+            "matches": [
+                {
+                    "id": match.pk,
+                    "round": match.round.number,
+                    "board": match.board,
+                    "white": match.white_player.username,
+                    "black": match.black_player.username,
+                    "result": match.result,
+                }
+                for match, _ in updates
+            ],
+        }
+    )
+
+
+def _export_response(fmt, tournaments, filename):
+    if fmt == "jsonl":
+        response = StreamingHttpResponse(
+            gzip_stream(iter_jsonl(tournaments)), content_type="application/gzip"
+        )
+        filename += ".jsonl.gz"
+    elif fmt == "trf":
+        if isinstance(tournaments, Tournament):
+            lines = iter_trf(tournaments)
+        else:
+            lines = iter_trf_many(tournaments)
+        response = StreamingHttpResponse(
+            (line.encode("utf-8") for line in lines), content_type="text/plain; charset=utf-8"
+        )
+        filename += ".trf"
+    else:
+        raise Http404("Format inconnu.")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_required
+def tournament_export(request, pk, fmt):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    if fmt == "jsonl":
+        return _export_response(fmt, Tournament.objects.filter(pk=pk), f"tournoi-{pk}")
+    return _export_response(fmt, tournament, f"tournoi-{pk}")
+
+
+@staff_required
+def tournaments_export(request, fmt):
+    tournaments = Tournament.objects.order_by("start_datetime", "pk")
+    return _export_response(fmt, tournaments, "tournois")
+
+
+def _pgn_lines(form):
+    upload = form.cleaned_data.get("file")
+    if upload:
+        return iter_text_lines(upload)
+    return form.cleaned_data["pgn"].splitlines()
+
+
+@login_required
+def attach_game(request, pk, match_id):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    match = get_object_or_404(
+        Match.objects.select_related("round", "white_player", "black_player"),
+        pk=match_id,
+        round__tournament=tournament,
+    )
+    if not can_attach_game(match, request.user):
+        messages.error(request, "Vous ne pouvez pas joindre de partie à ce match.")
+        return redirect("tournament_detail", pk=pk)
+    form = PgnUploadForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        try:
+            save_game(match, first_game(_pgn_lines(form)), request.user)
+        except PgnError as exc:
+            form.add_error(None, str(exc))
+        else:
+            messages.success(request, "Partie enregistrée.")
+            return redirect("match_game", pk=pk, match_id=match.pk)
+    return render(
+        request,
+        "tournaments/pgn_upload.html",
+        {"form": form, "tournament": tournament, "match": match},
+    )
+
+
+@staff_required
+def upload_round_games(request, pk, number):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    rnd = get_object_or_404(Round, tournament=tournament, number=number)
+    form = PgnUploadForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        try:
+            stored, unmatched = attach_round_games(rnd, iter_games(_pgn_lines(form)), request.user)
+        except PgnError as exc:
+            form.add_error(None, str(exc))
+        else:
+            messages.success(request, f"{stored} partie(s) enregistrée(s) pour le round {number}.")
+            if unmatched:
+                messages.warning(
+                    request, "Parties sans match correspondant : " + ", ".join(unmatched)
+                )
+            return redirect("tournament_detail", pk=pk)
+    return render(
+        request,
+        "tournaments/pgn_upload.html",
+        {"form": form, "tournament": tournament, "round": rnd},
+    )
+
+
+def match_game(request, pk, match_id):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    game = get_object_or_404(
+        Game.objects.defer("moves").select_related(
+            "match__round", "match__white_player", "match__black_player"
+        ),
+        match_id=match_id,
+        match__round__tournament=tournament,
+    )
+    return render(
+        request,
+        "tournaments/game.html",
+        {"tournament": tournament, "game": game, "match": game.match},
+    )
+
+
+def match_game_json(request, pk, match_id):
+    """Moves of a game, ``count`` plies from ``start`` (``?format=pgn`` for the full PGN)."""
+    game = get_object_or_404(Game, match_id=match_id, match__round__tournament_id=pk)
+    if request.GET.get("format") == "pgn":
+        moves = decode_moves(game.moves)
+        result = game.headers.get("Result", "*")
+        response = HttpResponse(
+            export_pgn(game.headers, moves, result), content_type="application/x-chess-pgn"
+        )
+        response["Content-Disposition"] = f'attachment; filename="match-{match_id}.pgn"'
+        return response
+    try:
+        start = max(int(request.GET.get("start", 0)), 0)
+        count = min(max(int(request.GET.get("count", 40)), 1), 500)
+    except ValueError:
+        return JsonResponse({"error": "Paramètres start/count invalides."}, status=400)
+    moves = list(islice(iter_decoded_moves(bytes(game.moves)), start, start + count))
+    return JsonResponse(
+        {
+            "headers": game.headers,
+            "ply_count": game.ply_count,
+            "start": start,
+            "moves": moves,
+        }
+    )
+
+
+def _crosstable_rows(tournament):
+    matrix = ResultMatrix.cached(tournament)
+    codes = parse_tiebreaks(tournament.tiebreaks)
+    order, scores, values = ranking(matrix, codes)
+    shown = {code: values[code] for code in codes}
+    return matrix, codes, crosstable(matrix, order, scores, shown)
+
+
+@cache_anonymous_page(per_tournament=True)
+def tournament_crosstable(request, pk):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    matrix, codes, rows = _crosstable_rows(tournament)
+    for row in rows:
+        row["tiebreak_values"] = [row["tiebreaks"][code] for code in codes]
+    return render(
+        request,
+        "tournaments/crosstable.html",
+        {
+            "tournament": tournament,
+            "rows": rows,
+            "round_numbers": range(1, matrix.rounds + 1),
+            "tiebreak_labels": [TIEBREAK_LABELS[code] for code in codes],
+        },
+    )
+
+
+def tournament_crosstable_json(request, pk):
+    tournament = get_object_or_404(Tournament, pk=pk)
+    matrix, codes, rows = _crosstable_rows(tournament)
+    return JsonResponse({"rounds": matrix.rounds, "tiebreaks": codes, "players": rows})
+
+
+def tournament_forecast_json(request, pk):
+    """Odds of every final rank, from simulations of the remaining games."""
+    tournament = get_object_or_404(Tournament, pk=pk)
+    if not tournament.is_running:
+        return JsonResponse({"error": "Le tournoi n'est pas en cours."}, status=409)
+    try:
+        data = forecast(tournament)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    if data is None:
+        response = JsonResponse({"error": "Prévision en cours de calcul."}, status=503)
+        response["Retry-After"] = "1"
+        return response
+    return JsonResponse(data)
+
+
+def _metrics_token_ok(request) -> bool:
+    expected = getattr(settings, "METRICS_TOKEN", None)
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return bool(expected) and scheme.lower() == "bearer" and constant_time_compare(token.strip(), expected)
+
+
+def metrics(request):
+    """
+    Metrics of this process in the Prometheus text format, for staff or a
+    scraper sending ``METRICS_TOKEN`` as a bearer token. The client address
+    is not trusted: behind a local reverse proxy every request comes from
+    127.0.0.1.
+    """
+    if not request.user.is_staff and not _metrics_token_ok(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")